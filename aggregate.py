@@ -0,0 +1,136 @@
+#!/bin/python3
+# Collapse a validated group into the fewest networks covering the same addresses.
+#
+#   python3 aggregate.py validated_ip.csv          # writes aggregated_validated_ip.csv
+#   python3 check_csvFile.py --aggregate ip.csv    # validated_ip.csv comes out collapsed
+#
+# Same result as ipaddress.collapse_addresses, computed on the packed integers of
+# ipparse: the networks are sorted as [start, end] ranges, overlapping and adjacent
+# ranges are merged, and every merged range is cut back into the largest aligned CIDR
+# blocks. No address objects are built, so millions of rows collapse in seconds.
+#
+# An aligned block inside a merged range is never cut by that split, so every source
+# network ends up in exactly one output network. The output keeps the rows whose network
+# could not be merged as they are and names the merged ones after their network (see
+# AGGREGATE_HOSTNAME); the mapping report next to it (<output>.mapping.csv) lists the
+# output network of every source row. Rows come out in address order.
+
+import os
+import sys
+import csv
+
+from ipparse import network_range, format_network
+from rowstore import load_rows
+from csvio import csv_name, compression_suffix, open_text, atomic_writer
+
+# Hostname of an output row that replaces several source rows
+AGGREGATE_HOSTNAME = 'aggregate-{address}-{prefixlen}'
+
+MAPPING_HEADER = ['Ip_Address', 'Hostname', 'Source_Row', 'Source_Hostname', 'Source_Ip_Address']
+
+
+# Largest aligned CIDR blocks covering [start, end], as parsed networks
+def range_to_networks(version, start, end):
+    bits = 32 if version == 4 else 128
+    while start <= end:
+        # As large as the alignment of start allows, without going past end
+        size = min((start & -start).bit_length() - 1 if start else bits, (end - start + 1).bit_length() - 1)
+        yield version, start, bits - size
+        start += 1 << size
+
+
+def _split(version, start, end, members):
+    index = 0
+    for block in range_to_networks(version, start, end):
+        block_end = network_range(block)[1]
+        rows = []
+        while index < len(members) and members[index][0] <= block_end:
+            rows.append(members[index][1])
+            index += 1
+        yield block, rows
+
+
+# entries is an iterable of (row_number, parsed) as RowStore.networks() yields them.
+# Returns [(parsed, row_numbers)], the collapsed networks in address order with the rows
+# each of them covers.
+def collapse(entries):
+    ranges = sorted((parsed[0], *network_range(parsed), row_number) for row_number, parsed in entries)
+    aggregates = []
+    merged = None  # [version, start, end, [(start, row_number)]] of the range being merged
+    for version, start, end, row_number in ranges:
+        if merged is not None and merged[0] == version and start <= merged[2] + 1:
+            merged[2] = max(merged[2], end)
+            merged[3].append((start, row_number))
+            continue
+        if merged is not None:
+            aggregates.extend(_split(*merged))
+        merged = [version, start, end, [(start, row_number)]]
+    if merged is not None:
+        aggregates.extend(_split(*merged))
+    return aggregates
+
+
+def aggregate_hostname(parsed):
+    address, prefixlen = format_network(parsed).split('/')
+    return AGGREGATE_HOSTNAME.format(address=address, prefixlen=prefixlen)
+
+
+# Compressed like the output
+def mapping_path(output_csv_file):
+    return os.path.splitext(csv_name(output_csv_file))[0] + '.mapping.csv' + (compression_suffix(output_csv_file) or '')
+
+
+# Writes the collapsed rows of a RowStore to output_csv_file and the mapping report next
+# to it, returns (source rows, output rows)
+def write_aggregated(output_csv_file, header, rows, aggregates):
+    written = 0
+    with atomic_writer(output_csv_file) as output, atomic_writer(mapping_path(output_csv_file)) as mapping:
+        writer = csv.DictWriter(output, fieldnames=header)
+        writer.writeheader()
+        mapping_writer = csv.writer(mapping)
+        mapping_writer.writerow(MAPPING_HEADER)
+        for parsed, row_numbers in aggregates:
+            if len(row_numbers) == 1:
+                row = rows.row_dict(rows.row_index(row_numbers[0]))
+            else:
+                row = dict.fromkeys(header, '')
+                row['Hostname'] = aggregate_hostname(parsed)
+                row['Ip_Address'] = format_network(parsed)
+            writer.writerow(row)
+            for row_number in row_numbers:
+                index = rows.row_index(row_number)
+                mapping_writer.writerow([row['Ip_Address'], row['Hostname'], row_number,
+                                         rows.value(index, 'Hostname'), rows.value(index, 'Ip_Address')])
+            written += 1
+    return sum(len(row_numbers) for _, row_numbers in aggregates), written
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python aggregate.py <validated_csv_file>")
+        sys.exit(1)
+
+    input_csv_file = sys.argv[1]
+    directory, name = os.path.split(input_csv_file)
+    output_csv_file = os.path.join(directory, "aggregated_" + name)
+    try:
+        with open_text(input_csv_file) as csvfile:
+            header, rows = load_rows(csvfile)
+        if header is None or 'Hostname' not in header or 'Ip_Address' not in header:
+            print("Error: CSV file must contain 'Hostname' and 'Ip_Address' columns.")
+            sys.exit(1)
+        aggregates = collapse(rows.networks())
+        sources, written = write_aggregated(output_csv_file, header, rows, aggregates)
+    except FileNotFoundError:
+        print(f"Error: File {input_csv_file} not found.")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Error: Invalid IP address: {e}")
+        sys.exit(1)
+
+    print(f"Aggregated {sources} networks into {written}. Saved as {output_csv_file}, "
+          f"mapping in {mapping_path(output_csv_file)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,119 @@
 import csv
 import json
 import sys
+from collections import namedtuple
+
+# Row numbers (header is row 1) of the CSV rows, keyed three ways
+CsvIndex = namedtuple('CsvIndex', ['by_hostname', 'by_ip', 'by_pair'])
 
 def read_csv(file_path):
     """Reads a CSV file and returns its content as a list of dictionaries."""
+    return [row for row_number, row in read_rows(file_path)]
+
+def read_rows(file_path):
+    """Reads a CSV file and returns (row_number, row) for its rows as dictionaries.
+
+    Rows are numbered from the lines of the file like v4.py and groupindex.py do: the header
+    is row 1, blank lines are counted but not returned."""
     with open(file_path, mode='r', newline='') as file:
-        csv_reader = csv.DictReader(file)
-        return [row for row in csv_reader]
+        reader = csv.reader(file)
+        header = next(reader, [])
+        return [(row_number, dict(zip(header, row))) for row_number, row in enumerate(reader, start=2) if row]
 
-def check_items_in_csv(items, csv_content):
-    """Checks if each item is in the CSV content."""
+def build_index(rows):
+    """Builds hash indexes by hostname, by IP and by (hostname, IP) pair over (row_number, row) pairs."""
+    index = CsvIndex({}, {}, {})
+    for row_number, row in rows:
+        hostname = row.get('Hostname')
+        ip_address = row.get('Ip_Address')
+        index.by_hostname.setdefault(hostname, []).append(row_number)
+        index.by_ip.setdefault(ip_address, []).append(row_number)
+        index.by_pair.setdefault((hostname, ip_address), []).append(row_number)
+    return index
+
+def lookup_item(item, index):
+    """Returns the row numbers matching an item, or None when the item has neither key.
+
+    An item with both keys must match the pair, otherwise the key it has is matched."""
+    hostname = item.get('Hostname')
+    ip_address = item.get('Ip_Address')
+    if hostname is not None and ip_address is not None:
+        return index.by_pair.get((hostname, ip_address), [])
+    if hostname is not None:
+        return index.by_hostname.get(hostname, [])
+    if ip_address is not None:
+        return index.by_ip.get(ip_address, [])
+    return None
+
+def lookup_items(items, index):
+    """Answers all items in one pass: {"found": [...], "missing": [...], "invalid": [...]}."""
+    result = {'found': [], 'missing': [], 'invalid': []}
     for item in items:
-        if item in csv_content:
-            print(f"Item exists in CSV: {item}")
+        rows = lookup_item(item, index) if isinstance(item, dict) else None
+        if rows is None:
+            result['invalid'].append(item)
+        elif rows:
+            result['found'].append({'item': item, 'rows': rows})
         else:
-            print(f"Item does not exist in CSV: {item}")
+            result['missing'].append(item)
+    return result
+
+def check_items_in_csv(items, csv_content):
+    """Checks if each item is in the CSV content, a list of rows numbered from 2."""
+    result = lookup_items(items, build_index(enumerate(csv_content, start=2)))
+    for entry in result['found']:
+        print(f"Item exists in CSV: {entry['item']}")
+    for item in result['missing'] + result['invalid']:
+        print(f"Item does not exist in CSV: {item}")
+    return result
+
+def load_items(source):
+    """Reads the JSON items from a JSON string, a file path, or stdin when source is '-'.
+
+    A single object is taken as a list of one item."""
+    if source == '-':
+        items = json.load(sys.stdin)
+    elif source.lstrip().startswith(('[', '{')):
+        items = json.loads(source)
+    else:
+        with open(source, 'r') as file:
+            items = json.load(file)
+    if isinstance(items, dict):
+        items = [items]
+    if not isinstance(items, list):
+        raise ValueError("items must be a JSON list of objects")
+    return items
 
 def main():
-    # if len(sys.argv) != 3:
-    #     print("Usage: python check_items.py <path_to_csv_file> <items>")
-    #     sys.exit(1)
-    lst = []
-    
-    file_path = 'ip.csv' #sys.argv[1]
-    # items_json = sys.argv[1]
-       # Parse the items
-    items = {"Hostname":"dbserver01","Ip_Address":"10.10.10.2/24"}    #json.loads(items_json)
-    # print (items["Hostname"])
-    lst.append (items)
-    print (lst)
-    
-    # Read the CSV content
-    # csv_content = read_csv(file_path)
-    # for i in csv_content:
-    #     print (i['Hostname'])
-    #     for data in items:
-    #         print ("data in api req: ", data )
-    #         if data["Hostname"] == i['Hostname'] and data["Ip_Address"] == i["Ip_Address"]:
-    #             print ('Found it !', i)
-    #         else:
-    #             print ('Not found')
-        
-    # print (csv_content)
-    
- 
-    # Check if items exist in CSV content
-    # check_items_in_csv(items, csv_content)
+    args = sys.argv[1:]
+    # --index: answer from the persistent SQLite index next to the CSV instead of reparsing it
+    use_index = '--index' in args
+    if use_index:
+        args.remove('--index')
+    if len(args) not in (1, 2):
+        print("Usage: python auto_readcsv.py [--index] <path_to_csv_file> [<items_json> | <items_file> | -]")
+        sys.exit(1)
+
+    file_path = args[0]
+    source = args[1] if len(args) == 2 else '-'
+
+    try:
+        items = load_items(source)
+        if use_index:
+            from groupindex import GroupIndex
+            with GroupIndex(file_path) as index:
+                result = lookup_items(items, index)
+        else:
+            # Index the CSV once, then answer every item with hash lookups
+            result = lookup_items(items, build_index(read_rows(file_path)))
+    except FileNotFoundError as e:
+        print(f"Error: File {e.filename} not found.")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Error: Invalid items: {e}")
+        sys.exit(1)
+
+    print(json.dumps(result, indent=2))
 
 if __name__ == "__main__":
     main()
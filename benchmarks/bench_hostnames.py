@@ -0,0 +1,75 @@
+#!/bin/python3
+# Cost of the hostname check of v4.py, with a budget so a slow rule fails loudly.
+#
+#   python3 benchmarks/bench_hostnames.py                     # 1M rows, exits 1 over budget
+#   python3 benchmarks/bench_hostnames.py --rows 100000 --pattern 'host[0-9]+'
+#
+# The same generated file is validated by run_checks() with and without the hostname
+# check, best of --repeat runs each, alternating so both see the same machine state. The
+# generated hostnames are all different, so the name cache never helps: the worst case.
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import v4
+import ipparse
+import hostnames
+from gen_ipgroups import write_csv
+
+# Largest share of the total validation time the hostname check may add
+OVERHEAD_BUDGET = 0.05
+
+
+def _time_run(path, options, mmap):
+    ipparse.parse_network.cache_clear()
+    ipparse.parse_network_bytes.cache_clear()
+    hostnames.hostname_rule.cache_clear()
+    start = time.perf_counter()
+    results = v4.run_checks(path, v4.default_visitors(options, file_path=path), mmap)
+    elapsed = time.perf_counter() - start
+    if any(error is not None for label, error, warnings, count in results):
+        sys.exit(f"The generated file does not pass: {results}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the hostname check of v4.py.')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per side, the best one is kept')
+    parser.add_argument('--pattern', default=None, help='naming convention to check as well')
+    parser.add_argument('--mmap', action='store_true', help='read the file through mmap')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ipgroups-bench-')
+    try:
+        path = os.path.join(workdir, f"ipgroups_{args.rows}.csv")
+        write_csv(path, args.rows, seed=args.seed)
+        without = v4.CheckOptions(hostnames=False)
+        checked = v4.CheckOptions(hostnames=True, hostname_pattern=args.pattern)
+        best = {False: None, True: None}
+        for _ in range(args.repeat):
+            for enabled, options in ((False, without), (True, checked)):
+                elapsed = _time_run(path, options, args.mmap)
+                best[enabled] = elapsed if best[enabled] is None else min(best[enabled], elapsed)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    overhead = best[True] / best[False] - 1
+    print(f"{args.rows} rows: {best[False]:.3f}s without the hostname check, {best[True]:.3f}s with it, "
+          f"{overhead:+.1%} (budget {OVERHEAD_BUDGET:.0%})")
+    if overhead > OVERHEAD_BUDGET:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/bin/python3
+# Peak memory of check_csvFile_v2's row checks on a list of csv.DictReader dicts (before)
+# against the same checks on a rowstore.RowStore (after).
+#
+#   python3 benchmarks/bench_rowstore.py --rows 100000 1000000
+#   python3 benchmarks/bench_rowstore.py --file ip2.csv
+#
+# Each side reads the file, runs check_empty_values, check_ip_format, check_duplicates
+# and writes remove_empty_lines() through csv.DictWriter to /dev/null, under tracemalloc.
+
+import os
+import sys
+import csv
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import ipparse
+import check_csvFile_v2 as checks
+from rowstore import load_rows
+from gen_ipgroups import write_csv
+
+
+def _read_dicts(csvfile):
+    reader = csv.DictReader(csvfile)
+    return reader.fieldnames, list(reader)
+
+
+def _pipeline(path, read):
+    with open(path, newline='') as csvfile:
+        header, rows = read(csvfile)
+    checks.check_empty_values(rows)
+    checks.check_ip_format(rows)
+    checks.check_duplicates(rows)
+    with open(os.devnull, 'w', newline='') as output:
+        writer = csv.DictWriter(output, fieldnames=header)
+        writer.writeheader()
+        writer.writerows(checks.remove_empty_lines(rows))
+
+
+# (peak bytes, seconds) of one pipeline run
+def measure(path, read):
+    ipparse.parse_network.cache_clear()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        tracemalloc.start()
+        try:
+            start = time.perf_counter()
+            _pipeline(path, read)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return peak, elapsed
+
+
+def report(path, label):
+    before, before_seconds = measure(path, _read_dicts)
+    after, after_seconds = measure(path, load_rows)
+    print(f"{label:>14}  list of dicts {before / 1e6:9.1f} MB peak  RowStore {after / 1e6:9.1f} MB peak"
+          f"  x{before / max(after, 1):.1f}  ({before_seconds:.2f}s -> {after_seconds:.2f}s under tracemalloc)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Peak memory of the row checks, dicts against RowStore.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000], help='sizes of the generated files')
+    parser.add_argument('--file', nargs='+', default=[], help='existing CSV files to measure instead')
+    args = parser.parse_args()
+
+    for path in args.file:
+        report(path, os.path.basename(path))
+    if args.file:
+        return
+
+    workdir = tempfile.mkdtemp(prefix='ipgroups-bench-')
+    try:
+        for rows_count in args.rows:
+            path = os.path.join(workdir, f"ipgroups_{rows_count}.csv")
+            write_csv(path, rows_count)
+            report(path, f"{rows_count} rows")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
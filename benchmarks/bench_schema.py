@@ -0,0 +1,131 @@
+#!/bin/python3
+# v4.py with the schema checks against the v4.py from before them, and the fused row
+# checks against calling every check object in turn.
+#
+#   python3 benchmarks/bench_schema.py                    # 1M rows, exits 1 if slower
+#   python3 benchmarks/bench_schema.py --rows 100000 --mmap --duplicates canonical
+#   python3 benchmarks/bench_schema.py --baseline 88616be
+#
+# The same generated file is validated four ways:
+#   baseline  `python3 v4.py file.csv` in a `git archive` of --baseline, by default the
+#             parent of the commit that added schema.py, looked up when the benchmark runs
+#   current   `python3 v4.py file.csv` in this tree, with the same options
+#   dispatch  run_checks() with fuse=False, every row visits every check object in turn
+#   fused     run_checks() with the checks of the schema fused into one function per row
+# Best of --repeat runs each, alternating so all of them see the same machine state.
+
+import io
+import os
+import sys
+import time
+import shutil
+import tarfile
+import argparse
+import tempfile
+import subprocess
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import v4
+import ipparse
+import hostnames
+from gen_ipgroups import write_csv
+
+# The repo at a commit, extracted into `directory`
+def _extract(ref, directory):
+    try:
+        archive = subprocess.run(['git', 'archive', ref], cwd=REPO_DIR, capture_output=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError) as e:
+        sys.exit(f"Can't read the repo at {ref}: {e}")
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(directory)
+
+
+# The commit before the schema work: the parent of the one that added schema.py
+def _default_baseline():
+    try:
+        added = subprocess.run(['git', 'log', '--diff-filter=A', '--format=%H', '--', 'schema.py'], cwd=REPO_DIR,
+                               capture_output=True, text=True, check=True).stdout.split()
+        if added:
+            return subprocess.run(['git', 'rev-parse', '--short', f'{added[-1]}^'], cwd=REPO_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    sys.exit("Can't find the commit that added schema.py, pass --baseline")
+
+
+# `python3 v4.py <args> file.csv` from a checkout, the file has to pass
+def _time_main(directory, path, main_args):
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, os.path.join(directory, 'v4.py'), *main_args, path],
+                               cwd=directory, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if completed.returncode != 0:
+        sys.exit(f"{os.path.join(directory, 'v4.py')} {' '.join(main_args)} failed:\n"
+                 f"{completed.stdout}{completed.stderr}")
+    return elapsed
+
+
+def _time_run(path, options, fuse):
+    ipparse.parse_network.cache_clear()
+    ipparse.parse_network_bytes.cache_clear()
+    hostnames.hostname_rule.cache_clear()
+    start = time.perf_counter()
+    results = v4.run_checks(path, v4.default_visitors(options, file_path=path), options.use_mmap, fuse=fuse)
+    elapsed = time.perf_counter() - start
+    if any(error is not None for label, error, warnings, count in results):
+        sys.exit(f"The generated file does not pass: {results}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the fused row checks of v4.py.')
+    parser.add_argument('--baseline', metavar='COMMIT',
+                        help='commit of the v4.py to compare with (default: the parent of the commit '
+                             'that added schema.py)')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per side, the best one is kept')
+    parser.add_argument('--mmap', action='store_true', help='read the file through mmap')
+    parser.add_argument('--duplicates', choices=v4.DUPLICATE_MODES, default='strict')
+    parser.add_argument('--no-hostname-check', dest='hostnames', action='store_false')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    baseline = args.baseline or _default_baseline()
+    options = v4.CheckOptions(use_mmap=args.mmap, duplicates=args.duplicates, hostnames=args.hostnames)
+    # Only the options off their default, so a baseline from before them still runs
+    main_args = (['--duplicates', args.duplicates] if args.duplicates != 'strict' else []) + \
+        (['--mmap'] if args.mmap else []) + ([] if args.hostnames else ['--no-hostname-check'])
+    workdir = tempfile.mkdtemp(prefix='ipgroups-bench-')
+    try:
+        baseline_dir = os.path.join(workdir, 'baseline')
+        _extract(baseline, baseline_dir)
+        path = os.path.join(workdir, f"ipgroups_{args.rows}.csv")
+        write_csv(path, args.rows, seed=args.seed)
+        runs = {
+            'baseline': lambda: _time_main(baseline_dir, path, main_args),
+            'current': lambda: _time_main(REPO_DIR, path, main_args),
+            'dispatch': lambda: _time_run(path, options, False),
+            'fused': lambda: _time_run(path, options, True),
+        }
+        best = dict.fromkeys(runs)
+        for _ in range(args.repeat):
+            for name, run in runs.items():
+                elapsed = run()
+                best[name] = elapsed if best[name] is None else min(best[name], elapsed)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.rows} rows: v4.py {best['baseline']:.3f}s at {baseline}, {best['current']:.3f}s now, "
+          f"{best['baseline'] / best['current']:.2f}x")
+    print(f"{args.rows} rows: run_checks() {best['dispatch']:.3f}s calling every check, "
+          f"{best['fused']:.3f}s fused, {best['dispatch'] / best['fused']:.2f}x")
+    if best['current'] > best['baseline'] or best['fused'] > best['dispatch']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
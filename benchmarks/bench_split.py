@@ -0,0 +1,91 @@
+#!/bin/python3
+# What --split buys on one large file: run_checks() in this process against
+# run_checks_split() with several worker counts, on the same generated file.
+#
+#   python3 benchmarks/bench_split.py                       # 2M rows, 1 2 4 ... up to the cores
+#   python3 benchmarks/bench_split.py --rows 500000 --jobs 2 4 8
+#
+# Best of --repeat runs each. Both sides must give the same results. The run exits 1 when
+# splitting across at least two workers, on a machine with as many cores, is slower than
+# not splitting; with fewer cores the numbers only show the cost of the extra processes.
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import v4
+import ipparse
+from gen_ipgroups import write_csv
+
+
+def _default_jobs():
+    cores = os.cpu_count() or 1
+    jobs = [1]
+    while jobs[-1] * 2 <= max(cores, 2):
+        jobs.append(jobs[-1] * 2)
+    return jobs[1:]
+
+
+def _time_run(path, options):
+    ipparse.parse_network.cache_clear()
+    ipparse.parse_network_bytes.cache_clear()
+    start = time.perf_counter()
+    if options.split == 'off':
+        results = v4.run_checks(path, v4.default_visitors(options, file_path=path))
+    else:
+        results = v4.run_checks_split(path, v4.default_visitors(options), options)
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark --split of v4.py.')
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per side, the best one is kept')
+    parser.add_argument('--jobs', type=int, nargs='+', default=None,
+                        help='worker counts to time (default: powers of two up to the cores)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    sides = [v4.CheckOptions(split='off')] + [v4.CheckOptions(split='on', jobs=jobs)
+                                               for jobs in args.jobs or _default_jobs()]
+    workdir = tempfile.mkdtemp(prefix='ipgroups-bench-')
+    try:
+        path = os.path.join(workdir, f"ipgroups_{args.rows}.csv")
+        write_csv(path, args.rows, seed=args.seed)
+        best = [None] * len(sides)
+        expected = None
+        for _ in range(args.repeat):
+            for index, options in enumerate(sides):
+                elapsed, results = _time_run(path, options)
+                if results is None:
+                    sys.exit("The generated file can't be split.")
+                if expected is None:
+                    expected = results
+                elif results != expected:
+                    sys.exit(f"--split {options.split} -j {options.jobs} gives {results}, expected {expected}")
+                best[index] = elapsed if best[index] is None else min(best[index], elapsed)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    failed = False
+    print(f"{args.rows} rows, {cores} cores: {best[0]:.3f}s without splitting")
+    for options, elapsed in zip(sides[1:], best[1:]):
+        speedup = best[0] / elapsed
+        print(f"  --split on -j {options.jobs}: {elapsed:.3f}s, {speedup:.2f}x")
+        if 2 <= options.jobs <= cores and speedup < 1:
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
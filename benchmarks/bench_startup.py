@@ -0,0 +1,131 @@
+#!/bin/python3
+# Cold-start benchmark of the validators.
+#
+#   python3 benchmarks/bench_startup.py              # exits 1 when a script imports too much
+#   python3 benchmarks/bench_startup.py --enforce-budgets
+#   python3 benchmarks/bench_startup.py --zipapp dist/v4.pyz
+#
+# For every entry script:
+#   - importing it must not load any of the modules of LAZY_MODULES, which the scripts
+#     only import on the code paths that need them. This does not depend on the speed of
+#     the machine, so it fails the run wherever it runs, CI included;
+#   - the cumulative `-X importtime` of importing it, best of --repeat runs, is compared
+#     with IMPORT_BUDGETS_MS. Shared CI runners vary more than the budgets allow for, so
+#     this is only reported, unless --enforce-budgets is given (on a known machine).
+# The wall time of a run that stops at the header check is printed as well.
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+
+# Milliseconds, about three times what they take on a laptop with bytecode cached
+IMPORT_BUDGETS_MS = {
+    'v4': 75,
+    'my_script': 50,
+    'check_csvFile': 60,
+    'check_csvFile_v2': 60,
+    'check_csvFIle_v1': 50,
+}
+
+# Modules the scripts must not import at startup
+LAZY_MODULES = ['ipaddress', 'concurrent.futures', 'multiprocessing', 'json', 'tempfile', 'random',
+                'glob', 'sqlite3', 'socketserver', 'numpy', 'gzip', 'lzma', 'bz2']
+
+# A file that fails the header check, so a run is mostly startup
+HEADER_ONLY_CSV = 'Hostname;Ip_Address\n'
+
+
+def _env():
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    # Measure with bytecode cached, as every run after the first one is
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    return env
+
+
+# {module: cumulative microseconds} of one `python -X importtime -c "import <module>"`
+def _import_times(module):
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                               cwd=REPO_DIR, env=_env(), capture_output=True, text=True, check=True)
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative_us)
+    return times
+
+
+def check_imports(module, repeat):
+    best = None
+    loaded = set()
+    for _ in range(repeat + 1):  # the first run only writes the bytecode
+        times = _import_times(module)
+        loaded.update(times)
+        if best is None:
+            best = float('inf')
+            continue
+        best = min(best, times[module] / 1000)
+    lazy = [name for name in LAZY_MODULES if name in loaded]
+    return best, lazy
+
+
+def wall_time(command, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start benchmark of the validators.')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measure, the best one is kept')
+    parser.add_argument('--zipapp', metavar='PATH', help='also time a build of build_zipapp.py')
+    parser.add_argument('--enforce-budgets', action='store_true',
+                        help='also exit 1 when an import takes longer than its budget')
+    args = parser.parse_args()
+
+    failures = 0
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        milliseconds, lazy = check_imports(module, args.repeat)
+        status = 'ok'
+        if milliseconds > budget:
+            status = 'OVER BUDGET'
+            if args.enforce_budgets:
+                failures += 1
+        if lazy:
+            status = f"imports {', '.join(lazy)} at startup"
+            failures += 1
+        print(f"{module:>17} import {milliseconds:7.1f} ms (budget {budget} ms)  {status}")
+
+    workdir = tempfile.mkdtemp(prefix='ipgroups-startup-')
+    try:
+        path = os.path.join(workdir, 'header_only.csv')
+        with open(path, 'w') as file:
+            file.write(HEADER_ONLY_CSV)
+        commands = {'python -c pass': [sys.executable, '-c', 'pass']}
+        commands.update({f"{module}.py": [sys.executable, os.path.join(REPO_DIR, module + '.py'), path]
+                         for module in IMPORT_BUDGETS_MS})
+        if args.zipapp:
+            commands['zipapp'] = [sys.executable, args.zipapp, path]
+        for label, command in commands.items():
+            print(f"{label:>17} run    {wall_time(command, args.repeat):7.1f} ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if failures:
+        print(f"{failures} startup check(s) failed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
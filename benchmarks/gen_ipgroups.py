@@ -0,0 +1,98 @@
+#!/bin/python3
+# Deterministic generator of synthetic IP-group CSV files for the benchmarks.
+#
+#   python3 benchmarks/gen_ipgroups.py out.csv --rows 1000000 --ipv6-ratio 0.1 \
+#       --duplicate-rate 0.001 --overlap-rate 0.001 --error-at 0.5
+#
+# The same arguments and --seed always produce the same file.
+
+import sys
+import random
+import argparse
+import ipaddress
+
+# Unique host networks are handed out from here, one /32 (or /128) per row
+IPV4_BASE = int(ipaddress.IPv4Address('11.0.0.0'))
+IPV6_BASE = int(ipaddress.IPv6Address('2001:db8::'))
+
+INVALID_IP = '10.0.0.300'
+
+
+def _ipv4(value, prefixlen):
+    return f"{ipaddress.IPv4Address(value)}/{prefixlen}"
+
+
+def _ipv6(value, prefixlen):
+    return f"{ipaddress.IPv6Address(value)}/{prefixlen}"
+
+
+# Yields (hostname, ip_address) rows, without the header
+def generate_rows(rows, ipv6_ratio=0.0, duplicate_rate=0.0, overlap_rate=0.0, error_at=None, seed=0):
+    rng = random.Random(seed)
+    written = []  # earlier rows, to copy duplicates and overlaps from
+    ipv4_next = IPV4_BASE
+    ipv6_next = IPV6_BASE
+    for index in range(rows):
+        roll = rng.random()
+        if index == error_at:
+            row = (f"host{index:08d}", INVALID_IP)
+        elif written and roll < duplicate_rate:
+            row = rng.choice(written)
+        elif written and roll < duplicate_rate + overlap_rate:
+            # A wider network over an earlier host
+            hostname, ip_address = rng.choice(written)
+            network = ipaddress.ip_network(ip_address, strict=False).supernet(prefixlen_diff=8)
+            row = (f"net{index:08d}", str(network))
+        elif rng.random() < ipv6_ratio:
+            row = (f"host{index:08d}", _ipv6(ipv6_next, 128))
+            ipv6_next += 1
+        else:
+            row = (f"host{index:08d}", _ipv4(ipv4_next, 32))
+            ipv4_next += 1
+        # Only a bounded sample is kept to copy from, so huge files don't need huge memory
+        if index == error_at:
+            pass
+        elif len(written) < 10000:
+            written.append(row)
+        elif rng.random() < 0.01:
+            written[rng.randrange(len(written))] = row
+        yield row
+
+
+def write_csv(path, rows, **options):
+    with open(path, 'w', newline='') as file:
+        file.write('Hostname,Ip_Address\n')
+        file.writelines(f"{hostname},{ip_address}\n"
+                        for hostname, ip_address in generate_rows(rows, **options))
+
+
+# error_at is a row index, or a fraction of the file when below 1
+def resolve_error_at(error_at, rows):
+    if error_at is None:
+        return None
+    if error_at < 1:
+        return int(rows * error_at)
+    return int(error_at)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic IP-group CSV file.')
+    parser.add_argument('output', help='CSV file to write')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--ipv6-ratio', type=float, default=0.0)
+    parser.add_argument('--duplicate-rate', type=float, default=0.0)
+    parser.add_argument('--overlap-rate', type=float, default=0.0)
+    parser.add_argument('--error-at', type=float, default=None,
+                        help='data row index of an invalid IP, or a fraction of the file (0.5 = middle)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    write_csv(args.output, args.rows, ipv6_ratio=args.ipv6_ratio,
+              duplicate_rate=args.duplicate_rate, overlap_rate=args.overlap_rate,
+              error_at=resolve_error_at(args.error_at, args.rows), seed=args.seed)
+    print(f"Wrote {args.rows} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
+    sys.exit(0)
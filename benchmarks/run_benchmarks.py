@@ -0,0 +1,243 @@
+#!/bin/python3
+# Benchmarks of the CSV validators of the repo against each other.
+#
+#   python3 benchmarks/run_benchmarks.py --rows 10000 100000 --output bench.json
+#   python3 benchmarks/run_benchmarks.py --rows 10000 --compare bench.json
+#
+# Every check function of every validator is timed on the same generated files, on the
+# rows its main() hands them (a list of dicts, or a rowstore.RowStore), then each
+# validator's main() is run end to end as a subprocess. Results are written as JSON
+# so runs on different commits can be compared with --compare.
+
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import importlib
+import subprocess
+import contextlib
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import ipparse
+from rowstore import load_rows
+from gen_ipgroups import write_csv, resolve_error_at
+
+# check_csvFIle_v1.py is left out: its check_empty_values, check_ip_format and
+# check_duplicates return True from inside their loop, after the first row, so its
+# timings would not be comparable with the validators that read every row
+VALIDATORS = ['v4', 'my_script', 'check_csvFile', 'check_csvFile_v2']
+
+# Validators whose main() loads the rows into a RowStore rather than a list of dicts
+ROW_STORE_VALIDATORS = {'check_csvFile', 'check_csvFile_v2'}
+
+# Entries slower than the baseline by more than this ratio are flagged by --compare
+REGRESSION_RATIO = 1.10
+
+
+# (check name, function taking (module, path, header, rows)) for each validator
+def _file_check(name):
+    return name, lambda module, path, header, rows: getattr(module, name)(path)
+
+
+def _rows_check(name):
+    return name, lambda module, path, header, rows: getattr(module, name)(rows)
+
+
+# For the checks that return the rows lazily (RowStore.non_empty_rows() is a generator)
+def _consumed_rows_check(name):
+    return name, lambda module, path, header, rows: list(getattr(module, name)(rows))
+
+
+def _header_check(name):
+    return name, lambda module, path, header, rows: getattr(module, name)(header)
+
+
+FILE_BASED_CHECKS = [
+    _header_check('two_columns_exist'),
+    _file_check('there_is_empty_value_in_column'),
+    _file_check('is_good_delimiter'),
+    _file_check('is_there_duplicates'),
+    _file_check('check_valid_ip_and_mask'),
+]
+
+ROW_BASED_CHECKS = [
+    _header_check('check_columns'),
+    _rows_check('check_empty_values'),
+    _file_check('check_delimiter'),
+    _rows_check('check_ip_format'),
+    _rows_check('check_duplicates'),
+    _consumed_rows_check('remove_empty_lines'),
+]
+
+CHECKS = {
+    'v4': FILE_BASED_CHECKS + [_file_check('check_valid_hostname'), _file_check('run_checks')],
+    'my_script': FILE_BASED_CHECKS,
+    'check_csvFile': ROW_BASED_CHECKS + [_rows_check('check_hostnames'), _rows_check('check_overlaps')],
+    'check_csvFile_v2': ROW_BASED_CHECKS + [_rows_check('check_hostnames')],
+}
+
+
+def _read_rows(path):
+    with open(path, newline='') as file:
+        reader = csv.DictReader(file)
+        return reader.fieldnames, list(reader)
+
+
+def _load_store(path):
+    with open(path, newline='') as file:
+        return load_rows(file)
+
+
+# Best of `repeat` runs, the checks print so their output goes to /dev/null.
+# The parse caches are emptied first so no run profits from an earlier one.
+def _time_call(function, repeat):
+    best = None
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            ipparse.parse_network.cache_clear()
+            ipparse.parse_network_bytes.cache_clear()
+            start = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def time_checks(path, rows_count, repeat, validators):
+    results = []
+    dict_rows = _read_rows(path)
+    store_rows = None
+    for name in validators:
+        module = importlib.import_module(name)
+        if name in ROW_STORE_VALIDATORS:
+            # Loading is part of the cost of the RowStore path, it is timed on its own
+            seconds = _time_call(lambda: _load_store(path), repeat)
+            results.append({'validator': name, 'check': 'load_rows', 'rows': rows_count,
+                            'seconds': round(seconds, 6)})
+            if store_rows is None:
+                store_rows = _load_store(path)
+            header, rows = store_rows
+        else:
+            header, rows = dict_rows
+        for check_name, check in CHECKS[name]:
+            seconds = _time_call(lambda: check(module, path, header, rows), repeat)
+            results.append({'validator': name, 'check': check_name, 'rows': rows_count,
+                            'seconds': round(seconds, 6)})
+    return results
+
+
+# Runs `python3 <validator>.py file.csv` from the directory of the file, because the
+# check_csvFile* scripts write validated_<file> next to the relative path they get
+def time_mains(path, rows_count, repeat, validators):
+    results = []
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    directory, filename = os.path.split(path)
+    for name in validators:
+        script = os.path.join(REPO_DIR, name + '.py')
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            completed = subprocess.run([sys.executable, script, filename], cwd=directory, env=env,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results.append({'validator': name, 'check': 'main', 'rows': rows_count,
+                        'seconds': round(best, 6), 'exit_code': completed.returncode})
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    old = {(entry['validator'], entry['check'], entry['rows']): entry['seconds']
+           for entry in baseline['results']}
+    regressions = 0
+    for entry in results:
+        key = (entry['validator'], entry['check'], entry['rows'])
+        if key not in old or not old[key]:
+            continue
+        ratio = entry['seconds'] / old[key]
+        flag = ''
+        if ratio > REGRESSION_RATIO:
+            flag = '  <-- slower'
+            regressions += 1
+        print(f"{entry['validator']:>17} {entry['check']:<32} {entry['rows']:>9} rows "
+              f"{old[key]:10.4f}s -> {entry['seconds']:10.4f}s  x{ratio:.2f}{flag}")
+    print(f"{regressions} regression(s) against {baseline_path} (commit {baseline['meta'].get('commit')})")
+    return regressions == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the CSV validators.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000],
+                        help='sizes of the generated files (10k to 10M rows)')
+    parser.add_argument('--ipv6-ratio', type=float, default=0.0)
+    parser.add_argument('--duplicate-rate', type=float, default=0.0)
+    parser.add_argument('--overlap-rate', type=float, default=0.0)
+    parser.add_argument('--error-at', type=float, default=None,
+                        help='data row index of an invalid IP, or a fraction of the file')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per entry, the best one is kept')
+    parser.add_argument('--validators', nargs='+', choices=VALIDATORS, default=VALIDATORS)
+    parser.add_argument('--skip-main', action='store_true', help='only time the check functions')
+    parser.add_argument('--output', default='bench_results.json', help='JSON file to write')
+    parser.add_argument('--compare', metavar='BASELINE', help='JSON results of an earlier run')
+    args = parser.parse_args()
+
+    results = []
+    workdir = tempfile.mkdtemp(prefix='ipgroups-bench-')
+    try:
+        for rows_count in args.rows:
+            path = os.path.join(workdir, f"ipgroups_{rows_count}.csv")
+            write_csv(path, rows_count, ipv6_ratio=args.ipv6_ratio, duplicate_rate=args.duplicate_rate,
+                      overlap_rate=args.overlap_rate, error_at=resolve_error_at(args.error_at, rows_count),
+                      seed=args.seed)
+            print(f"Timing {rows_count} rows...")
+            results.extend(time_checks(path, rows_count, args.repeat, args.validators))
+            if not args.skip_main:
+                results.extend(time_mains(path, rows_count, args.repeat, args.validators))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'generator': {'ipv6_ratio': args.ipv6_ratio, 'duplicate_rate': args.duplicate_rate,
+                          'overlap_rate': args.overlap_rate, 'error_at': args.error_at,
+                          'seed': args.seed},
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    for entry in results:
+        print(f"{entry['validator']:>17} {entry['check']:<32} {entry['rows']:>9} rows {entry['seconds']:10.4f}s")
+    print(f"Results written to {args.output}")
+
+    if args.compare and not compare(results, args.compare):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,24 +2,20 @@
 # This py is used to verify the content fo a valid csv file in our IP groups automation
 import sys
 import csv
-import ipaddress
+
+from prescan import scan_file
+from ipparse import is_valid_network
+from schema import header_error
 
 # Check if valid ip address in CSV file
 def is_valid_ip(ip_str):
-    try:
-        ipaddress.ip_network(ip_str, strict=False)
-        return True
-    except ValueError:
-        return False
+    return is_valid_network(ip_str)
 
-# Check that 2 columns exist in CSV file
+# Check that the header has the columns of the schema (see schema.py)
 def check_columns(header):
-    required_columns = ['Hostname', 'Ip_Address']
-    if required_columns[0] not in header or required_columns[1] not in header:
-        print("Error: CSV file must contain 'Hostname' and 'Ip_Address' columns.")
-        return False
-    if header[0] != 'Hostname' or header[1] != 'Ip_Address':
-        print("Error: First row must contain 'Hostname' and 'Ip_address'.")
+    error = header_error(header)
+    if error is not None:
+        print(error)
         return False
     return True
 
@@ -42,30 +38,27 @@ def check_empty_values(rows):
 #                 return False
 #             return True
 
-def check_delimiter(file_path):
-    with open(file_path, 'r', newline='') as csvfile:
-        # Sniff to deduce the dialect (if needed)
-        dialect = csv.Sniffer().sniff(csvfile.read(1024))
-        csvfile.seek(0)  # Reset file pointer to the beginning
-        
-        # Check if the detected delimiter is a comma
-        if dialect.delimiter != ',':
-            print("The detected delimiter is not a comma.")
-            return False
-        
-        # Create a CSV reader object using the detected dialect
-        reader = csv.reader(csvfile, dialect)
-        
-        # Iterate over each row and check for the correct number of fields
-        for row_number, row in enumerate(reader, start=1):
-            # Check if each row has more than one field (assuming that's the expectation)
-            if len(row) <= 1:
-                print(f"Row {row_number} does not seem to use ',' as a delimiter.")
-                return False
-        
-        # If all rows are checked and the delimiter is consistent
-        print("All rows use ',' as the delimiter.")
-        return True  
+def check_delimiter(file_path, facts=None):
+    if facts is None:
+        facts = scan_file(file_path)
+
+    # Check if the detected delimiter is a comma
+    if facts.delimiter != ',':
+        print("The detected delimiter is not a comma.")
+        return False
+
+    # Check if each row has more than one field (assuming that's the expectation)
+    if facts.first_short_line is not None:
+        print(f"Row {facts.first_short_line} does not seem to use ',' as a delimiter.")
+        return False
+    # A row with more fields than the header has values no column is named for
+    if facts.first_long_line is not None:
+        print(f"Row {facts.first_long_line} has more fields than the header.")
+        return False
+
+    # If all rows are checked and the delimiter is consistent
+    print("All rows use ',' as the delimiter.")
+    return True
         # if ',' not in row['Hostname']:
         #     print(f"Error: Hostname '{row['Hostname']}' does not contain ','.")
         #     return False
@@ -97,15 +90,17 @@ def check_duplicates(rows):
 def remove_empty_lines(rows):
     return [row for row in rows if any(row.values())]
 
-def is_csv_file(file_path):
+# Pre-scan the raw bytes of the file once, None when it does not exist
+def prescan(file_path):
     try:
-        with open(file_path, 'r') as file:
-            dialect = csv.Sniffer().sniff(file.read(1024))
-            if dialect.delimiter == ',' or dialect.delimiter == ';':
-                return True
-        return True
-    except (csv.Error, FileNotFoundError):
-        return False
+        return scan_file(file_path)
+    except FileNotFoundError:
+        return None
+
+def is_csv_file(file_path, facts=None):
+    if facts is None:
+        facts = prescan(file_path)
+    return facts is not None and facts.delimiter is not None
 
 def main():
     if len(sys.argv) != 2:
@@ -113,8 +108,9 @@ def main():
         sys.exit(1)
 
     input_csv_file = sys.argv[1]
+    facts = prescan(input_csv_file)
 
-    if is_csv_file(input_csv_file):
+    if is_csv_file(input_csv_file, facts):
         # print("The file is a valid CSV file.")
         try:
             with open(input_csv_file, newline='') as csvfile:
@@ -129,7 +125,7 @@ def main():
                 if not check_empty_values(rows):
                     sys.exit(1)
             
-                if not check_delimiter(input_csv_file): #rows, dialect):
+                if not check_delimiter(input_csv_file, facts): #rows, dialect):
                     sys.exit(1)
             
                 if not check_ip_format(rows):
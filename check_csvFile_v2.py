@@ -2,30 +2,32 @@
 
 import sys
 import csv
-import ipaddress
-import os
+
+from prescan import scan_file
+from rowstore import RowStore, load_rows
+from csvio import csv_name, open_text, atomic_writer, with_compression, pop_compress_option
+from dedupe import canonical_hostname, ip_key, pop_duplicates_option
+from hostnames import hostname_rule
+from schema import header_error
+from ipparse import is_valid_network
 
 # Check if valid IP address in CSV file
 def is_valid_ip(ip_str):
-    try:
-        ipaddress.ip_network(ip_str, strict=False)
-        return True
-    except ValueError:
-        return False
+    return is_valid_network(ip_str)
 
-# Check that 2 columns exist in CSV file
+# Check that the header has the columns of the schema (see schema.py)
 def check_columns(header):
-    required_columns = ['Hostname', 'Ip_Address']
-    if required_columns[0] not in header or required_columns[1] not in header:
-        print("Error: CSV file must contain 'Hostname' and 'Ip_Address' columns.")
-        return False
-    if header[0] != 'Hostname' or header[1] != 'Ip_Address':
-        print("Error: First row must contain 'Hostname' and 'Ip_address'.")
+    error = header_error(header)
+    if error is not None:
+        print(error)
         return False
     return True
 
 # Check that no empty rows exist
 def check_empty_values(rows):
+    if isinstance(rows, RowStore):
+        index = rows.first_empty(['Hostname', 'Ip_Address'])
+        rows = [] if index is None else [rows.row(index)]
     for row in rows:
         if not row['Hostname'] or not row['Ip_Address']:
             print(f"Error: CSV file contains empty values in row {row}.")
@@ -33,30 +35,45 @@ def check_empty_values(rows):
     return True
 
 # Check that delimiter is ','
-def check_delimiter(file_path):
-    with open(file_path, 'r', newline='') as csvfile:
-        # Sniff to deduce the dialect (if needed)
-        dialect = csv.Sniffer().sniff(csvfile.read(1024))
-        csvfile.seek(0)  # Reset file pointer to the beginning
-
-        # Check if the detected delimiter is a comma
-        if dialect.delimiter != ',':
-            print("Error: The detected delimiter is not a comma. Please use ',' as the delimiter.")
-            return False
+def check_delimiter(file_path, facts=None):
+    if facts is None:
+        facts = scan_file(file_path)
 
-        # Create a CSV reader object using the detected dialect
-        reader = csv.reader(csvfile, dialect)
+    # Check if the detected delimiter is a comma
+    if facts.delimiter != ',':
+        print("Error: The detected delimiter is not a comma. Please use ',' as the delimiter.")
+        return False
 
-        # Iterate over each row and check for the correct number of fields
-        for row_number, row in enumerate(reader, start=1):
-            if len(row) <= 1:
-                print(f"Error: Row {row_number} does not seem to use ',' as a delimiter.")
-                return False
-        print("All rows use ',' as the delimiter.")
-        return True
+    # Check that every row has more than one field
+    if facts.first_short_line is not None:
+        print(f"Error: Row {facts.first_short_line} does not seem to use ',' as a delimiter.")
+        return False
+    # A row with more fields than the header has values no column is named for
+    if facts.first_long_line is not None:
+        print(f"Error: Row {facts.first_long_line} has more fields than the header.")
+        return False
+    print("All rows use ',' as the delimiter.")
+    return True
+
+# Check that hostnames are RFC 1123 names following the naming convention of
+# $IPGROUPS_HOSTNAME_PATTERN, if set (see hostnames.py)
+def check_hostnames(rows):
+    rule = hostname_rule()
+    if isinstance(rows, RowStore):
+        index = rows.first_rejected('Hostname', rule.invalid)
+        rows = [] if index is None else [rows.row(index)]
+    for row in rows:
+        reason = rule.error(row['Hostname']) if row['Hostname'] else None
+        if reason is not None:
+            print(f"Error: Hostname '{row['Hostname']}' is not valid, {reason}.")
+            return False
+    return True
 
 # Check for valid IP address
 def check_ip_format(rows):
+    if isinstance(rows, RowStore):
+        index = rows.first_invalid_ip()
+        rows = [] if index is None else [rows.row(index)]
     for row in rows:
         if not is_valid_ip(row['Ip_Address']):
             print(f"Error: IP address '{row['Ip_Address']}' is not valid.")
@@ -64,58 +81,87 @@ def check_ip_format(rows):
     return True
 
 # Check that no duplicate values exist in a row
-def check_duplicates(rows):
+# canonical: compare hostnames and networks by meaning, not spelling (see dedupe.py)
+def check_duplicates(rows, canonical=False):
+    if isinstance(rows, RowStore):
+        duplicate = rows.first_duplicate(canonical=canonical)
+        if duplicate is None:
+            return True
+        column, index = duplicate
+        if column == 'Hostname':
+            print(f"Error: Duplicate hostname '{rows.value(index, column)}' found.")
+        else:
+            print(f"Error: Duplicate IP address '{rows.value(index, column)}' found.")
+        return False
     hostnames = set()
     ip_addresses = set()
     for row in rows:
-        if row['Hostname'] in hostnames:
+        hostname = canonical_hostname(row['Hostname']) if canonical else row['Hostname']
+        ip_address = ip_key(row['Ip_Address']) if canonical else row['Ip_Address']
+        if hostname in hostnames:
             print(f"Error: Duplicate hostname '{row['Hostname']}' found.")
             return False
-        if row['Ip_Address'] in ip_addresses:
+        if ip_address in ip_addresses:
             print(f"Error: Duplicate IP address '{row['Ip_Address']}' found.")
             return False
-        hostnames.add(row['Hostname'])
-        ip_addresses.add(row['Ip_Address'])
+        hostnames.add(hostname)
+        ip_addresses.add(ip_address)
     return True
 
 # Remove empty lines from rows
 def remove_empty_lines(rows):
+    if isinstance(rows, RowStore):
+        return rows.non_empty_rows()
     return [row for row in rows if any(row.values())]
 
+# Pre-scan the raw bytes of the file once, None when it does not exist or can't be
+# decompressed
+def prescan(file_path, limit=None):
+    try:
+        return scan_file(file_path, limit)
+    except Exception:
+        return None
+
 # Check if the file is a valid CSV file
-def is_csv_file(file_path):
-    if not file_path.lower().endswith('.csv'):
+def is_csv_file(file_path, facts=None):
+    if not csv_name(file_path).lower().endswith('.csv'):
         print("Error: The file does not have a .csv extension.")
         return False
 
-    try:
-        with open(file_path, 'r') as file:
-            dialect = csv.Sniffer().sniff(file.read(1024))
-            if dialect.delimiter in [',', ';']:
-                return True
-            else:
-                print("Error: The file does not contain ',' or ';' as delimiters.")
-                return False
-    except (csv.Error, FileNotFoundError):
+    if facts is None:
+        facts = prescan(file_path, limit=1024)  # the delimiter only needs the header
+    if facts is None or facts.delimiter is None:
         print("Error: Not a valid CSV file...")
         return False
+    if facts.delimiter in [',', ';']:
+        return True
+    else:
+        print("Error: The file does not contain ',' or ';' as delimiters.")
+        return False
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python filecsv.py <input_csv_file>")
+    args = sys.argv[1:]
+    # --compress: compression of the validated_ file, the one of the input by default
+    # --duplicates canonical: 10.0.0.2/24 repeats 10.0.0.0/24, DB01 repeats db01
+    try:
+        compress = pop_compress_option(args)
+        canonical = pop_duplicates_option(args)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if len(args) != 1:
+        print("Usage: python filecsv.py [--compress gz|xz|bz2|none] [--duplicates strict|canonical] <input_csv_file>")
         sys.exit(1)
 
-    input_csv_file = sys.argv[1]
+    input_csv_file = args[0]
 
     if is_csv_file(input_csv_file):
         try:
             # if not check_delimiter(input_csv_file):
             #     sys.exit(1)
 
-            with open(input_csv_file, newline='') as csvfile:
-                reader = csv.DictReader(csvfile)
-                header = reader.fieldnames
-                rows = list(reader)
+            with open_text(input_csv_file) as csvfile:
+                header, rows = load_rows(csvfile)
 
                 if not check_columns(header):
                     sys.exit(1)
@@ -123,16 +169,22 @@ def main():
                 if not check_empty_values(rows):
                     sys.exit(1)
 
+                if not check_hostnames(rows):
+                    sys.exit(1)
+
                 if not check_ip_format(rows):
                     sys.exit(1)
 
-                if not check_duplicates(rows):
+                if not check_duplicates(rows, canonical):
                     sys.exit(1)
 
+                # One row at a time from the row store into the buffered writer
                 cleaned_rows = remove_empty_lines(rows)
                 output_csv_file = "validated_" + input_csv_file
+                if compress is not None:
+                    output_csv_file = with_compression(output_csv_file, compress)
                 
-                with open(output_csv_file, 'w', newline='') as csvfile:
+                with atomic_writer(output_csv_file) as csvfile:
                     writer = csv.DictWriter(csvfile, fieldnames=header)
                     writer.writeheader()
                     writer.writerows(cleaned_rows)
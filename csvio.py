@@ -0,0 +1,103 @@
+#!/bin/python3
+# Compressed inputs and atomic outputs for the IP groups scripts.
+#
+# A path ending with .gz, .xz or .bz2 (ip.csv.gz) is read through gzip, lzma or bz2 as a
+# stream: nothing is decompressed to disk and only a buffer of it is in memory at a time.
+# Outputs go through atomic_writer(): they are written to a temporary file next to their
+# final path, which is renamed over it once complete, so a failed run never leaves a
+# truncated validated_ file behind. An output path with one of the suffixes is compressed.
+# The compression modules (and tempfile) are only imported by the runs that need them.
+
+import io
+import os
+from contextlib import contextmanager
+
+# Suffix -> module of its compression
+COMPRESSIONS = {'.gz': 'gzip', '.xz': 'lzma', '.bz2': 'bz2'}
+
+# Buffer between the csv writer and the (compressed) output file
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def compression_suffix(path):
+    for suffix in COMPRESSIONS:
+        if path.lower().endswith(suffix):
+            return suffix
+    return None
+
+
+# Path without its compression suffix, for the .csv extension check
+def csv_name(path):
+    suffix = compression_suffix(path)
+    return path[:-len(suffix)] if suffix else path
+
+
+def is_compressed(path):
+    return compression_suffix(path) is not None
+
+
+def _module(suffix):
+    import importlib
+    return importlib.import_module(COMPRESSIONS[suffix])
+
+
+# Binary stream of the (decompressed) content of a file
+def open_binary(path):
+    suffix = compression_suffix(path)
+    if suffix is None:
+        return open(path, 'rb')
+    return _module(suffix).open(path, 'rb')
+
+
+# Text stream of the (decompressed) content of a file, decoded like open() would
+def open_text(path, newline=''):
+    suffix = compression_suffix(path)
+    if suffix is None:
+        return open(path, mode='r', newline=newline)
+    return _module(suffix).open(path, 'rt', newline=newline)
+
+
+# Same path with its compression suffix replaced: '.gz', '.xz', '.bz2', or '' for none
+def with_compression(path, suffix):
+    return csv_name(path) + suffix
+
+
+# Takes "--compress gz|xz|bz2|none" out of a list of command line arguments.
+# Returns the suffix for with_compression(), None when the option is not there, or
+# raises ValueError.
+def pop_compress_option(args):
+    if '--compress' not in args:
+        return None
+    position = args.index('--compress')
+    value = args[position + 1] if position + 1 < len(args) else ''
+    del args[position:position + 2]
+    if value == 'none':
+        return ''
+    if '.' + value not in COMPRESSIONS:
+        raise ValueError(f"--compress takes gz, xz, bz2 or none, not {value!r}")
+    return '.' + value
+
+
+def _file_mode():
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+# Yields a text stream whose content replaces `path` when the block ends without error
+@contextmanager
+def atomic_writer(path, newline=''):
+    import tempfile
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '-')
+    try:
+        os.fchmod(fd, _file_mode())  # mkstemp files are private
+        with os.fdopen(fd, 'wb', buffering=WRITE_BUFFER_SIZE) as raw:
+            suffix = compression_suffix(path)
+            stream = raw if suffix is None else _module(suffix).open(raw, 'wb')
+            with io.TextIOWrapper(stream, newline=newline) as text:
+                yield text
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
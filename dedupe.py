@@ -0,0 +1,124 @@
+#!/bin/python3
+# Keys of the duplicate checks.
+#
+# strict (the default) compares the values as they are written, so "10.10.10.2/24",
+# "10.10.10.0/24" and " 10.10.10.0/24" are three different networks. canonical compares
+# what they mean instead:
+#   - a network is its parsed form (host bits cleared, spaces around it ignored) packed
+#     into one int, see network_key(); 10.0.0.1 and 10.0.0.1/32 are the same network;
+#   - a hostname is compared without the case, the spaces around it and the root dot.
+# A canonical row key is one bytes object rather than a tuple of two strings, so the set
+# of keys also takes several times less memory on large files.
+#
+# For files whose keys don't fit in memory at all, the bounded mode of v4.py
+# (--dedupe-memory) works on 16-byte digests of the keys: sorted runs of
+# (digest, row number) records are spilled and merged (see extsort.py), and with --bloom
+# a BloomFilter pass tells the files without any duplicate apart without spilling.
+
+import struct
+import hashlib
+
+from ipparse import parse_network
+
+DUPLICATE_MODES = ('strict', 'canonical')
+
+# Bytes of a network_key(): a 128-bit address, a prefix byte and the version bit
+NETWORK_KEY_BYTES = 18
+
+
+# Parsed network as one int, equal exactly for the same version, network and prefix
+def network_key(parsed):
+    version, network, prefixlen = parsed
+    return (network << 8 | prefixlen) << 1 | (version == 6)
+
+
+def canonical_hostname(hostname):
+    if hostname is None:
+        return None
+    return hostname.strip().lower().rstrip('.')
+
+
+# Canonical key of an Ip_Address value: its network_key(), or the stripped text when it
+# is not a network (the IP check reports it)
+def ip_key(ip_address):
+    if ip_address is None:
+        return None
+    text = ip_address.strip()
+    try:
+        return network_key(parse_network(text))
+    except ValueError:
+        return text
+
+
+# Canonical key of a (Hostname, Ip_Address) row; str fields, or bytes from the mmap reader
+def row_key(hostname, ip_address):
+    if hostname.__class__ is bytes:
+        hostname = hostname.decode('utf-8', 'surrogateescape')
+        ip_address = ip_address.decode('utf-8', 'surrogateescape')
+    hostname = canonical_hostname(hostname)
+    key = ip_key(ip_address)
+    if key.__class__ is str:
+        # Never equal to the bytes of a network
+        return hostname, key
+    return key.to_bytes(NETWORK_KEY_BYTES, 'big') + hostname.encode('utf-8', 'surrogateescape')
+
+
+# Bytes a (digest, row_number) record takes in memory, list slot included; the runs of
+# the bounded mode are sized with it
+RECORD_BYTES = 160
+
+# Bit positions of a key in a BloomFilter, from its digest
+BLOOM_WORDS = struct.Struct('<4I')
+
+# Largest BloomFilter 32-bit positions can address
+BLOOM_MAX_BYTES = 1 << 29
+
+
+# Fixed-size stand-in for a key, strict or canonical
+def key_digest(key):
+    return hashlib.blake2b(repr(key).encode(), digest_size=16).digest()
+
+
+# Row numbers repeating an earlier row with the same key, from (digest, row_number)
+# records sorted by digest then row number
+def repeated_rows(records):
+    previous = None
+    for digest, row_number in records:
+        if digest == previous:
+            yield row_number
+        previous = digest
+
+
+# Bloom filter over key digests, in `size` bytes (512 MiB at most). The digest is
+# already a uniform hash, its four 32-bit words are the bit positions: no false
+# negatives, and under 0.5% false positives at 16 bits per key.
+class BloomFilter:
+    def __init__(self, size):
+        self.bits = bytearray(min(max(1, size), BLOOM_MAX_BYTES))
+        self.positions = len(self.bits) * 8
+
+    # Adds a digest, returns whether it may have been added before
+    def add(self, digest):
+        bits = self.bits
+        positions = self.positions
+        seen = True
+        for position in BLOOM_WORDS.unpack(digest):
+            position %= positions
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                seen = False
+        return seen
+
+
+# Takes "--duplicates strict|canonical" out of a list of command line arguments.
+# Returns whether duplicates are canonical, or raises ValueError.
+def pop_duplicates_option(args):
+    if '--duplicates' not in args:
+        return False
+    position = args.index('--duplicates')
+    value = args[position + 1] if position + 1 < len(args) else ''
+    del args[position:position + 2]
+    if value not in DUPLICATE_MODES:
+        raise ValueError(f"--duplicates takes strict or canonical, not {value!r}")
+    return value == 'canonical'
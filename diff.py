@@ -0,0 +1,212 @@
+#!/bin/python3
+# Entries added, removed and changed between two versions of a group CSV, so the
+# firewall automation only has to push the delta.
+#
+#   python3 diff.py ip.csv ip2.csv                  # one JSON object per line
+#   export | python3 diff.py ip.csv -               # new version streamed on stdin
+#   python3 diff.py old.csv new.csv --merge         # force the sorted merge
+#
+# An entry is keyed on its Hostname and its network in canonical form (host bits
+# cleared, as ipparse.parse_network returns it), so "10.10.10.2/24" and "10.10.10.0/24"
+# are the same entry. It is changed when another column differs, the spelling of its
+# Ip_Address included:
+#   {"change": "added", "hostname": ..., "network": ..., "row": 3, "values": {...}}
+#   {"change": "removed", ...}                    # row and values of the old file
+#   {"change": "changed", "hostname": ..., "network": ..., "old_row": 2, "new_row": 2,
+#    "old": {...}, "new": {...}}                  # only the columns that differ
+#
+# When the old file is under HASH_JOIN_MAX_BYTES it is loaded into a dict and the new
+# one is streamed against it (hash join): changes come in the order of the new file,
+# then the removed entries. Larger files, or an old version read from stdin, are sorted
+# on disk and merged (see extsort.py): changes come in key order.
+# Both files must pass the IP and duplicate checks of v4.py, an invalid network or a
+# repeated entry stops the diff with exit code 1; don't push a delta from such a run.
+
+import os
+import sys
+import csv
+import json
+import argparse
+from operator import itemgetter
+from contextlib import contextmanager
+
+from ipparse import parse_network, format_network
+from extsort import sort_external
+from csvio import open_text, is_compressed
+from schema import IPGROUPS_SCHEMA, required_columns
+
+REQUIRED_COLUMNS = required_columns(IPGROUPS_SCHEMA)
+
+# Path that stands for the standard input
+STDIN_PATH = '-'
+
+# Largest old file loaded whole for the hash join, the merge is used above
+HASH_JOIN_MAX_BYTES = 256 * 1024 * 1024
+
+
+@contextmanager
+def _open_csv(path):
+    if path == STDIN_PATH:
+        sys.stdin.reconfigure(newline='')
+        yield sys.stdin
+        return
+    with open_text(path) as file:
+        yield file
+
+
+# Yields (key, row_number, values) for every data row of a group CSV, where key is
+# (hostname, parsed network) and values holds the columns other than Hostname.
+# Blank lines are skipped but still counted in the row numbers.
+def read_entries(path):
+    with _open_csv(path) as file:
+        reader = csv.reader(file)
+        header = next(reader, None) or []
+        missing = [column for column in REQUIRED_COLUMNS if column not in header]
+        if missing:
+            raise ValueError(f"{path} has no {' or '.join(repr(column) for column in missing)} column.")
+        for row_number, row in enumerate(reader, start=2):
+            if not row:
+                continue
+            values = dict(zip(header, row))
+            hostname = values.pop('Hostname', '')
+            ip_address = values.get('Ip_Address', '')
+            try:
+                parsed = parse_network(ip_address)
+            except ValueError:
+                raise ValueError(f"Row {row_number} of {path}: invalid IP address {ip_address!r}.") from None
+            yield (hostname, parsed), row_number, values
+
+
+def _repeated(path, key, first_row, row_number):
+    hostname, parsed = key
+    return ValueError(f"Row {row_number} of {path} repeats {hostname} {format_network(parsed)} "
+                      f"of row {first_row}.")
+
+
+def _entry(change, key, row_number, values):
+    hostname, parsed = key
+    return {'change': change, 'hostname': hostname, 'network': format_network(parsed),
+            'row': row_number, 'values': values}
+
+
+# None when the two versions of an entry are the same
+def _changed(key, old_row, old_values, new_row, new_values):
+    columns = [column for column in dict.fromkeys([*old_values, *new_values])
+               if old_values.get(column) != new_values.get(column)]
+    if not columns:
+        return None
+    hostname, parsed = key
+    return {'change': 'changed', 'hostname': hostname, 'network': format_network(parsed),
+            'old_row': old_row, 'new_row': new_row,
+            'old': {column: old_values.get(column) for column in columns},
+            'new': {column: new_values.get(column) for column in columns}}
+
+
+# The old file in a dict, the new one streamed against it
+def hash_join(old_path, new_path):
+    old = {}
+    for key, row_number, values in read_entries(old_path):
+        if key in old:
+            raise _repeated(old_path, key, old[key][0], row_number)
+        old[key] = (row_number, values)
+
+    seen = {}
+    for key, row_number, values in read_entries(new_path):
+        if key in seen:
+            raise _repeated(new_path, key, seen[key], row_number)
+        seen[key] = row_number
+        previous = old.pop(key, None)
+        if previous is None:
+            yield _entry('added', key, row_number, values)
+        else:
+            change = _changed(key, previous[0], previous[1], row_number, values)
+            if change is not None:
+                yield change
+
+    for key, (row_number, values) in sorted(old.items(), key=lambda item: item[1][0]):
+        yield _entry('removed', key, row_number, values)
+
+
+# Entries of a file in key order, sorted on disk when there are many
+def _sorted_entries(path):
+    previous = None
+    for key, row_number, values in sort_external(read_entries(path), key=itemgetter(0)):
+        if previous is not None and previous[0] == key:
+            raise _repeated(path, key, min(previous[1], row_number), max(previous[1], row_number))
+        previous = (key, row_number)
+        yield key, row_number, values
+
+
+# Both files sorted by key, then walked side by side
+def merge_join(old_path, new_path):
+    old_entries = _sorted_entries(old_path)
+    new_entries = _sorted_entries(new_path)
+    old = next(old_entries, None)
+    new = next(new_entries, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            yield _entry('removed', *old)
+            old = next(old_entries, None)
+        elif old is None or new[0] < old[0]:
+            yield _entry('added', *new)
+            new = next(new_entries, None)
+        else:
+            change = _changed(old[0], old[1], old[2], new[1], new[2])
+            if change is not None:
+                yield change
+            old = next(old_entries, None)
+            new = next(new_entries, None)
+
+
+def choose_method(old_path):
+    # The size of a compressed file says little about the dict it would take
+    if old_path != STDIN_PATH and not is_compressed(old_path) and os.path.getsize(old_path) <= HASH_JOIN_MAX_BYTES:
+        return 'hash'
+    return 'merge'
+
+
+# Yields the changes from old_path to new_path, method is 'hash', 'merge' or None to pick
+def diff_files(old_path, new_path, method=None):
+    if method is None:
+        method = choose_method(old_path)
+    if method == 'hash':
+        return hash_join(old_path, new_path)
+    return merge_join(old_path, new_path)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='diff.py',
+        description='List the entries added, removed and changed between two versions of a group CSV.')
+    parser.add_argument('old_csv_file', help=f"previous version, '{STDIN_PATH}' reads the standard input")
+    parser.add_argument('new_csv_file', help=f"new version, '{STDIN_PATH}' reads the standard input")
+    method = parser.add_mutually_exclusive_group()
+    method.add_argument('--hash', dest='method', action='store_const', const='hash',
+                        help='load the old file in memory, whatever its size')
+    method.add_argument('--merge', dest='method', action='store_const', const='merge',
+                        help='sort both files on disk and merge them, whatever their size')
+    args = parser.parse_args(argv)
+    if args.old_csv_file == STDIN_PATH and args.new_csv_file == STDIN_PATH:
+        parser.error('only one of the files can be read from the standard input')
+    return args
+
+
+## Main section
+def main():
+    args = parse_args(sys.argv[1:])
+    counts = {'added': 0, 'removed': 0, 'changed': 0}
+    try:
+        for change in diff_files(args.old_csv_file, args.new_csv_file, args.method):
+            counts[change['change']] += 1
+            print(json.dumps(change))
+    except FileNotFoundError as e:
+        print(f"Error: File {e.filename} not found.", file=sys.stderr)
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"{counts['added']} added, {counts['removed']} removed, {counts['changed']} changed", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/bin/python3
+# External merge sort for record streams that may not fit in memory.
+#
+# sort_external() (or ExternalSorter) sorts the records by runs of `run_size` in memory.
+# Every full run is pickled, by batches of `batch_size` records, to the end of one
+# anonymous temporary file. Once every record is in, the runs are merged FAN_IN at a
+# time into a second file, pass after pass, until FAN_IN runs at most are left to be
+# merged as they are read. So the sort holds one run, or one batch per merged run, in
+# memory and two files open, however many runs there are. A stream shorter than one run
+# never touches the disk, nor imports pickle and tempfile. ExternalSorter.for_budget()
+# sizes the runs and the batches from a byte budget.
+
+import heapq
+from itertools import islice
+
+# Records sorted in memory before a run is spilled to disk
+RUN_SIZE = 200000
+
+# Records pickled together, one pickle per record would be slow and one per run would
+# have to be loaded whole to be merged
+BATCH_SIZE = 1024
+
+# Runs merged together, each one holds a batch in memory while it is merged
+FAN_IN = 16
+
+
+# Yields the records in sorted order; key works as for sorted()
+def sort_external(records, key=None, run_size=RUN_SIZE, batch_size=BATCH_SIZE):
+    sorter = ExternalSorter(key, run_size, batch_size)
+    try:
+        for record in records:
+            sorter.add(record)
+        yield from sorter.merged()
+    finally:
+        sorter.close()
+
+
+# Same as sort_external() for records that are pushed one at a time (by a row visitor)
+# rather than pulled from an iterable. Close it once done with merged().
+class ExternalSorter:
+    def __init__(self, key=None, run_size=RUN_SIZE, batch_size=BATCH_SIZE, fan_in=FAN_IN):
+        self.key = key
+        self.run_size = max(1, run_size)
+        self.batch_size = max(1, batch_size)
+        self.fan_in = max(2, fan_in)
+        # Filled in place, callers that never spill may bind its append method
+        self.run = []
+        self.file = None  # temporary file of the spilled runs
+        self.runs = []  # (start, end) offsets of every spilled run in the file
+        self.spilled_runs = 0
+        self.merge_passes = 0
+
+    # Sorter of records taking about `record_bytes` each in memory, that holds about
+    # `memory` bytes of them at a time: a run, or the batches of the runs merged together
+    @classmethod
+    def for_budget(cls, memory, record_bytes, key=None, fan_in=FAN_IN):
+        records = max(1, memory // record_bytes)
+        # One more batch is being written out by the merge passes
+        return cls(key, records, records // (fan_in + 1), fan_in)
+
+    def add(self, record):
+        self.run.append(record)
+        if len(self.run) >= self.run_size:
+            self.spill()
+
+    # Writes the records added since the last spill to the file, as one sorted run
+    def spill(self):
+        if not self.run:
+            return
+        self.run.sort(key=self.key)
+        if self.file is None:
+            self.file = _temporary_file()
+        self.runs.append(_write_run(self.file, self.run, self.batch_size))
+        self.spilled_runs += 1
+        self.run.clear()
+
+    # The records added so far, in sorted order
+    def merged(self):
+        if not self.runs:
+            self.run.sort(key=self.key)
+            return iter(self.run)
+        self.spill()
+        while len(self.runs) > self.fan_in:
+            self._merge_pass()
+        return heapq.merge(*[_read_run(self.file, start, end) for start, end in self.runs], key=self.key)
+
+    # Merges the runs FAN_IN at a time into a new file, which replaces the current one
+    def _merge_pass(self):
+        file = _temporary_file()
+        try:
+            runs = []
+            for first in range(0, len(self.runs), self.fan_in):
+                group = [_read_run(self.file, start, end) for start, end in self.runs[first:first + self.fan_in]]
+                runs.append(_write_run(file, heapq.merge(*group, key=self.key), self.batch_size))
+        except BaseException:
+            file.close()
+            raise
+        self.file.close()
+        self.file = file
+        self.runs = runs
+        self.merge_passes += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.runs = []
+        self.run.clear()
+
+
+def _temporary_file():
+    import tempfile
+    return tempfile.TemporaryFile(prefix='ipgroups-runs-')
+
+
+# Appends sorted records to the file, returns the (start, end) offsets of the run
+def _write_run(file, records, batch_size):
+    import pickle
+    start = file.seek(0, 2)
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        pickle.dump(batch, file, pickle.HIGHEST_PROTOCOL)
+    return start, file.tell()
+
+
+# Records of one run of the file. The runs merged together share the file, so every
+# batch is read from where the previous one of the run ended.
+def _read_run(file, start, end):
+    import pickle
+    position = start
+    while position < end:
+        file.seek(position)
+        batch = pickle.load(file)
+        position = file.tell()
+        yield from batch
@@ -0,0 +1,276 @@
+#!/bin/python3
+# Persistent SQLite index of a validated Hostname,Ip_Address group file.
+#
+# Opt-in: the index is a local SQLite file (by default <file>.index.sqlite next to the
+# CSV) with one row per CSV row and indexes on the hostname, the IP text and the numeric
+# range of the network. It remembers the size, mtime and sha256 of the file it was built
+# from: an unchanged mtime means it is used as is, a changed mtime only costs a hash of
+# the file, and the index is rebuilt when the content really changed.
+# The hostnames and IPs found on several rows are counted while the rows are inserted, so
+# --duplicates reads a small table instead of grouping the whole file.
+# Ranges are stored as fixed-width hex so that IPv6 ranges, wider than SQLite integers,
+# still compare in numeric order.
+#
+#   python3 groupindex.py ip2.csv --hostname dbserver01
+#   python3 groupindex.py ip2.csv --ip 10.10.10.2/24 --overlaps 10.0.0.0/8 --duplicates
+
+import os
+import sys
+import csv
+import json
+import sqlite3
+import argparse
+import tempfile
+
+from ipparse import parse_network, network_range
+from rowcache import file_digest
+
+INDEX_FORMAT = 2
+
+INDEX_SUFFIX = '.index.sqlite'
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE rows (
+    row_number INTEGER PRIMARY KEY,
+    hostname TEXT,
+    ip_address TEXT,
+    version INTEGER,
+    range_start TEXT,
+    range_end TEXT
+);
+CREATE TABLE duplicates (
+    column_name TEXT,
+    value TEXT,
+    first_row INTEGER,
+    count INTEGER,
+    PRIMARY KEY (column_name, value)
+);
+"""
+
+# Created after the bulk insert, which is faster than keeping them up to date row by row
+INDEXES = """
+CREATE INDEX rows_hostname ON rows (hostname);
+CREATE INDEX rows_ip_address ON rows (ip_address);
+CREATE INDEX rows_pair ON rows (hostname, ip_address);
+CREATE INDEX rows_range ON rows (version, range_start, range_end);
+"""
+
+
+def _hex(value):
+    return f"{value:032x}"
+
+
+def default_index_path(csv_path):
+    return csv_path + INDEX_SUFFIX
+
+
+def _source_stat(csv_path):
+    stat = os.stat(csv_path)
+    return str(stat.st_size), str(stat.st_mtime_ns)
+
+
+# (row_number, hostname, ip_address, version, range_start, range_end), the header is row 1.
+# Values that are not a network get no range.
+def _index_rows(csv_path):
+    with open(csv_path, newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader, [])
+        hostname_position = header.index('Hostname') if 'Hostname' in header else None
+        ip_position = header.index('Ip_Address') if 'Ip_Address' in header else None
+        for row_number, row in enumerate(reader, start=2):
+            if not row:
+                continue
+            hostname = row[hostname_position] if hostname_position is not None and hostname_position < len(row) else None
+            ip_address = row[ip_position] if ip_position is not None and ip_position < len(row) else None
+            version = range_start = range_end = None
+            if ip_address:
+                try:
+                    parsed = parse_network(ip_address)
+                except ValueError:
+                    parsed = None
+                if parsed is not None:
+                    start, end = network_range(parsed)
+                    version, range_start, range_end = parsed[0], _hex(start), _hex(end)
+            yield row_number, hostname, ip_address, version, range_start, range_end
+
+
+# Passes the rows through and keeps {column: {value: [first row, count]}} of what went by
+def _counted(rows, seen):
+    for row in rows:
+        for column, value in (('hostname', row[1]), ('ip_address', row[2])):
+            if value:
+                entry = seen[column].get(value)
+                if entry is None:
+                    seen[column][value] = [row[0], 1]
+                else:
+                    entry[1] += 1
+        yield row
+
+
+# Build the index next to its final path and rename it, so readers never see half of one
+def build_index(csv_path, index_path, digest=None):
+    size, mtime = _source_stat(csv_path)
+    if digest is None:
+        digest = file_digest(csv_path)
+    directory = os.path.dirname(os.path.abspath(index_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.groupindex-')
+    os.close(fd)
+    try:
+        connection = sqlite3.connect(temp_path)
+        try:
+            connection.executescript(SCHEMA)
+            seen = {'hostname': {}, 'ip_address': {}}
+            connection.executemany("INSERT INTO rows VALUES (?, ?, ?, ?, ?, ?)",
+                                   _counted(_index_rows(csv_path), seen))
+            connection.executemany("INSERT INTO duplicates VALUES (?, ?, ?, ?)", (
+                (column, value, first_row, count)
+                for column, values in seen.items()
+                for value, (first_row, count) in values.items() if count > 1))
+            connection.executescript(INDEXES)
+            connection.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ('format', str(INDEX_FORMAT)), ('size', size), ('mtime_ns', mtime), ('sha256', digest)])
+            connection.commit()
+        finally:
+            connection.close()
+        os.replace(temp_path, index_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _read_meta(index_path):
+    try:
+        connection = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+        try:
+            return dict(connection.execute("SELECT key, value FROM meta"))
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return None
+
+
+# True when the index was (re)built, False when the existing one was still up to date
+def refresh_index(csv_path, index_path):
+    meta = _read_meta(index_path)
+    if meta is None or meta.get('format') != str(INDEX_FORMAT):
+        build_index(csv_path, index_path)
+        return True
+    size, mtime = _source_stat(csv_path)
+    if meta.get('size') == size and meta.get('mtime_ns') == mtime:
+        return False
+    digest = file_digest(csv_path)
+    if meta.get('sha256') != digest:
+        build_index(csv_path, index_path, digest)
+        return True
+    # Touched but not changed: remember the new mtime so the next run skips the hash
+    connection = sqlite3.connect(index_path)
+    try:
+        connection.execute("UPDATE meta SET value = ? WHERE key = 'mtime_ns'", (mtime,))
+        connection.commit()
+    finally:
+        connection.close()
+    return False
+
+
+# Row numbers for one key, with the .get() of the dicts of auto_readcsv.CsvIndex
+class _Column:
+    def __init__(self, connection, where):
+        self.connection = connection
+        self.query = f"SELECT row_number FROM rows WHERE {where} ORDER BY row_number"
+
+    def get(self, key, default=None):
+        parameters = key if isinstance(key, tuple) else (key,)
+        rows = [row_number for (row_number,) in self.connection.execute(self.query, parameters)]
+        return rows if rows else default
+
+
+class GroupIndex:
+    def __init__(self, csv_path, index_path=None):
+        self.csv_path = csv_path
+        self.index_path = index_path or default_index_path(csv_path)
+        self.rebuilt = refresh_index(csv_path, self.index_path)
+        self.connection = sqlite3.connect(self.index_path)
+        self.by_hostname = _Column(self.connection, "hostname = ?")
+        self.by_ip = _Column(self.connection, "ip_address = ?")
+        self.by_pair = _Column(self.connection, "hostname = ? AND ip_address = ?")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # {value: [row numbers]} of the hostnames and IPs found on more than one row
+    def duplicates(self):
+        result = {}
+        for column in ('hostname', 'ip_address'):
+            values = result[column] = {}
+            query = (f"SELECT duplicates.value, rows.row_number FROM duplicates "
+                     f"JOIN rows ON rows.{column} = duplicates.value WHERE duplicates.column_name = ? "
+                     f"ORDER BY duplicates.first_row, rows.row_number")
+            for value, row_number in self.connection.execute(query, (column,)):
+                values.setdefault(value, []).append(row_number)
+        return result
+
+    # Rows whose network overlaps `network` (contains it, is contained or is the same).
+    # Networks are aligned blocks: an overlapping one either starts inside `network`, a
+    # bounded range of rows_range, or contains it and then starts at `network` masked to a
+    # shorter prefix, one lookup per prefix length.
+    def overlapping(self, network):
+        version, address, prefixlen = parse_network(network)
+        bits = 32 if version == 4 else 128
+        start, end = network_range((version, address, prefixlen))
+        containing = sorted({start & ~((1 << (bits - length)) - 1) for length in range(prefixlen)} - {start})
+        query = ("SELECT row_number, hostname, ip_address FROM rows "
+                 "WHERE version = ? AND range_start >= ? AND range_start <= ?")
+        parameters = [version, _hex(start), _hex(end)]
+        if containing:
+            query += (" UNION SELECT row_number, hostname, ip_address FROM rows "
+                      f"WHERE version = ? AND range_start IN ({', '.join('?' * len(containing))}) "
+                      "AND range_end >= ?")
+            parameters += [version, *map(_hex, containing), _hex(end)]
+        return [{'row': row_number, 'Hostname': hostname, 'Ip_Address': ip_address}
+                for row_number, hostname, ip_address in self.connection.execute(
+                    query + " ORDER BY row_number", parameters)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query a persistent index of a group CSV file.')
+    parser.add_argument('csv_file')
+    parser.add_argument('--index', metavar='PATH', help=f"index file (default: <csv_file>{INDEX_SUFFIX})")
+    parser.add_argument('--hostname', action='append', default=[], help='rows with this hostname')
+    parser.add_argument('--ip', action='append', default=[], help='rows with this IP text')
+    parser.add_argument('--overlaps', action='append', default=[], metavar='NETWORK',
+                        help='rows whose network overlaps NETWORK')
+    parser.add_argument('--duplicates', action='store_true', help='hostnames and IPs on several rows')
+    args = parser.parse_args()
+
+    try:
+        index = GroupIndex(args.csv_file, args.index)
+    except FileNotFoundError:
+        print(f"Error: File {args.csv_file} not found.")
+        sys.exit(1)
+
+    with index:
+        result = {'rebuilt': index.rebuilt}
+        if args.hostname:
+            result['hostname'] = {hostname: index.by_hostname.get(hostname, []) for hostname in args.hostname}
+        if args.ip:
+            result['ip_address'] = {ip_address: index.by_ip.get(ip_address, []) for ip_address in args.ip}
+        try:
+            if args.overlaps:
+                result['overlaps'] = {network: index.overlapping(network) for network in args.overlaps}
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        if args.duplicates:
+            result['duplicates'] = index.duplicates()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
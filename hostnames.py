@@ -0,0 +1,187 @@
+#!/bin/python3
+# Hostname rules of the IP groups validators.
+#
+# A Hostname must be a valid RFC 1123 host name or FQDN: labels of 1 to 63 letters,
+# digits and hyphens that don't start or end with a hyphen, separated by dots, at most
+# 253 characters in all, an optional root dot at the end. On top of that a deployment can
+# require its naming convention, a regex every hostname must match whole, with
+# --hostname-pattern or the IPGROUPS_HOSTNAME_PATTERN environment variable.
+#
+# The rules are compiled once into a HostnameRule. Names are checked by batches: a few
+# bytes operations over the joined batch tell apart the batches of plain valid names, the
+# common case, without a Python step per name. The names of the other batches (and all
+# of them under a naming convention) are matched one by one against HOSTNAME_RE, behind
+# an LRU cache as names repeat. Reasons are only worked out for the names that fail.
+# Run this file directly to check the matcher against a label-by-label reference.
+
+import os
+import re
+import sys
+from functools import lru_cache
+
+# Groups repeat the same hostnames a lot, keep the most recent ones around
+CACHE_SIZE = 65536
+
+# Environment variable holding the naming convention of the deployment, if any
+PATTERN_ENV = 'IPGROUPS_HOSTNAME_PATTERN'
+
+MAX_LENGTH = 253
+MAX_LABEL_LENGTH = 63
+
+_LABEL = r'[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?'
+HOSTNAME_RE = re.compile(rf'(?=[^.].{{0,{MAX_LENGTH - 1}}}\.?\Z)(?:{_LABEL}\.)*{_LABEL}\.?\Z', re.ASCII)
+
+# Classes of the bytes for the batch scan: letters and digits are 'a', dots (which also
+# join the names) are '.', anything else is '!'. Hyphens are '.' too for the first pass,
+# as the dots and hyphens of plain names are never next to each other but in '--'.
+def _classes(hyphen):
+    return bytes(ord('a') if chr(byte).isascii() and chr(byte).isalnum() else
+                 ord('.') if byte == ord('.') else
+                 hyphen if byte == ord('-') else ord('!')
+                 for byte in range(256))
+
+
+_CLASSES = _classes(ord('.'))
+_HYPHEN_CLASSES = _classes(ord('-'))
+
+# What can't be in the _HYPHEN_CLASSES of plain names: an empty label, a hyphen at the
+# start or the end of a label
+_NOT_PLAIN = (b'..', b'.-', b'-.')
+
+_LABEL_CHARACTERS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-')
+
+
+# Why a name that HOSTNAME_RE rejects is not a valid hostname
+def _reason(name):
+    text = name[:-1] if name.endswith('.') else name
+    if len(text) > MAX_LENGTH:
+        return f"longer than {MAX_LENGTH} characters"
+    for label in text.split('.'):
+        if not label:
+            return "empty label"
+        for character in label:
+            if character not in _LABEL_CHARACTERS:
+                return f"invalid character {character!r}"
+        if len(label) > MAX_LABEL_LENGTH:
+            return f"label longer than {MAX_LABEL_LENGTH} characters"
+        if label[0] == '-' or label[-1] == '-':
+            return "label starts or ends with a hyphen"
+    return "not a valid hostname"
+
+
+class HostnameRule:
+    def __init__(self, pattern=None):
+        self.pattern = pattern or None
+        self.convention = None if self.pattern is None else re.compile(self.pattern)
+        self.error = lru_cache(maxsize=CACHE_SIZE)(self._error)
+
+    # None for a valid hostname, otherwise why it is not. Takes str, or bytes from the
+    # mmap reader.
+    def _error(self, name):
+        if name.__class__ is bytes:
+            name = name.decode('utf-8', 'replace')
+        if HOSTNAME_RE.match(name) is None:
+            return _reason(name)
+        if self.convention is not None and self.convention.fullmatch(name) is None:
+            return f"does not match the naming convention {self.pattern!r}"
+        return None
+
+    # Positions of the invalid names of a list (all str or all bytes)
+    def invalid(self, names):
+        if self.convention is None and _all_plain(names):
+            return []
+        error = self.error
+        return [position for position, name in enumerate(names) if error(name) is not None]
+
+
+# Whether a list of names (all str or all bytes) only holds plain valid names: short
+# enough for any label, ASCII letters, digits, hyphens and dots only, and no dot or
+# hyphen at either end of a name or of a label. Names with a root dot are not plain.
+# Everything runs in C over the names joined by dots, where the end of a name is the end
+# of a label.
+def _all_plain(names):
+    if not names:
+        return True
+    if max(map(len, names)) > MAX_LABEL_LENGTH:
+        return False
+    if names[0].__class__ is bytes:
+        joined = b'.'.join(names)
+    else:
+        joined = '.'.join(names)
+        if not joined.isascii():
+            return False
+        joined = joined.encode('ascii')
+    classes = joined.translate(_CLASSES)
+    if b'!' in classes or classes[0] != 97 or classes[-1] != 97:  # b'a'
+        return False
+    if b'..' not in classes:
+        return True
+    classes = joined.translate(_HYPHEN_CLASSES)
+    return not any(pattern in classes for pattern in _NOT_PLAIN)
+
+
+# The compiled rule for a naming convention pattern (None: the one of PATTERN_ENV, if
+# set), shared by every file of the run. Raises re.error for an invalid pattern.
+@lru_cache(maxsize=None)
+def hostname_rule(pattern=None):
+    if pattern is None:
+        pattern = os.environ.get(PATTERN_ENV)
+    return HostnameRule(pattern)
+
+
+def hostname_message(row_number, hostname, reason):
+    return f"Error in row {row_number}: invalid hostname {hostname!r}, {reason}."
+
+
+## Differential check against a label-by-label reference
+
+def _reference(name):
+    text = name[:-1] if name.endswith('.') else name
+    if not text or len(text) > MAX_LENGTH:
+        return False
+    for label in text.split('.'):
+        if not 1 <= len(label) <= MAX_LABEL_LENGTH or label[0] == '-' or label[-1] == '-':
+            return False
+        if any(character not in _LABEL_CHARACTERS for character in label):
+            return False
+    return True
+
+
+def _random_names(rng, count):
+    pieces = ['a', 'Z', '0', '9', '-', '--', '.', '_', ' ', '\n', 'é', 'host', 'db-01', 'x' * 63, 'x' * 64]
+    for _ in range(count):
+        labels = [''.join(rng.choice(pieces) for _ in range(rng.randrange(1, 4)))
+                  for _ in range(rng.choice([1, 1, 2, 3, 4]))]
+        name = '.'.join(labels)
+        roll = rng.random()
+        if roll < 0.05:
+            name = '.'.join(['a' * 63] * 4)[:rng.choice([252, 253, 254, 255])]
+        elif roll < 0.1:
+            name += '.'
+        yield name
+
+
+def self_check(count=200000, seed=1234):
+    import random
+    rng = random.Random(seed)
+    rule = HostnameRule()
+    names = list(_random_names(rng, count))
+    mismatches = 0
+    for name in names:
+        expected = _reference(name)
+        if (rule.error(name) is None) != expected:
+            mismatches += 1
+            print(f"Mismatch for {name!r}: regex={rule.error(name)!r} reference valid={expected}")
+    # The batch scan may only pass batches of valid names
+    for start in range(0, count, 4):
+        batch = names[start:start + 4]
+        for candidate in (batch, [name.encode('utf-8') for name in batch]):
+            if _all_plain(candidate) and not all(map(_reference, batch)):
+                mismatches += 1
+                print(f"Mismatch for {candidate!r}: passed the batch scan")
+    print(f"Checked {count} names against the reference, {mismatches} mismatches")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if self_check() else 1)
@@ -0,0 +1,158 @@
+#!/bin/python3
+# Shared IP/CIDR parser for the IP groups validators.
+#
+# parse_network() accepts and rejects exactly what ipaddress.ip_network(value, strict=False)
+# does, but returns a packed (version, network_int, prefixlen) tuple instead of building a
+# network object. Plain IPv4 "a.b.c.d[/len]" values are parsed by hand, everything else
+# (IPv6, netmask/hostmask forms, invalid values) goes through ipaddress.
+# Run this file directly to check the fast path against ipaddress.
+
+import sys
+from functools import lru_cache
+
+# Group files repeat the same networks a lot, keep the most recent ones around
+CACHE_SIZE = 65536
+
+IPV4_ALL_ONES = 0xFFFFFFFF
+
+
+# Hand-written IPv4 parser, returns (address_int, prefixlen, has_prefix) with the host
+# bits left as they are, or None for anything it does not handle itself
+def split_ipv4(text):
+    address, slash, prefix = text.partition('/')
+    if slash:
+        if not (prefix.isascii() and prefix.isdigit()):
+            return None
+        prefixlen = int(prefix)
+        if prefixlen > 32:
+            return None
+    else:
+        prefixlen = 32
+
+    octets = address.split('.')
+    if len(octets) != 4:
+        return None
+    value = 0
+    for octet in octets:
+        if not (octet.isascii() and octet.isdigit()) or len(octet) > 3:
+            return None
+        if octet[0] == '0' and len(octet) > 1:
+            return None  # ipaddress rejects leading zeros
+        number = int(octet)
+        if number > 255:
+            return None
+        value = (value << 8) | number
+    return value, prefixlen, bool(slash)
+
+
+def _parse_ipv4(text):
+    parsed = split_ipv4(text)
+    if parsed is None:
+        return None
+    value, prefixlen, has_prefix = parsed
+    # strict=False: clear the host bits
+    mask = (IPV4_ALL_ONES << (32 - prefixlen)) & IPV4_ALL_ONES
+    return 4, value & mask, prefixlen
+
+
+# ipaddress is only imported once a value needs it, an IPv4-only file never loads it
+def _parse_slow(text):
+    import ipaddress
+    network = ipaddress.ip_network(text, strict=False)
+    return network.version, int(network.network_address), network.prefixlen
+
+
+def _parse(text):
+    if isinstance(text, str) and ':' not in text:
+        parsed = _parse_ipv4(text)
+        if parsed is not None:
+            return parsed
+    return _parse_slow(text)
+
+
+# Parse an IP/mask value, raises ValueError with the ipaddress message when it is not valid
+parse_network = lru_cache(maxsize=CACHE_SIZE)(_parse)
+
+
+# Same as parse_network() for a raw bytes field, as handed out by the mmap reader
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_network_bytes(field):
+    try:
+        text = field.decode('ascii')
+    except UnicodeDecodeError:
+        # Never a valid network, let ipaddress word the error
+        text = field.decode('utf-8', 'replace')
+    return _parse(text)
+
+
+def is_valid_network(text):
+    try:
+        parse_network(text)
+        return True
+    except ValueError:
+        return False
+
+
+# First and last address of a parsed network, as integers
+def network_range(parsed):
+    version, network, prefixlen = parsed
+    bits = 32 if version == 4 else 128
+    return network, network | ((1 << (bits - prefixlen)) - 1)
+
+
+# IPv4 is formatted by hand, only IPv6 needs ipaddress for the :: compression
+def format_network(parsed):
+    version, network, prefixlen = parsed
+    if version == 4:
+        return f"{network >> 24}.{(network >> 16) & 255}.{(network >> 8) & 255}.{network & 255}/{prefixlen}"
+    import ipaddress
+    return f"{ipaddress.IPv6Address(network)}/{prefixlen}"
+
+
+## Differential check against ipaddress
+
+def _reference(text):
+    try:
+        return _parse_slow(text)
+    except ValueError:
+        return None
+
+
+def _random_candidates(rng, count):
+    pieces = ['0', '00', '01', '1', '9', '10', '99', '100', '127', '255', '256', '300', '999', '1000',
+              '', ' 1', '1 ', '+1', '-1', '0x1', '١', '²']
+    for _ in range(count):
+        octets = [rng.choice(pieces) if rng.random() < 0.3 else str(rng.randrange(256))
+                  for _ in range(rng.choice([3, 4, 4, 4, 4, 5]))]
+        value = '.'.join(octets)
+        roll = rng.random()
+        if roll < 0.6:
+            value += '/' + rng.choice([str(rng.randrange(34)), '024', '', '33', '-1', ' 24', '24/1',
+                                       '255.255.255.0', '0.0.0.255', '255.0.255.0'])
+        elif roll < 0.7:
+            value += rng.choice(['/', '//24', ',', ' '])
+        yield value
+
+
+def self_check(count=200000, seed=1234):
+    import random
+    rng = random.Random(seed)
+    fixed = ['10.10.10.2/24', '10.10.10.0/24', '0.0.0.0/0', '255.255.255.255/32', '1.2.3.4',
+             '10.0.0.300', '', '/24', '10.0.0.1/', '::1', '2001:db8::1/64', '::ffff:10.0.0.1/120',
+             '10.0.0.1/255.255.0.0', '10.0.0.1/0.0.255.255', ' 10.0.0.1/24', '10.0.0.1/24 ']
+    mismatches = 0
+    for text in fixed + list(_random_candidates(rng, count)):
+        expected = _reference(text)
+        try:
+            got = parse_network(text)
+        except ValueError:
+            got = None
+        if got != expected:
+            mismatches += 1
+            print(f"Mismatch for {text!r}: parse_network={got} ipaddress={expected}")
+    print(f"Checked {len(fixed) + count} values against ipaddress, {mismatches} mismatches")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if self_check() else 1)
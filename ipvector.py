@@ -0,0 +1,257 @@
+#!/bin/python3
+# Optional NumPy backend of rowstore.RowStore, for the largest exports.
+#
+# When NumPy is installed, RowStore hands the Ip_Address values to parse_ipv4_column()
+# by chunks: the values are laid out as a matrix of code points and parsed one character
+# column at a time with array operations, into uint32 addresses and uint8 prefix lengths.
+# The duplicate and overlap checks then run on the arrays: repeats with np.unique, and
+# overlaps with the cumulative max of the range ends in address order.
+# Only the strict a.b.c.d[/len] form (no leading zeros, octets up to 255, prefix up to
+# 32) is parsed here. That is exactly what RowStore packs, every other value goes back to
+# the pure-Python path, so kinds, addresses and row numbers are the ones it would give.
+#
+# Run this file directly to check the backend against the pure-Python path.
+
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from ipparse import parse_network, network_range
+from overlaps import iter_overlaps
+from dedupe import ip_key
+from rowstore import IP_NETWORK, IP_ADDRESS
+
+available = np is not None
+
+# Longest value of the strict form, '255.255.255.255/32'
+WIDTH = 18
+
+DIGIT_0 = ord('0')
+DIGIT_9 = ord('9')
+DOT = ord('.')
+SLASH = ord('/')
+
+
+# (kinds, addresses, prefixes) arrays for a list of Ip_Address values (None for a missing
+# one). kinds is IP_NETWORK or IP_ADDRESS for the values parsed here and 0 for the ones
+# left to the Python parser.
+def parse_ipv4_column(values):
+    count = len(values)
+    texts = [value or '' for value in values]
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=count)
+    # One column more than WIDTH, so a longer value can't pass as a truncated one
+    codes = np.array(texts, dtype=f'U{WIDTH + 1}').view(np.uint32).reshape(count, WIDTH + 1)
+
+    ok = (lengths > 0) & (lengths <= WIDTH)
+    field = np.zeros(count, dtype=np.int8)  # 0-3 the octets, 4 the prefix
+    value = np.zeros(count, dtype=np.int64)
+    digits = np.zeros(count, dtype=np.int8)
+    leading_zero = np.zeros(count, dtype=bool)
+    address = np.zeros(count, dtype=np.int64)
+    for position in range(WIDTH):
+        active = ok & (position < lengths)
+        if not active.any():
+            break
+        code = codes[:, position].astype(np.int64)
+        digit = active & (code >= DIGIT_0) & (code <= DIGIT_9)
+        dot = active & (code == DOT)
+        slash = active & (code == SLASH)
+        separator = dot | slash
+
+        # Any other character, or a digit after a leading zero
+        ok &= ~(active & ~digit & ~separator)
+        ok &= ~(digit & leading_zero)
+        leading_zero |= digit & (digits == 0) & (code == DIGIT_0)
+        value = np.where(digit, value * 10 + (code - DIGIT_0), value)
+        digits += digit
+
+        # A separator ends a non-empty octet, dots after the first three, the slash after
+        # the fourth
+        ok &= ~(separator & ((digits == 0) | (value > 255)))
+        ok &= ~(dot & (field >= 3))
+        ok &= ~(slash & (field != 3))
+        address = np.where(separator, (address << 8) | value, address)
+        field += separator
+        value[separator] = 0
+        digits[separator] = 0
+        leading_zero &= ~separator
+
+    ok &= digits > 0
+    plain = ok & (field == 3) & (value <= 255)
+    network = ok & (field == 4) & (value <= 32)
+    kinds = np.zeros(count, dtype=np.uint8)
+    kinds[plain] = IP_ADDRESS
+    kinds[network] = IP_NETWORK
+    addresses = np.where(plain, (address << 8) | value, address).astype(np.uint32)
+    prefixes = np.where(plain, 32, np.where(network, value, 0)).astype(np.uint8)
+    return kinds, addresses, prefixes
+
+
+# Index of the first repeated value of an array, or None
+def first_repeat(values):
+    if len(values) == 0:
+        return None
+    _, first = np.unique(values, return_index=True)
+    if len(first) == len(values):
+        return None
+    repeated = np.ones(len(values), dtype=bool)
+    repeated[first] = False
+    return int(np.argmax(repeated))
+
+
+def _packed_columns(store):
+    kinds = np.frombuffer(store.ip_kinds, dtype=np.uint8)
+    addresses = np.frombuffer(store.ip_addresses, dtype=np.uint32)
+    prefixes = np.frombuffer(store.ip_prefixes, dtype=np.uint8)
+    return kinds, addresses, prefixes
+
+
+# RowStore.first_repeat() for a string column
+def first_id_repeat(column):
+    return first_repeat(np.frombuffer(column, dtype=np.uint32))
+
+
+# RowStore.first_ip_repeat(): packed rows compare on one uint64 made of address, prefix
+# and kind, the other rows on their text
+def first_ip_repeat(store, canonical=False):
+    if canonical:
+        return _first_network_repeat(store)
+    kinds, addresses, prefixes = _packed_columns(store)
+    packed = (kinds == IP_NETWORK) | (kinds == IP_ADDRESS)
+    rows = np.flatnonzero(packed)
+    keys = (addresses[rows].astype(np.uint64) << np.uint64(9)) | (prefixes[rows].astype(np.uint64) << np.uint64(1))
+    keys |= (kinds[rows] == IP_NETWORK).astype(np.uint64)
+    repeat = first_repeat(keys)
+    found = None if repeat is None else int(rows[repeat])
+
+    seen = set()
+    for index in np.flatnonzero(~packed).tolist():
+        if found is not None and index > found:
+            break
+        key = store.ip_texts.get(index)
+        if key in seen:
+            return index
+        seen.add(key)
+    return found
+
+
+# Canonical RowStore.first_ip_repeat(): every IPv4 network compares on its
+# dedupe.network_key() as a uint64, packed rows and text rows alike; the keys that don't
+# fit (IPv6 networks) and the invalid values in a set
+def _first_network_repeat(store):
+    kinds, addresses, prefixes = _packed_columns(store)
+    packed = (kinds == IP_NETWORK) | (kinds == IP_ADDRESS)
+    rows = np.flatnonzero(packed)
+    prefix = prefixes[rows].astype(np.uint64)
+    mask = (np.uint64(0xFFFFFFFF) << (np.uint64(32) - prefix)) & np.uint64(0xFFFFFFFF)
+    keys = (((addresses[rows].astype(np.uint64) & mask) << np.uint64(8)) | prefix) << np.uint64(1)
+
+    extra_rows = []
+    extra_keys = []
+    others = []
+    for index in np.flatnonzero(~packed).tolist():
+        key = ip_key(store.ip_texts.get(index))
+        if key.__class__ is int and key < 1 << 64:
+            extra_rows.append(index)
+            extra_keys.append(key)
+        else:
+            others.append((index, key))
+    if extra_rows:
+        rows = np.concatenate([rows, np.array(extra_rows, dtype=rows.dtype)])
+        keys = np.concatenate([keys, np.array(extra_keys, dtype=np.uint64)])
+        order = np.argsort(rows, kind='stable')
+        rows = rows[order]
+        keys = keys[order]
+    repeat = first_repeat(keys)
+    found = None if repeat is None else int(rows[repeat])
+
+    seen = set()
+    for index, key in others:
+        if found is not None and index > found:
+            break
+        if key in seen:
+            return index
+        seen.add(key)
+    return found
+
+
+# Whether any two networks of the store overlap. IPv4 ranges are sorted by start, and a
+# range starting at or before the furthest end seen so far overlaps an earlier one.
+def any_overlap(store):
+    kinds, addresses, prefixes = _packed_columns(store)
+    packed = (kinds == IP_NETWORK) | (kinds == IP_ADDRESS)
+    size = np.left_shift(np.int64(1), 32 - prefixes[packed].astype(np.int64))
+    starts = addresses[packed].astype(np.int64) & ~(size - 1)
+    ends = starts + size - 1
+
+    extra_starts = []
+    extra_ends = []
+    ipv6 = []
+    for index in np.flatnonzero(~packed).tolist():
+        parsed = parse_network(store.ip_texts.get(index) or '')
+        if parsed[0] == 4:
+            start, end = network_range(parsed)
+            extra_starts.append(start)
+            extra_ends.append(end)
+        else:
+            ipv6.append((store.row_number(index), parsed))
+    if extra_starts:
+        starts = np.concatenate([starts, np.array(extra_starts, dtype=np.int64)])
+        ends = np.concatenate([ends, np.array(extra_ends, dtype=np.int64)])
+
+    if len(starts) > 1:
+        order = np.lexsort((-ends, starts))
+        reach = np.maximum.accumulate(ends[order])
+        if (starts[order][1:] <= reach[:-1]).any():
+            return True
+    return next(iter_overlaps(ipv6), None) is not None
+
+
+## Differential check against the pure-Python path
+
+def _random_values(rng, count):
+    pieces = ['0', '00', '01', '1', '9', '10', '99', '100', '127', '255', '256', '300', '999', '1000', '',
+              ' 1', '+1', '١', '\x00']
+    for _ in range(count):
+        octets = [rng.choice(pieces) if rng.random() < 0.1 else str(rng.randrange(256))
+                  for _ in range(rng.choice([3, 4, 4, 4, 4, 4, 5]))]
+        value = '.'.join(octets)
+        roll = rng.random()
+        if roll < 0.6:
+            value += '/' + rng.choice([str(rng.randrange(34)), '024', '', '00', '-1', '255.255.255.0'])
+        elif roll < 0.65:
+            value = rng.choice(['', None, '::1', '2001:db8::/64', value + ' ', '1.2.3.4/24/1'])
+        yield value
+
+
+def self_check(count=200000, seed=1234):
+    import random
+    from rowstore import RowStore
+    if not available:
+        print("NumPy is not installed, nothing to check")
+        return True
+    rng = random.Random(seed)
+    values = list(_random_values(rng, count))
+    python = RowStore(['Hostname', 'Ip_Address'])
+    for index, value in enumerate(values):
+        python._append_ip(index, value)
+    kinds, addresses, prefixes = parse_ipv4_column(values)
+    mismatches = 0
+    for index, value in enumerate(values):
+        if kinds[index] and (kinds[index], addresses[index], prefixes[index]) != (
+                python.ip_kinds[index], python.ip_addresses[index], python.ip_prefixes[index]):
+            mismatches += 1
+            print(f"Mismatch for {value!r}: numpy={kinds[index], addresses[index], prefixes[index]} python="
+                  f"{python.ip_kinds[index], python.ip_addresses[index], python.ip_prefixes[index]}")
+        elif not kinds[index] and python.ip_kinds[index] in (IP_NETWORK, IP_ADDRESS):
+            mismatches += 1
+            print(f"Mismatch for {value!r}: left to the Python parser, which packs it")
+    print(f"Checked {count} values against the pure-Python path, {mismatches} mismatches")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if self_check() else 1)
@@ -0,0 +1,64 @@
+#!/bin/python3
+# Memory-mapped reader for the two-column Hostname,Ip_Address files.
+#
+# The file is mapped instead of read, and lines are split straight from the mapped bytes:
+# rows are handed out as lists of bytes fields and nothing is decoded to str, the checks
+# only decode the fields they report in an error. The mapping takes no heap memory: the
+# page cache backs it, and its pages, counted in RSS as they are read, are the first to
+# go under memory pressure. What the checks keep per row (the keys of the duplicate
+# check, the networks of the overlap check) still grows with the file, unless v4.py
+# --dedupe-memory bounds it.
+# Lines with a '"' go through the csv module; quoted fields spanning lines are not
+# supported in this mode.
+
+import os
+import csv
+import mmap
+from contextlib import contextmanager
+
+
+# Yields the mmap of an open binary file, or b'' for an empty file (which can't be mapped)
+@contextmanager
+def map_file(file):
+    if os.fstat(file.fileno()).st_size == 0:
+        yield b''
+        return
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield mapped
+
+
+def decode_field(field):
+    if isinstance(field, bytes):
+        return field.decode('utf-8', 'replace')
+    return field
+
+
+def _split_quoted(line):
+    fields = next(csv.reader([line.decode('utf-8', 'replace')]), [])
+    return [field.encode('utf-8') for field in fields]
+
+
+# Split the mapped bytes into rows, starting at offset `start`.
+# Blank lines come out as empty lists so the caller keeps counting physical rows.
+def iter_rows(mapped, start=0):
+    if not mapped:
+        return
+    mapped.seek(start)
+    for line in iter(mapped.readline, b''):
+        line = line.rstrip(b'\r\n')
+        if not line:
+            yield []
+        elif b'"' in line:
+            yield _split_quoted(line)
+        else:
+            yield line.split(b',')
+
+
+# Header row (decoded, it is always reported) and the offset of the first data row
+def read_header(mapped):
+    if not mapped:
+        return [], 0
+    end = mapped.find(b'\n')
+    end = len(mapped) if end == -1 else end + 1
+    line = mapped[:end].decode('utf-8', 'replace')
+    return next(csv.reader([line]), []), end
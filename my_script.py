@@ -1,9 +1,12 @@
 #!/bin/python3# 
 # This py is used to verify the content fo a valid csv file in our IP groups automation
 
-import sys, os
+import sys
 import csv
-import ipaddress
+
+from ipparse import parse_network
+from prescan import scan_file
+from schema import header_error
 
 # Check if valid ip address in CSV file
 def check_valid_ip_and_mask(csv_file_name): 
@@ -18,7 +21,7 @@ def check_valid_ip_and_mask(csv_file_name):
                 # print ("row: ", ip_with_mask ) 
                 # # This will create an IPv4Network or IPv6Network object if valid 
                 # # strict=False allows the host bits to be non-zero for the network address 
-                ipaddress.ip_network(ip_with_mask, strict=False) 
+                parse_network(ip_with_mask) 
             except ValueError as e: 
                 print(f"Error in row {row_number}: {e} - {ip_with_mask}") 
                 return False 
@@ -30,15 +33,12 @@ def check_valid_ip_and_mask(csv_file_name):
                 return False 
     return True
 
-# Check that 2 columns exist in CSV file
-def two_columns_exist(header): 
-    required_columns = ['Hostname', 'Ip_Address'] 
-    if required_columns[0] not in header or required_columns[1] not in header: 
-        print("Error: CSV file must contain 'Hostname' and 'Ip_Address' columns.") 
-        return False 
-    if header[0] != 'Hostname' or header[1] != 'Ip_Address':
-        print("Error: First row must contain 'Hostname' and 'Ip_address'.") 
-        return False 
+# Check that the header has the columns of the schema (see schema.py)
+def two_columns_exist(header):
+    error = header_error(header)
+    if error is not None:
+        print(error)
+        return False
     return True
 
 # Check that no empty rows exist
@@ -68,19 +68,17 @@ def there_is_empty_value_in_column(file_path):
 
 def is_good_delimiter(file_path): 
     try: 
-        with open(file_path, 'r') as file: 
-            dialect = csv.Sniffer().sniff(file.read(1024)) 
-            # print ("this delimiter", dialect.delimiter) 
-            
-            if dialect.delimiter == ',': 
-                return True 
-            else: 
-                print ('Not a valid CSV file...') 
-                return False 
-            
-    except (csv.Error, FileNotFoundError): 
+        delimiter = scan_file(file_path, limit=1024).delimiter 
+    except FileNotFoundError: 
+        delimiter = None 
+
+    if delimiter is None: 
         print("Error: The detected delimiter is not a comma. Please use ',' as the delimiter.") 
-        return False
+        return False 
+    if delimiter == ',': 
+        return True 
+    print ('Not a valid CSV file...') 
+    return False
 
 
 # Check that no duplicates values exist in a row
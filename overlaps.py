@@ -0,0 +1,66 @@
+#!/bin/python3
+# Overlapping and contained subnet detection for the IP groups validators.
+#
+# Two CIDR networks are either disjoint or one contains the other, so sorting the
+# networks as integer [start, end] ranges and sweeping once with a stack of the
+# enclosing ranges finds the conflicts in O(n log n). Every row is reported once at most:
+# a repeated network against its first row, a contained one against the narrowest
+# network holding it, so the report stays linear however often a network repeats.
+
+from ipparse import network_range, format_network
+
+SAME_NETWORK = 'same network'
+CONTAINED = 'contained'
+
+# Bytes a (version, network, prefixlen, row_number) record takes in memory, list slot
+# included; the runs of the bounded overlap check of v4.py are sized with it
+RECORD_BYTES = 160
+
+
+# entries is an iterable of (row_number, parsed) where parsed comes from ipparse.parse_network.
+# Returns a list of (kind, outer_row, outer_parsed, inner_row, inner_parsed), ordered by inner_row.
+# kind is SAME_NETWORK when both rows describe the same network, CONTAINED otherwise.
+def find_overlaps(entries):
+    return sorted(iter_overlaps(entries), key=conflict_order)
+
+
+# Order of find_overlaps(): by inner row, then outer row
+def conflict_order(conflict):
+    return conflict[3], conflict[1]
+
+
+# Same conflicts as find_overlaps(), yielded in address order without being collected,
+# for callers that only keep a few of them
+def iter_overlaps(entries):
+    records = [parsed + (row_number,) for row_number, parsed in entries]
+    records.sort()
+    return sweep_overlaps(records)
+
+
+# Conflicts of network records (version, network, prefixlen, row_number) that come
+# sorted: within a version by start address and the widest network first, identical
+# networks in file order
+def sweep_overlaps(records):
+    stack = []  # (version, end, row_number, parsed) of the distinct networks enclosing the current one
+    for version, network, prefixlen, row_number in records:
+        parsed = (version, network, prefixlen)
+        start, end = network_range(parsed)
+        while stack and (stack[-1][0] != version or stack[-1][1] < start):
+            stack.pop()
+        if stack:
+            outer_version, outer_end, outer_row, outer_parsed = stack[-1]
+            if outer_parsed == parsed:
+                # Only the first row of a network goes on the stack
+                yield SAME_NETWORK, outer_row, outer_parsed, row_number, parsed
+                continue
+            yield CONTAINED, outer_row, outer_parsed, row_number, parsed
+        stack.append((version, end, row_number, parsed))
+
+
+def describe_overlap(conflict):
+    kind, outer_row, outer_parsed, inner_row, inner_parsed = conflict
+    if kind == SAME_NETWORK:
+        return (f"Row {inner_row} network {format_network(inner_parsed)} is the same as "
+                f"row {outer_row}.")
+    return (f"Row {inner_row} network {format_network(inner_parsed)} is contained in "
+            f"row {outer_row} network {format_network(outer_parsed)}.")
@@ -0,0 +1,209 @@
+#!/bin/python3
+# Byte-level pre-scan of a CSV file, used instead of csv.Sniffer.
+#
+# One sweep over the raw bytes finds the delimiter (the candidate used most in the
+# header line), the line endings, a UTF-8 BOM, whether quotes are used, the smallest and
+# largest field count and the number of lines. The checks then work from these facts
+# instead of sniffing or re-reading the file. Lines are split and counted with bytes
+# methods, only lines holding a '"' are walked in Python.
+
+import sys
+from itertools import repeat
+from collections import namedtuple
+
+from csvio import open_binary
+
+# In order of preference when the header uses several of them as often
+CANDIDATE_DELIMITERS = [b',', b';', b'\t', b'|']
+
+UTF8_BOM = b'\xef\xbb\xbf'
+
+SCAN_CHUNK_SIZE = 1024 * 1024
+
+# delimiter: str, or None when the header holds none of the candidates
+# line_ending: 'LF', 'CRLF', 'CR', 'mixed' or None for a single line without ending
+# min_fields/max_fields: over all lines, a blank line has 0 fields
+# first_short_line: first line (1-based, header included) with at most one field, or None
+# header_fields: fields of the header line
+# first_long_line: first line with more fields than the header, or None
+ScanFacts = namedtuple('ScanFacts', ['delimiter', 'line_ending', 'bom', 'has_quotes', 'min_fields',
+                                     'max_fields', 'lines', 'first_short_line', 'size', 'header_fields',
+                                     'first_long_line'])
+
+
+def _header_delimiter(line):
+    if b'"' in line:
+        # Only count what is outside quotes
+        line = b''.join(line.split(b'"')[0::2])
+    best = None
+    best_count = 0
+    for candidate in CANDIDATE_DELIMITERS:
+        count = line.count(candidate)
+        if count > best_count:
+            best, best_count = candidate, count
+    return best
+
+
+class PreScanner:
+    def __init__(self):
+        self.size = 0
+        self.carry = b''
+        self.started = False
+        self.bom = False
+        self.delimiter = None
+        self.has_quotes = False
+        self.in_quotes = False  # a quoted field goes on past the end of the last line
+        self.lines = 0
+        self.lf = 0
+        self.crlf = 0
+        self.cr = 0
+        self.min_fields = None
+        self.max_fields = 0
+        self.first_short_line = None
+        self.header_fields = None
+        self.first_long_line = None
+        self.record_fields = 0  # fields so far of a record spanning lines
+
+    def feed(self, chunk):
+        self.size += len(chunk)
+        block = self.carry + chunk
+        if not self.started:
+            if len(block) < len(UTF8_BOM) and UTF8_BOM.startswith(block):
+                self.carry = block
+                return
+            self.started = True
+            if block.startswith(UTF8_BOM):
+                self.bom = True
+                block = block[len(UTF8_BOM):]
+        cut = block.rfind(b'\n')
+        if cut == -1:
+            self.carry = block
+            return
+        self.carry = block[cut + 1:]
+        self._lines(block[:cut + 1])
+
+    def finish(self):
+        if not self.started and self.carry.startswith(UTF8_BOM):
+            self.bom = True
+            self.carry = self.carry[len(UTF8_BOM):]
+        if self.carry:
+            # Last line without line ending, or a whole file with bare CR line endings
+            if b'\n' not in self.carry and b'\r' in self.carry.rstrip(b'\r'):
+                self._cr_only(self.carry)
+            else:
+                self._lines(self.carry, terminated=False)
+            self.carry = b''
+
+        return ScanFacts(
+            delimiter=self.delimiter.decode() if self.delimiter else None,
+            line_ending=self._line_ending(),
+            bom=self.bom,
+            has_quotes=self.has_quotes,
+            min_fields=self.min_fields or 0,
+            max_fields=self.max_fields,
+            lines=self.lines,
+            first_short_line=self.first_short_line,
+            size=self.size,
+            header_fields=self.header_fields or 0,
+            first_long_line=self.first_long_line,
+        )
+
+    def _line_ending(self):
+        kinds = [name for name, count in (('LF', self.lf), ('CRLF', self.crlf), ('CR', self.cr)) if count]
+        if not kinds:
+            return None
+        return kinds[0] if len(kinds) == 1 else 'mixed'
+
+    def _cr_only(self, data):
+        self.cr += data.count(b'\r')
+        lines = data.split(b'\r')
+        if lines[-1] == b'':
+            lines.pop()
+        self._count_lines(lines)
+
+    # Complete lines, each ending with b'\n' unless terminated is False
+    def _lines(self, data, terminated=True):
+        crlf = data.count(b'\r\n')
+        self.crlf += crlf
+        self.lf += data.count(b'\n') - crlf
+        self.cr += data.count(b'\r') - crlf
+        lines = data.split(b'\n')
+        if terminated:
+            lines.pop()  # empty piece after the last b'\n'
+        self._count_lines([line[:-1] if line.endswith(b'\r') else line for line in lines])
+
+    def _count_lines(self, lines):
+        if not lines:
+            return
+        if self.delimiter is None and self.lines == 0:
+            self.delimiter = _header_delimiter(lines[0])
+        delimiter = self.delimiter or b','
+
+        if self.in_quotes or any(b'"' in line for line in lines):
+            self.has_quotes = True
+            for line in lines:
+                self._count_quoted_line(line, delimiter)
+            return
+
+        counts = list(map(bytes.count, lines, repeat(delimiter)))
+        # A blank line has no field at all, not one empty field
+        fields = [count + 1 if line else 0 for count, line in zip(counts, lines)]
+        self._record_counts(fields)
+        self.lines += len(lines)
+
+    def _count_quoted_line(self, line, delimiter):
+        self.lines += 1
+        pieces = line.split(b'"')
+        # Pieces alternate between outside and inside quotes
+        start = 1 if self.in_quotes else 0
+        commas = sum(piece.count(delimiter) for piece in pieces[start::2])
+        if self.in_quotes:
+            self.record_fields += commas
+        else:
+            self.record_fields = commas + 1 if line else 0
+        if (len(pieces) - 1) % 2:
+            self.in_quotes = not self.in_quotes
+        if not self.in_quotes:
+            self._record_counts([self.record_fields], line_offset=-1)
+
+    def _record_counts(self, fields, line_offset=0):
+        if not fields:
+            return
+        low = min(fields)
+        high = max(fields)
+        if self.min_fields is None or low < self.min_fields:
+            self.min_fields = low
+        if high > self.max_fields:
+            self.max_fields = high
+        if self.first_short_line is None and low <= 1:
+            self.first_short_line = self.lines + line_offset + next(
+                index for index, count in enumerate(fields) if count <= 1) + 1
+        if self.header_fields is None:
+            self.header_fields = fields[0]
+        if self.first_long_line is None and high > self.header_fields:
+            self.first_long_line = self.lines + line_offset + next(
+                index for index, count in enumerate(fields) if count > self.header_fields) + 1
+
+
+def scan_bytes(data):
+    scanner = PreScanner()
+    scanner.feed(data)
+    return scanner.finish()
+
+
+# With a limit only the first `limit` bytes are scanned, enough for the delimiter.
+# A compressed file (see csvio) is scanned as it is decompressed.
+def scan_file(file_path, limit=None):
+    if limit is not None:
+        with open_binary(file_path) as file:
+            return scan_bytes(file.read(limit))
+    scanner = PreScanner()
+    with open_binary(file_path) as file:
+        for chunk in iter(lambda: file.read(SCAN_CHUNK_SIZE), b''):
+            scanner.feed(chunk)
+    return scanner.finish()
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        print(path, scan_file(path))
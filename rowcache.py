@@ -0,0 +1,90 @@
+#!/bin/python3
+# On-disk validation cache for the IP groups validators.
+#
+# The cache is one JSON file (restore/save it with the Actions cache step) holding, per
+# CSV file, the hash of the whole file and the results of its last run. An unchanged
+# file is not validated again. A changed one is validated as without a cache: keeping
+# a verdict per row made every edit slower than no cache at all, since hashing a row
+# costs more than the checks it would skip. The cache is dropped as a whole when it was
+# written by another validator version or format, and keeps the MAX_FILES files
+# validated most recently (see put_entry).
+
+import os
+import hashlib
+
+CACHE_FORMAT = 2
+
+# Bytes read at a time when hashing a whole file
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Files kept in the cache, the least recently validated ones are dropped past that
+MAX_FILES = 1000
+
+
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Returns {file key: entry}, empty when the cache is missing, unreadable or stale
+def load_cache(cache_path, validator_version):
+    import json
+    try:
+        with open(cache_path, 'r') as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    if data.get('format') != CACHE_FORMAT or data.get('validator_version') != validator_version:
+        return {}
+    return data.get('files', {})
+
+
+# Stores the entry of a file as the most recently used one: the entries are kept in that
+# order, the JSON too, and the first ones are dropped past max_files. An entry replayed
+# as it is stays where it is until the cache is full, so a run that only replays results
+# does not have to write the cache again. Returns whether the cache changed.
+def put_entry(files, key, entry, max_files=MAX_FILES):
+    previous = files.get(key)
+    if (previous is entry or previous == entry) and len(files) < max_files:
+        return False
+    files.pop(key, None)
+    files[key] = entry
+    while len(files) > max_files:
+        del files[next(iter(files))]
+    return True
+
+
+# Write the cache next to its final path and rename it, so an interrupted run never
+# leaves a truncated cache behind. The file gets the mode of the cache it replaces, or
+# the one open() would give it: mkstemp() makes it readable by its owner only, which a
+# cache shared by a CI runner or a team can't be.
+def save_cache(cache_path, validator_version, files):
+    import json
+    import tempfile
+    data = {'format': CACHE_FORMAT, 'validator_version': validator_version, 'files': files}
+    directory = os.path.dirname(os.path.abspath(cache_path))
+    try:
+        mode = os.stat(cache_path).st_mode & 0o777
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.rowcache-')
+    try:
+        os.fchmod(fd, mode)
+        with os.fdopen(fd, 'w') as file:
+            # json.dumps uses the C encoder, json.dump does not
+            file.write(json.dumps(data, separators=(',', ':')))
+        os.replace(temp_path, cache_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def file_key(file_path):
+    return os.path.normpath(file_path)
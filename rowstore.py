@@ -0,0 +1,395 @@
+#!/bin/python3
+# Columnar in-memory store for the rows of a Hostname,Ip_Address file.
+#
+# csv.DictReader hands out one dict per row, a few hundred bytes each once the keys, the
+# dict and the str values are counted. Here every column other than Ip_Address is an
+# array('I') of ids into a table of interned strings, and the Ip_Address column keeps
+# IPv4 networks as an array('I') of addresses and an array('B') of prefix lengths. Only
+# values that can't be packed back to the exact same text (IPv6, invalid values, empty
+# fields) are kept as str, in a side table keyed by row index.
+# Rows are only built as dict-like views when something asks for them (an error message,
+# the validated_ file writer), the checks themselves run on the columns.
+# With NumPy installed, files of IP_CHUNK rows or more are parsed and checked through
+# ipvector.py instead; IPGROUPS_NUMPY=0 keeps the pure-Python path, IPGROUPS_NUMPY=1 uses
+# NumPy whatever the size.
+
+import os
+import csv
+from array import array
+from bisect import bisect_right
+
+from ipparse import split_ipv4, is_valid_network, parse_network, IPV4_ALL_ONES
+from overlaps import find_overlaps
+from dedupe import canonical_hostname, ip_key, network_key
+
+IP_COLUMN = 'Ip_Address'
+
+# Kinds of values in the Ip_Address column
+IP_MISSING = 0  # short row, DictReader would give None
+IP_NETWORK = 1  # IPv4 with a /prefix, packed
+IP_ADDRESS = 2  # IPv4 without a /prefix, packed
+IP_TEXT = 3     # anything else, kept as text
+
+# Ids every string table starts with
+MISSING_ID = 0
+EMPTY_ID = 1
+FIRST_ID = 2
+
+# Ip_Address values parsed together; a file shorter than that never imports NumPy, which
+# would cost more than it saves
+IP_CHUNK = 65536
+
+
+def _format_ipv4(address):
+    return f"{address >> 24}.{(address >> 16) & 255}.{(address >> 8) & 255}.{address & 255}"
+
+
+def _use_numpy(rows):
+    setting = os.environ.get('IPGROUPS_NUMPY')
+    if setting == '0' or (setting != '1' and rows < IP_CHUNK):
+        return False
+    import ipvector
+    return ipvector.available
+
+
+# Dict-like view of one row, built on demand; enough of the dict API for the checks
+# and their error messages
+class RowView:
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, name):
+        return self.store.value(self.index, name)
+
+    def get(self, name, default=None):
+        if name not in self.store.positions:
+            return default
+        return self.store.value(self.index, name)
+
+    def keys(self):
+        return self.as_dict().keys()
+
+    def values(self):
+        return self.as_dict().values()
+
+    def items(self):
+        return self.as_dict().items()
+
+    def as_dict(self):
+        return self.store.row_dict(self.index)
+
+    def __repr__(self):
+        return repr(self.as_dict())
+
+
+class RowStore:
+    def __init__(self, header):
+        self.header = list(header)
+        # A repeated column name keeps its last position, as with csv.DictReader
+        self.positions = {name: position for position, name in enumerate(self.header)}
+        # One string table per column, so a repeated id means a repeated value
+        self.tables = {name: [None, ''] for name in self.positions if name != IP_COLUMN}
+        self.table_ids = {name: {None: MISSING_ID, '': EMPTY_ID} for name in self.tables}
+        self.columns = {name: array('I') for name in self.tables}
+        self.ip_kinds = array('B')
+        self.ip_addresses = array('I')
+        self.ip_prefixes = array('B')
+        self.ip_texts = {}  # row index -> value of the IP_TEXT rows
+        self.extras = {}    # row index -> fields past the header
+        # Indexes of the rows that follow blank lines, with the number of blank lines
+        # skipped before each of them, see row_number()
+        self.gap_indexes = array('I')
+        self.gap_blanks = array('I')
+        self.count = 0
+        self.vectorized = False  # parsed and checked with ipvector
+
+    # Rows of a csv.reader positioned after the header. Blank lines are skipped like
+    # csv.DictReader does, so row indexes match the DictReader rows, but they are counted
+    # in the row numbers.
+    @classmethod
+    def from_reader(cls, header, reader):
+        store = cls(header)
+        width = len(store.header)
+        string_columns = [(store.positions[name], store.columns[name], store.tables[name], store.table_ids[name])
+                          for name in store.tables]
+        ip_position = store.positions.get(IP_COLUMN)
+        ip_values = []
+        blanks = 0
+        for row in reader:
+            if not row:
+                blanks += 1
+                continue
+            if blanks and (not store.gap_blanks or store.gap_blanks[-1] != blanks):
+                store.gap_indexes.append(store.count)
+                store.gap_blanks.append(blanks)
+            length = len(row)
+            for position, column, table, ids in string_columns:
+                value = row[position] if position < length else None
+                string_id = ids.get(value)
+                if string_id is None:
+                    string_id = ids[value] = len(table)
+                    table.append(value)
+                column.append(string_id)
+            if ip_position is not None:
+                ip_values.append(row[ip_position] if ip_position < length else None)
+                if len(ip_values) == IP_CHUNK:
+                    store._append_ips(store.count + 1 - IP_CHUNK, ip_values)
+                    ip_values = []
+            if length > width:
+                store.extras[store.count] = row[width:]
+            store.count += 1
+        if ip_values:
+            store._append_ips(store.count - len(ip_values), ip_values)
+        store.freeze()
+        return store
+
+    # Ip_Address values of the rows from index `first` on
+    def _append_ips(self, first, values):
+        if not self.vectorized and _use_numpy(len(values)):
+            self.vectorized = True
+        if not self.vectorized:
+            for index, value in enumerate(values, start=first):
+                self._append_ip(index, value)
+            return
+
+        import ipvector
+        kinds, addresses, prefixes = ipvector.parse_ipv4_column(values)
+        # Values the strict parser left alone go through the Python one
+        for offset in (kinds == 0).nonzero()[0].tolist():
+            kind, address, prefixlen, text = self._pack_ip(values[offset])
+            kinds[offset], addresses[offset], prefixes[offset] = kind, address, prefixlen
+            if text is not None:
+                self.ip_texts[first + offset] = text
+        self.ip_kinds.frombytes(kinds.tobytes())
+        self.ip_addresses.frombytes(addresses.tobytes())
+        self.ip_prefixes.frombytes(prefixes.tobytes())
+
+    def _append_ip(self, index, value):
+        kind, address, prefixlen, text = self._pack_ip(value)
+        self.ip_kinds.append(kind)
+        self.ip_addresses.append(address)
+        self.ip_prefixes.append(prefixlen)
+        if text is not None:
+            self.ip_texts[index] = text
+
+    # (kind, address, prefixlen, text kept for the side table or None) of one value
+    @staticmethod
+    def _pack_ip(value):
+        packed = split_ipv4(value) if value else None
+        if packed is not None:
+            address, prefixlen, has_prefix = packed
+            # Only pack what formats back to the same text ('/024' does not)
+            if not has_prefix or value.endswith('/' + str(prefixlen)):
+                return IP_NETWORK if has_prefix else IP_ADDRESS, address, prefixlen, None
+        return IP_MISSING if value is None else IP_TEXT, 0, 0, value
+
+    # The intern dicts are only needed while loading
+    def freeze(self):
+        self.table_ids = None
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield RowView(self, index)
+
+    def row(self, index):
+        return RowView(self, index)
+
+    # Row number of a row as v4.py reports it: the header is row 1 and blank lines count
+    def row_number(self, index):
+        gap = bisect_right(self.gap_indexes, index)
+        return index + 2 + (self.gap_blanks[gap - 1] if gap else 0)
+
+    # Index of the row with that row number
+    def row_index(self, row_number):
+        gap = bisect_right(range(len(self.gap_indexes)), row_number,
+                           key=lambda gap: self.gap_indexes[gap] + 2 + self.gap_blanks[gap])
+        return row_number - 2 - (self.gap_blanks[gap - 1] if gap else 0)
+
+    # row_number() of every row, in order
+    def row_numbers(self):
+        starts = [0, *self.gap_indexes, self.count]
+        blanks = [0, *self.gap_blanks]
+        for first, end, skipped in zip(starts, starts[1:], blanks):
+            yield from range(first + 2 + skipped, end + 2 + skipped)
+
+    def value(self, index, name):
+        if name == IP_COLUMN:
+            return self.ip_value(index)
+        return self.tables[name][self.columns[name][index]]
+
+    def ip_value(self, index):
+        kind = self.ip_kinds[index]
+        if kind == IP_NETWORK:
+            return f"{_format_ipv4(self.ip_addresses[index])}/{self.ip_prefixes[index]}"
+        if kind == IP_ADDRESS:
+            return _format_ipv4(self.ip_addresses[index])
+        return self.ip_texts.get(index)
+
+    # The row as csv.DictReader would have returned it
+    def row_dict(self, index):
+        row = {name: self.value(index, name) for name in self.header}
+        extra = self.extras.get(index)
+        if extra is not None:
+            row[None] = extra  # same restkey as csv.DictReader
+        return row
+
+    # Index of the first row with an empty or missing value in one of `names`, or None
+    def first_empty(self, names):
+        candidates = []
+        for name in names:
+            if name == IP_COLUMN:
+                candidates.extend(index for index, value in self.ip_texts.items() if not value)
+                if IP_MISSING in self.ip_kinds:
+                    candidates.append(self.ip_kinds.index(IP_MISSING))
+            else:
+                column = self.columns[name]
+                candidates.extend(column.index(string_id) for string_id in (MISSING_ID, EMPTY_ID)
+                                  if string_id in column)
+        return min(candidates) if candidates else None
+
+    # Index of the first row whose value of a string column is rejected, or None.
+    # `invalid` gets the list of the distinct non-empty values, not one per row, and
+    # returns the positions of the rejected ones in it.
+    def first_rejected(self, name, invalid):
+        rejected = {FIRST_ID + position for position in invalid(self.tables[name][FIRST_ID:])}
+        if not rejected:
+            return None
+        return next(index for index, string_id in enumerate(self.columns[name]) if string_id in rejected)
+
+    # Index of the first row whose Ip_Address is not a valid network, or None.
+    # Packed rows were accepted by the IPv4 parser, only the text rows are checked.
+    def first_invalid_ip(self):
+        missing = self.ip_kinds.index(IP_MISSING) if IP_MISSING in self.ip_kinds else None
+        for index in sorted(self.ip_texts):
+            if missing is not None and missing < index:
+                break
+            if not is_valid_network(self.ip_texts[index]):
+                return index
+        return missing
+
+    # Index of the first row repeating an earlier value of a string column, or None.
+    # Ids are handed out in order of first appearance, so as long as nothing repeats
+    # the column reads FIRST_ID, FIRST_ID + 1, ... and the first id off that sequence
+    # is the first repeat. No set of the values is needed.
+    # canonical compares the values as hostnames (see dedupe.canonical_hostname).
+    def first_repeat(self, name, canonical=False):
+        column = self.columns[name]
+        distinct = len(self.tables[name])
+        if canonical:
+            column, distinct = self._canonical_column(name)
+        if self.vectorized:
+            import ipvector
+            return ipvector.first_id_repeat(column)
+        if MISSING_ID in column or EMPTY_ID in column:
+            seen = set()
+            for index, string_id in enumerate(column):
+                if string_id in seen:
+                    return index
+                seen.add(string_id)
+            return None
+        if distinct - FIRST_ID == len(column):
+            return None
+        expected = FIRST_ID
+        for index, string_id in enumerate(column):
+            if string_id != expected:
+                return index
+            expected += 1
+        return None
+
+    # (ids of a string column, number of ids) with the values that have the same
+    # canonical_hostname() sharing one id. Canonical ids are handed out in order of first
+    # appearance as well, so first_repeat() works the same on them.
+    def _canonical_column(self, name):
+        table = self.tables[name]
+        canonical_ids = {None: MISSING_ID, '': EMPTY_ID}
+        renumber = array('I', [MISSING_ID, EMPTY_ID])
+        for value in table[FIRST_ID:]:
+            renumber.append(canonical_ids.setdefault(canonical_hostname(value), len(canonical_ids)))
+        if len(canonical_ids) == len(table):
+            return self.columns[name], len(table)  # already canonical
+        return array('I', map(renumber.__getitem__, self.columns[name])), len(canonical_ids)
+
+    # Index of the first row repeating an earlier Ip_Address text, or None. Packed rows
+    # compare as one int made of address, prefix and kind, equal exactly when the texts are.
+    # canonical compares the parsed networks instead (see dedupe.ip_key).
+    def first_ip_repeat(self, canonical=False):
+        if self.vectorized:
+            import ipvector
+            return ipvector.first_ip_repeat(self, canonical)
+        kinds = self.ip_kinds
+        addresses = self.ip_addresses
+        prefixes = self.ip_prefixes
+        texts = self.ip_texts
+        seen = set()
+        for index in range(self.count):
+            kind = kinds[index]
+            if canonical:
+                if kind == IP_NETWORK or kind == IP_ADDRESS:
+                    prefixlen = prefixes[index]
+                    mask = (IPV4_ALL_ONES << (32 - prefixlen)) & IPV4_ALL_ONES
+                    key = network_key((4, addresses[index] & mask, prefixlen))
+                else:
+                    key = ip_key(texts.get(index))
+            elif kind == IP_NETWORK or kind == IP_ADDRESS:
+                key = (addresses[index] << 8 | prefixes[index]) << 1 | (kind == IP_NETWORK)
+            else:
+                key = texts.get(index)
+            if key in seen:
+                return index
+            seen.add(key)
+        return None
+
+    # (column name, row index) of the first value seen twice in the Hostname or Ip_Address
+    # column, in the order the row-by-row check reports them, or None
+    def first_duplicate(self, hostname_column='Hostname', canonical=False):
+        hostname_index = self.first_repeat(hostname_column, canonical)
+        ip_index = self.first_ip_repeat(canonical)
+        if ip_index is not None and (hostname_index is None or ip_index < hostname_index):
+            return IP_COLUMN, ip_index
+        if hostname_index is not None:
+            return hostname_column, hostname_index
+        return None
+
+    # (row_number, parsed) of every row for overlaps.find_overlaps, see row_number()
+    def networks(self):
+        kinds = self.ip_kinds
+        addresses = self.ip_addresses
+        prefixes = self.ip_prefixes
+        for index, row_number in enumerate(self.row_numbers()):
+            if kinds[index] == IP_NETWORK or kinds[index] == IP_ADDRESS:
+                prefixlen = prefixes[index]
+                mask = (IPV4_ALL_ONES << (32 - prefixlen)) & IPV4_ALL_ONES
+                yield row_number, (4, addresses[index] & mask, prefixlen)
+            else:
+                yield row_number, parse_network(self.ip_texts.get(index) or '')
+
+    # Same conflicts as overlaps.find_overlaps(self.networks()). With NumPy, a file without
+    # any overlap is told apart with array operations, only one with some is swept.
+    def overlaps(self):
+        if self.vectorized:
+            import ipvector
+            if not ipvector.any_overlap(self):
+                return []
+        return find_overlaps(self.networks())
+
+    # Rows holding at least one non-empty value, as dicts for csv.DictWriter.
+    # A generator, so only one row is built at a time.
+    def non_empty_rows(self):
+        for index in range(self.count):
+            row = self.row_dict(index)
+            if any(row.values()):
+                yield row
+
+
+def load_rows(csvfile):
+    reader = csv.reader(csvfile)
+    header = next(reader, None)
+    if header is None:
+        return None, RowStore([])
+    return header, RowStore.from_reader(header, reader)
@@ -0,0 +1,78 @@
+#!/bin/python3
+# Declarative schema of the IP groups CSV files, the one set of rules of every validator.
+#
+# A Schema lists its columns in header order. A required column must be in the header
+# and filled in on every row; an optional one may be left out of the header, or empty.
+# The type of a column says what its values are:
+#   - 'hostname': an RFC 1123 host name, see hostnames.py;
+#   - 'cidr': an IPv4 or IPv6 network or address, see ipparse.py;
+#   - 'string': anything.
+# unique holds the columns whose values can't repeat together on two rows.
+#
+# header_error() is the header check of all the scripts. v4.py builds its row checks from
+# the schema and compiles them into one function per file (see fuse_visitors there).
+
+from collections import namedtuple
+
+COLUMN_TYPES = ('hostname', 'cidr', 'string')
+
+Column = namedtuple('Column', ['name', 'type', 'required'], defaults=[True])
+
+Schema = namedtuple('Schema', ['columns', 'unique'], defaults=[()])
+
+IPGROUPS_SCHEMA = Schema(
+    columns=(
+        Column('Hostname', 'hostname'),
+        Column('Ip_Address', 'cidr'),
+        # Free text some exports carry along (see ip.csv)
+        Column('data', 'string', required=False),
+    ),
+    unique=('Hostname', 'Ip_Address'),
+)
+
+
+def column_names(schema):
+    return [column.name for column in schema.columns]
+
+
+def required_columns(schema):
+    return [column.name for column in schema.columns if column.required]
+
+
+# Names of the columns of a type, in header order
+def columns_of_type(schema, column_type):
+    if column_type not in COLUMN_TYPES:
+        raise ValueError(f"Unknown column type {column_type!r}")
+    return [column.name for column in schema.columns if column.type == column_type]
+
+
+# Position of a column in a header. Without it there (the header check fails) the rows
+# are still read as if the header was the one of the schema.
+def column_index(header, name, schema=IPGROUPS_SCHEMA):
+    if header and name in header:
+        return header.index(name)
+    return column_names(schema).index(name)
+
+
+def _quoted(names):
+    quoted = [repr(name) for name in names]
+    if len(quoted) < 2:
+        return ''.join(quoted)
+    return ', '.join(quoted[:-1]) + ' and ' + quoted[-1]
+
+
+# Why a header row does not follow the schema, None when it does: every required column,
+# no unknown one, all in the order of the schema
+def header_error(header, schema=IPGROUPS_SCHEMA):
+    header = list(header or [])
+    names = column_names(schema)
+    required = required_columns(schema)
+    if any(name not in header for name in required):
+        return f"Error: CSV file must contain {_quoted(required)} columns."
+    for name in header:
+        if name not in names:
+            return f"Error: Unexpected column {name!r}, the CSV file can only contain {_quoted(names)} columns."
+    expected = [name for name in names if name in header]
+    if header != expected:
+        return f"Error: First row must contain {_quoted(expected)}."
+    return None
@@ -0,0 +1,304 @@
+#!/bin/python3
+# Long-running validation daemon for v4.py, see v4client.py for the client side.
+#
+#   python3 serve.py                      # Unix socket, see DEFAULT_SOCKET
+#   python3 serve.py --socket /tmp/v4.sock
+#   python3 serve.py --port 8765          # TCP on 127.0.0.1 instead, with a token
+#
+# The interpreter, the imports, the IP parse caches, the verdicts of the last
+# VERDICT_FILES files validated and the lookup indexes of the last INDEX_FILES files
+# queried stay in memory between requests. An unchanged file is answered from its last
+# results (the same entries as the --cache file of v4.py), a changed one is checked again.
+#
+# The daemon reads files as the user running it, so only that user may talk to it. The
+# Unix socket is created 0600. Any local user can connect to a TCP port, so there every
+# request must carry the token the daemon writes, 0600, to --token-file (a new one at
+# every start); v4client.py --port reads it from there.
+#
+# Protocol: one JSON object per line in each direction, several requests per connection.
+#   {"op": "validate", "paths": [...], "containment_warning": false, "mmap": false,
+#    "all_errors": false, "max_examples": 10, "duplicates": "strict", "hostnames": true,
+#    "hostname_pattern": null, "dedupe_memory": null, "bloom": false}
+#   {"op": "validate", "csv": "<file content>", "name": "inline.csv"}
+#   {"op": "lookup", "path": "...", "items": [{"Hostname": ..., "Ip_Address": ...}]}
+#   {"op": "ping"}
+# Over TCP every request also holds "token".
+# Every response holds "exit_code" (the one v4.py would exit with) and "output" (the
+# lines v4.py would print); lookups add "result".
+# Each client gets a thread. The checks hold the GIL, so requests run concurrently but
+# one file at a time is being parsed.
+
+import os
+import re
+import sys
+import hmac
+import json
+import argparse
+import secrets
+import tempfile
+import threading
+import socketserver
+from collections import OrderedDict
+
+import v4
+from auto_readcsv import read_rows, build_index, lookup_items
+from rowcache import file_key
+from hostnames import hostname_rule
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), f"ipgroups-v4-{os.getuid()}.sock")
+
+# Where the token of a TCP daemon is written, in the home of its user
+DEFAULT_TOKEN_FILE = os.path.join(os.path.expanduser('~'), '.ipgroups-v4.token')
+
+# Files whose verdicts, and whose lookup indexes (a dict entry per row), stay in memory
+VERDICT_FILES = 256
+INDEX_FILES = 16
+
+
+# Dict of the `size` most recently used entries, the older ones are dropped
+class LRUCache:
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self.entries:
+            return default
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def __setitem__(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class ValidationService:
+    def __init__(self, verdict_files=VERDICT_FILES, index_files=INDEX_FILES):
+        self.lock = threading.Lock()
+        self.verdicts = LRUCache(verdict_files)  # _verdict_key() -> rowcache entry of the last run
+        self.indexes = LRUCache(index_files)     # file key -> ((size, mtime_ns), lookup index)
+
+    def handle(self, request):
+        op = request.get('op')
+        if op == 'ping':
+            return {'exit_code': 0, 'output': [], 'version': v4.VALIDATOR_VERSION}
+        if op == 'validate' and 'csv' in request:
+            return self.validate_inline(request['csv'], request.get('name') or 'inline.csv', _options(request))
+        if op == 'validate':
+            return self.validate(request.get('paths') or [], _options(request))
+        if op == 'lookup':
+            return self.lookup(request.get('path'), request.get('items') or [])
+        return _failure(f"Error: Unknown request {op!r}.")
+
+    def _validate_one(self, path, options):
+        key = _verdict_key(path, options)
+        with self.lock:
+            cache_entry = self.verdicts.get(key, {})
+        results, error, cache_entry = v4.validate_file_cached(path, options, cache_entry)
+        if cache_entry is not None:
+            with self.lock:
+                self.verdicts[key] = cache_entry
+        return results, error
+
+    # Same output as v4.py: the results of one file, or one summary line per file
+    def validate(self, paths, options):
+        if not paths:
+            return _failure("Error: No file to validate.")
+        if len(paths) == 1:
+            results, error = self._validate_one(paths[0], options)
+            if error is not None:
+                return _failure(error)
+            ok, lines = v4.result_lines(results)
+            return {'exit_code': 0 if ok else 1, 'output': lines}
+        lines = []
+        failures = 0
+        for path in paths:
+            results, error = self._validate_one(path, options)
+            ok, line = v4.summary_line(path, results, error)
+            lines.append(line)
+            if not ok:
+                failures += 1
+        lines.append(f"{len(paths) - failures}/{len(paths)} files PASSED")
+        return {'exit_code': 0 if failures == 0 else 1, 'output': lines}
+
+    # Inline content is written to a private temp file, nothing about it is kept
+    def validate_inline(self, content, name, options):
+        with tempfile.TemporaryDirectory(prefix='ipgroups-serve-') as directory:
+            path = os.path.join(directory, os.path.basename(name))
+            with open(path, 'w', newline='') as file:
+                file.write(content)
+            results, error = v4.validate_file(path, options)
+        if error is not None:
+            return _failure(error.replace(path, name))
+        ok, lines = v4.result_lines(results)
+        return {'exit_code': 0 if ok else 1, 'output': lines}
+
+    # Lookup indexes are rebuilt when the size or mtime of their file changes
+    def lookup(self, path, items):
+        if not path:
+            return _failure("Error: No file to look up in.")
+        try:
+            stat = os.stat(path)
+            stamp = (stat.st_size, stat.st_mtime_ns)
+            key = file_key(path)
+            with self.lock:
+                cached = self.indexes.get(key)
+            if cached is None or cached[0] != stamp:
+                cached = (stamp, build_index(read_rows(path)))
+                with self.lock:
+                    self.indexes[key] = cached
+        except FileNotFoundError:
+            return _failure(f"Error: File {path} not found.")
+        result = lookup_items(items, cached[1])
+        return {'exit_code': 0, 'output': [], 'result': result}
+
+
+def _options(request):
+    duplicates = request.get('duplicates') or 'strict'
+    if duplicates not in v4.DUPLICATE_MODES:
+        raise ValueError(f"duplicates is strict or canonical, not {duplicates!r}")
+    # None: the naming convention of the daemon's environment, '' none at all
+    hostname_pattern = request.get('hostname_pattern')
+    try:
+        hostname_rule(hostname_pattern)
+    except re.error as e:
+        raise ValueError(f"hostname_pattern is not a valid regex: {e}")
+    # MiB, like the --dedupe-memory of v4.py
+    dedupe_memory = request.get('dedupe_memory')
+    if dedupe_memory is not None and int(dedupe_memory) < 1:
+        raise ValueError("dedupe_memory must be 1 or more")
+    return v4.CheckOptions(containment_is_warning=bool(request.get('containment_warning')),
+                           use_mmap=bool(request.get('mmap')), all_errors=bool(request.get('all_errors')),
+                           max_examples=int(request.get('max_examples', v4.MAX_EXAMPLES)),
+                           duplicates=duplicates, hostnames=bool(request.get('hostnames', True)),
+                           hostname_pattern=hostname_pattern,
+                           dedupe_memory=dedupe_memory and int(dedupe_memory) * 1024 * 1024,
+                           bloom=bool(dedupe_memory and request.get('bloom')))
+
+
+# Verdicts are kept per file, duplicate mode and hostname rule, so clients asking for
+# different ones don't keep throwing each other's results away
+def _verdict_key(path, options):
+    pattern = hostname_rule(options.hostname_pattern).pattern if options.hostnames else None
+    return file_key(path), options.duplicates, options.hostnames, pattern
+
+
+def _failure(message):
+    return {'exit_code': 1, 'output': [message]}
+
+
+def _authorized(request, token):
+    if token is None:
+        return True
+    return hmac.compare_digest(str(request.get('token', '')).encode(), token.encode())
+
+
+# A new token for a TCP daemon, only readable by its user
+def _write_token(token_file):
+    fd = os.open(token_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as file:
+        os.fchmod(file.fileno(), 0o600)
+        token = secrets.token_hex(32)
+        file.write(token + '\n')
+    return token
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("a request is a JSON object")
+                if not _authorized(request, self.server.token):
+                    self.wfile.write(json.dumps(_failure("Error: Invalid or missing token.")).encode() + b'\n')
+                    return
+                response = self.server.service.handle(request)
+            except ValueError as e:
+                response = _failure(f"Error: Invalid request: {e}")
+            except Exception as e:
+                response = _failure(f"An error occurred: {e}")
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+            self.wfile.flush()
+
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    token = None
+
+    # The socket file is created 0600, there is no moment where others could connect
+    def server_bind(self):
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+        os.chmod(self.server_address, 0o600)
+
+
+class TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    token = None
+
+
+# A socket file left behind by a daemon that is gone would make bind() fail
+def _remove_stale_socket(socket_path):
+    import socket
+    if not os.path.exists(socket_path):
+        return True
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(socket_path)
+            return False  # a daemon is listening
+        except OSError:
+            os.unlink(socket_path)
+            return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Keep the v4.py validator resident and answer requests.')
+    parser.add_argument('--socket', metavar='PATH', default=DEFAULT_SOCKET,
+                        help=f"Unix socket to listen on (default: {DEFAULT_SOCKET})")
+    parser.add_argument('--port', type=int, help='listen on 127.0.0.1:PORT instead of a Unix socket')
+    parser.add_argument('--token-file', metavar='PATH', default=DEFAULT_TOKEN_FILE,
+                        help=f"with --port, where to write the token requests must carry "
+                             f"(default: {DEFAULT_TOKEN_FILE})")
+    parser.add_argument('--verdict-files', type=int, default=VERDICT_FILES, metavar='N',
+                        help=f"files whose verdicts are kept in memory (default: {VERDICT_FILES})")
+    parser.add_argument('--index-files', type=int, default=INDEX_FILES, metavar='N',
+                        help=f"files whose lookup indexes are kept in memory (default: {INDEX_FILES})")
+    args = parser.parse_args()
+    if args.verdict_files < 1 or args.index_files < 1:
+        parser.error('--verdict-files and --index-files must be 1 or more')
+
+    if args.port is not None:
+        server = TCPServer(('127.0.0.1', args.port), RequestHandler)
+        server.token = _write_token(args.token_file)
+        where = f"127.0.0.1:{args.port} (token in {args.token_file})"
+    else:
+        if not _remove_stale_socket(args.socket):
+            print(f"Error: A daemon is already listening on {args.socket}.")
+            sys.exit(1)
+        server = UnixServer(args.socket, RequestHandler)
+        where = args.socket
+    server.service = ValidationService(args.verdict_files, args.index_files)
+
+    print(f"Serving v4.py {v4.VALIDATOR_VERSION} on {where}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.port is None and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import ipaddress
+import random
+
+from ipparse import parse_network, format_network
+from aggregate import collapse, range_to_networks, aggregate_hostname
+
+
+def collapsed(*values):
+    return [(format_network(parsed), rows) for parsed, rows in
+            collapse((row_number, parse_network(value)) for row_number, value in enumerate(values, start=2))]
+
+
+def test_adjacent_and_contained_networks_are_merged():
+    assert collapsed('10.0.1.0/24', '10.0.0.0/24', '10.0.0.128/25', '192.168.0.0/24') == [
+        ('10.0.0.0/23', [3, 4, 2]),
+        ('192.168.0.0/24', [5]),
+    ]
+
+
+def test_unaligned_range_is_cut_into_blocks():
+    assert collapsed('10.0.1.0/24', '10.0.2.0/24') == [('10.0.1.0/24', [2]), ('10.0.2.0/24', [3])]
+    assert [format_network(block) for block in range_to_networks(4, 1, 6)] == \
+        ['0.0.0.1/32', '0.0.0.2/31', '0.0.0.4/31', '0.0.0.6/32']
+
+
+def test_versions_are_not_merged():
+    assert collapsed('::/96', '0.0.0.0/8') == [('0.0.0.0/8', [3]), ('::/96', [2])]
+
+
+def test_same_networks_as_ipaddress_collapse_addresses():
+    rng = random.Random(7)
+    values = [f'10.{rng.randrange(4)}.{rng.randrange(256)}.0/{rng.randrange(20, 29)}' for _ in range(500)]
+    expected = [str(network) for network in
+                ipaddress.collapse_addresses(ipaddress.ip_network(value, strict=False) for value in values)]
+    result = collapsed(*values)
+    assert [network for network, rows in result] == expected
+    # Every source row is in exactly one output network
+    assert sorted(row for network, rows in result for row in rows) == list(range(2, len(values) + 2))
+
+
+def test_aggregate_hostname():
+    assert aggregate_hostname(parse_network('10.0.0.0/23')) == 'aggregate-10.0.0.0-23'
@@ -0,0 +1,46 @@
+from auto_readcsv import read_rows, build_index, lookup_items
+from groupindex import GroupIndex
+
+CSV = ('Hostname,Ip_Address\n'
+       'dbserver01,10.10.10.2/24\n'
+       '\n'
+       'frontend01,20.20.20.2/24\n'
+       'frontend02,20.20.20.2/24\n'
+       '\n'
+       '\n'
+       'frontend01,\n'
+       'short\n'
+       'dbserver01,10.10.10.2/24\n')
+
+ITEMS = [
+    {'Hostname': 'dbserver01'},
+    {'Hostname': 'frontend01'},
+    {'Hostname': 'short'},
+    {'Ip_Address': '20.20.20.2/24'},
+    {'Hostname': 'dbserver01', 'Ip_Address': '10.10.10.2/24'},
+    {'Hostname': 'frontend01', 'Ip_Address': ''},
+    {'Hostname': 'missing'},
+    {'Other': 'x'},
+    'not an object',
+]
+
+
+def write_csv(tmp_path):
+    path = tmp_path / 'group.csv'
+    path.write_text(CSV)
+    return str(path)
+
+
+def test_rows_are_numbered_from_the_lines_of_the_file(tmp_path):
+    rows = read_rows(write_csv(tmp_path))
+    assert [row_number for row_number, row in rows] == [2, 4, 5, 8, 9, 10]
+    assert rows[1] == (4, {'Hostname': 'frontend01', 'Ip_Address': '20.20.20.2/24'})
+
+
+def test_in_memory_and_sqlite_lookups_agree(tmp_path):
+    path = write_csv(tmp_path)
+    in_memory = lookup_items(ITEMS, build_index(read_rows(path)))
+    with GroupIndex(path, str(tmp_path / 'group.index.sqlite')) as index:
+        indexed = lookup_items(ITEMS, index)
+    assert in_memory == indexed
+    assert in_memory['found'][1] == {'item': {'Hostname': 'frontend01'}, 'rows': [4, 8]}
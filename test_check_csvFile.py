@@ -0,0 +1,45 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from prescan import scan_file
+
+HERE = Path(__file__).resolve().parent
+
+# A row with one more field than the header
+EXTRA = 'Hostname,Ip_Address\nweb01,10.0.0.1/24\nweb02,10.0.1.0/24,extra\n'
+
+
+def run(script, tmp_path, content, name='extra.csv'):
+    (tmp_path / name).write_text(content)
+    return subprocess.run([sys.executable, str(HERE / script), name], cwd=tmp_path,
+                          capture_output=True, text=True)
+
+
+def test_prescan_finds_the_first_row_wider_than_the_header(tmp_path):
+    path = tmp_path / 'extra.csv'
+    path.write_text(EXTRA)
+    facts = scan_file(str(path))
+    assert facts.header_fields == 2 and facts.max_fields == 3
+    assert facts.first_long_line == 3
+
+
+@pytest.mark.parametrize('script, message', [
+    ('check_csvFile.py', 'Error: Row 3 has more fields than the header.'),
+    ('check_csvFIle_v1.py', 'Row 3 has more fields than the header.'),
+    ('v4.py', 'Error: Row 3 has more fields than the header.'),
+])
+def test_rows_wider_than_the_header_are_rejected(tmp_path, script, message):
+    result = run(script, tmp_path, EXTRA)
+    assert result.returncode == 1
+    assert message in result.stdout.splitlines()
+    assert 'fieldnames' not in result.stdout
+    assert not (tmp_path / 'validated_extra.csv').exists()
+
+
+@pytest.mark.parametrize('script', ['check_csvFile.py', 'check_csvFIle_v1.py', 'v4.py'])
+def test_rows_as_wide_as_the_header_pass(tmp_path, script):
+    result = run(script, tmp_path, 'Hostname,Ip_Address\nweb01,10.0.0.1/24\nweb02,10.0.1.0/24\n', 'good.csv')
+    assert result.returncode == 0, result.stdout
@@ -0,0 +1,62 @@
+import gzip
+import os
+import stat
+
+import pytest
+
+from csvio import COMPRESSIONS, atomic_writer, open_text, csv_name, with_compression, pop_compress_option
+from test_v4 import CASES, run_v4, write_case
+
+
+@pytest.mark.parametrize('suffix', ['', *COMPRESSIONS])
+def test_written_files_read_back(tmp_path, suffix):
+    path = str(tmp_path / f"validated_ip.csv{suffix}")
+    with atomic_writer(path) as output:
+        output.write('Hostname,Ip_Address\r\nweb01,10.0.0.0/24\r\n')
+    with open_text(path) as file:
+        assert file.read() == 'Hostname,Ip_Address\r\nweb01,10.0.0.0/24\r\n'
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+
+
+def test_failed_write_keeps_the_old_file(tmp_path):
+    path = tmp_path / 'validated_ip.csv'
+    path.write_text('old\n')
+    with pytest.raises(RuntimeError):
+        with atomic_writer(str(path)) as output:
+            output.write('new\n')
+            raise RuntimeError('interrupted')
+    assert path.read_text() == 'old\n'
+    assert os.listdir(tmp_path) == ['validated_ip.csv']
+
+
+def test_written_files_follow_the_umask(tmp_path):
+    umask = os.umask(0o027)
+    try:
+        with atomic_writer(str(tmp_path / 'validated_ip.csv')) as output:
+            output.write('x\n')
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE((tmp_path / 'validated_ip.csv').stat().st_mode) == 0o640
+
+
+def test_names():
+    assert csv_name('groups/ip.CSV.gz') == 'groups/ip.CSV'
+    assert with_compression('validated_ip.csv.gz', '.xz') == 'validated_ip.csv.xz'
+    assert with_compression('validated_ip.csv.gz', '') == 'validated_ip.csv'
+
+
+def test_pop_compress_option():
+    args = ['--compress', 'xz', 'ip.csv']
+    assert pop_compress_option(args) == '.xz' and args == ['ip.csv']
+    assert pop_compress_option(['--compress', 'none']) == ''
+    assert pop_compress_option(['ip.csv']) is None
+    with pytest.raises(ValueError):
+        pop_compress_option(['--compress', 'zip'])
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_compressed_input_gives_the_plain_run(tmp_path, name):
+    path = write_case(tmp_path, name)
+    with gzip.open(f"{path}.gz", 'wb') as file:
+        file.write(path.read_bytes())
+    assert run_v4(tmp_path, f"{path.name}.gz") == run_v4(tmp_path, path.name)
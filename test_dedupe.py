@@ -0,0 +1,71 @@
+import pytest
+
+import v4
+from dedupe import BloomFilter, canonical_hostname, ip_key, row_key, key_digest, repeated_rows, \
+    pop_duplicates_option
+
+
+def test_canonical_hostname():
+    assert canonical_hostname(' DB01.Example.com. ') == 'db01.example.com'
+    assert canonical_hostname(None) is None
+
+
+def test_ip_key_compares_networks():
+    assert ip_key('10.0.0.2/24') == ip_key(' 10.0.0.0/24')
+    assert ip_key('10.0.0.0/24') != ip_key('10.0.0.0/25')
+    assert ip_key('::a00:0/120') != ip_key('10.0.0.0/24')
+    assert ip_key('not an ip ') == 'not an ip'
+
+
+def test_row_key_is_the_same_for_str_and_bytes():
+    assert row_key('DB01', '10.0.0.2/24') == row_key(b'db01.', b'10.0.0.0/24')
+    assert row_key('db01', '10.0.0.0/24') != row_key('db02', '10.0.0.0/24')
+    assert row_key('db01', 'bad') == ('db01', 'bad')
+
+
+def test_repeated_rows():
+    records = sorted((key_digest(key), row_number) for row_number, key in
+                     enumerate(['a', 'b', 'a', 'c', 'a', 'b'], start=2))
+    assert sorted(repeated_rows(records)) == [4, 6, 7]
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1 << 16)
+    digests = [key_digest(('host', number)) for number in range(20000)]
+    # 16 bits per key: a handful of false positives at most
+    assert sum(bloom.add(digest) for digest in digests[:10000]) < 20
+    assert all(bloom.add(digest) for digest in digests[:10000])
+    assert sum(bloom.add(digest) for digest in digests[10000:]) < 200
+
+
+def test_pop_duplicates_option():
+    args = ['--duplicates', 'canonical', 'ip.csv']
+    assert pop_duplicates_option(args) and args == ['ip.csv']
+    assert not pop_duplicates_option(['ip.csv'])
+    with pytest.raises(ValueError):
+        pop_duplicates_option(['--duplicates', 'loose'])
+
+
+ROWS = ''.join(f"host{number},10.{number // 256}.{number % 256}.0/24\n" for number in range(2000))
+
+FILES = {
+    'good': ROWS,
+    'duplicates': ROWS + 'host1,10.0.1.0/24\n' + ROWS[:300],
+    'canonical duplicate': ROWS + 'HOST1.,10.0.1.9/24\n',
+    'invalid ip': ROWS + 'late,10.255.0.300/24\n' + 'host1,10.0.1.0/24\n',
+    'overlap': ROWS + 'late,10.0.0.0/16\n',
+}
+
+
+@pytest.mark.parametrize('name', FILES)
+@pytest.mark.parametrize('options', [
+    {}, {'all_errors': True}, {'duplicates': 'canonical'}, {'duplicates': 'canonical', 'all_errors': True},
+], ids=['strict', 'strict all errors', 'canonical', 'canonical all errors'])
+def test_bounded_memory_gives_the_results_of_a_set(tmp_path, name, options):
+    path = tmp_path / 'group.csv'
+    path.write_text('Hostname,Ip_Address\n' + FILES[name])
+    plain, error = v4.validate_file(str(path), v4.CheckOptions(split='off', **options))
+    # A budget of a few hundred records, so that the digests are spilled in several runs
+    for bloom in (False, True):
+        bounded = v4.CheckOptions(split='off', dedupe_memory=8192, bloom=bloom, **options)
+        assert v4.validate_file(str(path), bounded) == (plain, error)
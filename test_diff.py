@@ -0,0 +1,72 @@
+import random
+from functools import partial
+
+import pytest
+
+import diff
+from extsort import sort_external
+
+HEADER = 'Hostname,Ip_Address,data\n'
+
+
+def write(path, rows):
+    path.write_text(HEADER + ''.join(f'{hostname},{ip_address},{data}\n' for hostname, ip_address, data in rows))
+    return str(path)
+
+
+def random_versions(seed, count=300):
+    rng = random.Random(seed)
+    old = [(f'host{index}', f'10.{index // 256}.{index % 256}.0/24', rng.choice('abc')) for index in range(count)]
+    new = []
+    for hostname, ip_address, data in old:
+        roll = rng.random()
+        if roll < 0.1:
+            continue  # removed
+        if roll < 0.2:
+            data = rng.choice('xyz')
+        elif roll < 0.25:
+            ip_address = ip_address.replace('.0/24', '.7/24')  # same network, changed spelling
+        new.append((hostname, ip_address, data))
+    new.extend((f'new{index}', f'172.16.{index}.0/24', 'a') for index in range(count // 10))
+    rng.shuffle(new)
+    return old, new
+
+
+def in_any_order(changes):
+    return sorted(changes, key=repr)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_hash_join_and_merge_join_agree(tmp_path, monkeypatch, seed):
+    old, new = random_versions(seed)
+    old_path = write(tmp_path / 'old.csv', old)
+    new_path = write(tmp_path / 'new.csv', new)
+    hashed = list(diff.diff_files(old_path, new_path, 'hash'))
+    # Small runs, so the merge reads both files back from spilled runs
+    monkeypatch.setattr(diff, 'sort_external', partial(sort_external, run_size=16, batch_size=4))
+    merged = list(diff.diff_files(old_path, new_path, 'merge'))
+    assert hashed and in_any_order(hashed) == in_any_order(merged)
+    assert {change['change'] for change in hashed} == {'added', 'removed', 'changed'}
+
+
+def test_changes(tmp_path):
+    old_path = write(tmp_path / 'old.csv', [('web01', '10.0.0.1/24', 'a'), ('web02', '10.0.1.0/24', 'a')])
+    new_path = write(tmp_path / 'new.csv', [('web01', '10.0.0.0/24', 'a'), ('web03', '10.0.2.0/24', 'a')])
+    for method in ('hash', 'merge'):
+        changes = list(diff.diff_files(old_path, new_path, method))
+        assert in_any_order(changes) == in_any_order([
+            {'change': 'changed', 'hostname': 'web01', 'network': '10.0.0.0/24', 'old_row': 2, 'new_row': 2,
+             'old': {'Ip_Address': '10.0.0.1/24'}, 'new': {'Ip_Address': '10.0.0.0/24'}},
+            {'change': 'added', 'hostname': 'web03', 'network': '10.0.2.0/24', 'row': 3,
+             'values': {'Ip_Address': '10.0.2.0/24', 'data': 'a'}},
+            {'change': 'removed', 'hostname': 'web02', 'network': '10.0.1.0/24', 'row': 3,
+             'values': {'Ip_Address': '10.0.1.0/24', 'data': 'a'}},
+        ])
+
+
+@pytest.mark.parametrize('method', ['hash', 'merge'])
+def test_repeated_entry_stops_the_diff(tmp_path, method):
+    old_path = write(tmp_path / 'old.csv', [('web01', '10.0.0.1/24', 'a'), ('web01', '10.0.0.2/24', 'b')])
+    new_path = write(tmp_path / 'new.csv', [])
+    with pytest.raises(ValueError, match='Row 3 of .* repeats web01 10.0.0.0/24 of row 2'):
+        list(diff.diff_files(old_path, new_path, method))
@@ -0,0 +1,56 @@
+import random
+from operator import itemgetter
+
+from extsort import ExternalSorter, sort_external
+
+
+def records(count, seed=0):
+    rng = random.Random(seed)
+    return [(rng.randrange(count // 4 + 1), row_number) for row_number in range(count)]
+
+
+def test_short_stream_stays_in_memory():
+    sorter = ExternalSorter(run_size=100)
+    for record in records(50):
+        sorter.add(record)
+    assert list(sorter.merged()) == sorted(records(50))
+    assert sorter.spilled_runs == 0 and sorter.file is None
+    sorter.close()
+
+
+def test_spilled_runs_merge_in_one_pass():
+    sorter = ExternalSorter(run_size=100, batch_size=7, fan_in=16)
+    for record in records(1000):
+        sorter.add(record)
+    assert list(sorter.merged()) == sorted(records(1000))
+    assert sorter.spilled_runs == 10 and sorter.merge_passes == 0
+    sorter.close()
+
+
+def test_many_runs_merge_in_passes_with_capped_fan_in():
+    sorter = ExternalSorter(run_size=3, batch_size=2, fan_in=4)
+    for record in records(500):
+        sorter.add(record)
+    merged = sorter.merged()
+    # 167 runs, 4 at a time: 42, 11, 3
+    assert sorter.merge_passes == 3 and len(sorter.runs) <= 4
+    assert list(merged) == sorted(records(500))
+    sorter.close()
+    assert sorter.file is None
+
+
+def test_for_budget_sizes_runs_and_batches():
+    sorter = ExternalSorter.for_budget(160 * 1700, 160, fan_in=16)
+    assert sorter.run_size == 1700
+    assert sorter.batch_size * (sorter.fan_in + 1) <= sorter.run_size
+    tiny = ExternalSorter.for_budget(1, 160)
+    assert tiny.run_size == 1 and tiny.batch_size == 1
+
+
+def test_sort_external_with_key_is_stable_like_sorted():
+    data = records(2000, seed=1)
+    assert list(sort_external(data, key=itemgetter(0), run_size=64, batch_size=5)) == sorted(data, key=itemgetter(0))
+
+
+def test_empty_stream():
+    assert list(sort_external([], run_size=1)) == []
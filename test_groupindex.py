@@ -0,0 +1,72 @@
+import random
+
+from groupindex import GroupIndex
+from ipparse import parse_network, network_range
+
+CSV = ('Hostname,Ip_Address\n'
+       'dbserver01,10.10.10.2/24\n'
+       '\n'
+       'frontend01,20.20.20.0/24\n'
+       'frontend02,20.20.20.0/24\n'
+       'frontend01,20.20.0.0/16\n'
+       'short\n'
+       'v6,2001:db8::/32\n'
+       'dbserver01,not an ip\n')
+
+
+def write_csv(tmp_path, text=CSV):
+    path = tmp_path / 'group.csv'
+    path.write_text(text)
+    return str(path)
+
+
+def test_duplicates_are_counted_on_insert(tmp_path):
+    with GroupIndex(write_csv(tmp_path)) as index:
+        assert index.duplicates() == {
+            'hostname': {'dbserver01': [2, 9], 'frontend01': [4, 6]},
+            'ip_address': {'20.20.20.0/24': [4, 5]},
+        }
+        counts = index.connection.execute(
+            "SELECT column_name, value, count FROM duplicates ORDER BY first_row").fetchall()
+        assert counts == [('hostname', 'dbserver01', 2), ('hostname', 'frontend01', 2),
+                          ('ip_address', '20.20.20.0/24', 2)]
+
+
+def test_overlapping(tmp_path):
+    with GroupIndex(write_csv(tmp_path)) as index:
+        assert [match['row'] for match in index.overlapping('20.20.20.128/25')] == [4, 5, 6]
+        assert [match['row'] for match in index.overlapping('20.0.0.0/8')] == [4, 5, 6]
+        assert [match['row'] for match in index.overlapping('0.0.0.0/0')] == [2, 4, 5, 6]
+        assert [match['row'] for match in index.overlapping('2001:db8:1::/48')] == [8]
+        assert index.overlapping('30.0.0.0/8') == []
+
+
+def test_overlapping_matches_a_scan(tmp_path):
+    rng = random.Random(7)
+    lines = ['Hostname,Ip_Address']
+    for number in range(2000):
+        prefixlen = rng.randint(8, 32)
+        address = rng.getrandbits(32) & ~((1 << (32 - prefixlen)) - 1) & 0x0fffffff
+        lines.append(f"host{number},{address >> 24}.{(address >> 16) & 255}.{(address >> 8) & 255}.{address & 255}/{prefixlen}")
+    csv_path = write_csv(tmp_path, '\n'.join(lines) + '\n')
+    ranges = [(row_number, network_range(parse_network(line.split(',')[1])))
+              for row_number, line in enumerate(lines[1:], start=2)]
+    with GroupIndex(csv_path) as index:
+        for _ in range(200):
+            network = lines[rng.randint(1, len(lines) - 1)].split(',')[1].rsplit('/', 1)[0]
+            network += f"/{rng.randint(4, 32)}"
+            start, end = network_range(parse_network(network))
+            expected = [row_number for row_number, (row_start, row_end) in ranges
+                        if row_start <= end and row_end >= start]
+            assert [match['row'] for match in index.overlapping(network)] == expected
+
+
+def test_overlapping_uses_the_range_index(tmp_path):
+    with GroupIndex(write_csv(tmp_path)) as index:
+        queries = []
+        index.connection.set_trace_callback(queries.append)
+        index.overlapping('20.20.20.0/24')
+        index.connection.set_trace_callback(None)
+        details = [row[-1] for row in index.connection.execute("EXPLAIN QUERY PLAN " + queries[0])]
+    assert any('rows_range' in detail for detail in details)
+    assert not any(detail.startswith('SCAN') for detail in details)
@@ -0,0 +1,42 @@
+import random
+
+from hostnames import HostnameRule, _all_plain, _reference, _random_names
+
+
+def test_valid_and_invalid_names():
+    rule = HostnameRule()
+    assert rule.error('db-01.example.com') is None
+    assert rule.error('db01.') is None
+    assert rule.error('-db01') == 'label starts or ends with a hyphen'
+    assert rule.error('db..01') == 'empty label'
+    assert rule.error('db_01') == "invalid character '_'"
+    assert rule.error('x' * 64) == 'label longer than 63 characters'
+    assert rule.error('.'.join(['x' * 63] * 4)) == 'longer than 253 characters'
+    assert rule.error(b'db01') is None
+
+
+def test_naming_convention():
+    rule = HostnameRule(r'(web|db)\d{2}')
+    assert rule.error('web01') is None
+    assert rule.error('mail01') == "does not match the naming convention '(web|db)\\\\d{2}'"
+    assert rule.invalid(['web01', 'mail01', 'db02']) == [1]
+
+
+def test_regex_agrees_with_the_label_by_label_reference():
+    rule = HostnameRule()
+    for name in _random_names(random.Random(1234), 20000):
+        assert (rule.error(name) is None) == _reference(name), name
+
+
+def test_batch_scan_only_passes_valid_names():
+    names = list(_random_names(random.Random(99), 20000))
+    for start in range(0, len(names), 4):
+        batch = names[start:start + 4]
+        for candidate in (batch, [name.encode('utf-8') for name in batch]):
+            if _all_plain(candidate):
+                assert all(map(_reference, batch)), batch
+
+
+def test_invalid_lists_the_rejected_positions():
+    assert HostnameRule().invalid(['web01', 'web-02', 'web_03', '', 'db.']) == [2, 3]
+    assert HostnameRule().invalid([b'web01', b'web_02']) == [1]
@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from ipparse import parse_network, parse_network_bytes, is_valid_network, format_network, network_range, \
+    _reference, _random_candidates
+
+FIXED = ['10.10.10.2/24', '10.10.10.0/24', '0.0.0.0/0', '255.255.255.255/32', '1.2.3.4', '10.0.0.300', '',
+         '/24', '10.0.0.1/', '::1', '2001:db8::1/64', '::ffff:10.0.0.1/120', '10.0.0.1/255.255.0.0',
+         '10.0.0.1/0.0.255.255', ' 10.0.0.1/24', '10.0.0.1/24 ', '010.0.0.1', '10.0.0.1/024', '1.2.3.4/33',
+         '١.2.3.4', '1.2.3.4/²']
+
+
+def parsed_or_none(text):
+    try:
+        return parse_network(text)
+    except ValueError:
+        return None
+
+
+@pytest.mark.parametrize('text', FIXED)
+def test_same_result_as_ipaddress(text):
+    assert parsed_or_none(text) == _reference(text)
+
+
+def test_random_values_give_the_same_result_as_ipaddress():
+    for text in _random_candidates(random.Random(1234), 20000):
+        assert parsed_or_none(text) == _reference(text), text
+
+
+def test_host_bits_are_cleared():
+    assert parse_network('10.10.10.2/24') == (4, 0x0A0A0A00, 24)
+    assert parse_network('10.10.10.2') == (4, 0x0A0A0A02, 32)
+
+
+def test_bytes_fields_parse_like_text():
+    assert parse_network_bytes(b'10.10.10.2/24') == parse_network('10.10.10.2/24')
+    assert parse_network_bytes(b'2001:db8::1/64') == parse_network('2001:db8::1/64')
+    with pytest.raises(ValueError):
+        parse_network_bytes('١.2.3.4'.encode())
+
+
+def test_invalid_values():
+    assert not is_valid_network('10.0.0.1/33')
+    assert not is_valid_network('10.0.0.256')
+    assert is_valid_network('2001:db8::/32')
+
+
+def test_format_and_range():
+    assert format_network(parse_network('10.10.10.2/24')) == '10.10.10.0/24'
+    assert format_network(parse_network('2001:db8::1/64')) == '2001:db8::/64'
+    assert network_range(parse_network('10.0.0.0/30')) == (0x0A000000, 0x0A000003)
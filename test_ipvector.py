@@ -0,0 +1,47 @@
+import io
+
+import pytest
+
+pytest.importorskip('numpy')
+
+import ipvector
+from rowstore import load_rows
+from test_v4 import CASES, MANY
+
+# The cases of the test corpus that the row store takes, plus IPv4 values only NumPy
+# leaves to the Python parser
+STORE_CASES = dict(CASES)
+STORE_CASES.update({
+    'odd values': ('Hostname,Ip_Address\nweb01,10.0.0.1\nweb02,010.0.0.2/32\nweb03,2001:db8::/32\n'
+                   'web04,10.0.0.0/33\nweb05, 10.0.1.0/24\n', None),
+    'canonical repeat': ('Hostname,Ip_Address\n' + MANY + 'host7,10.0.7.9/24\n', None),
+    'valid odd values': ('Hostname,Ip_Address\nweb01,10.0.0.1\nweb02,2001:db8::/32\nweb03,10.0.0.0/8\n', None),
+    'address repeat': ('Hostname,Ip_Address\nweb01,10.0.0.1\nweb02,10.0.0.1/32\nweb03,10.0.0.1\n', None),
+})
+
+
+def checks(content, numpy, monkeypatch):
+    monkeypatch.setenv('IPGROUPS_NUMPY', '1' if numpy else '0')
+    header, store = load_rows(io.StringIO(content))
+    if 'Hostname' not in header or 'Ip_Address' not in header:
+        pytest.skip('not a group file')
+    invalid = store.first_invalid_ip()
+    # Like the checks, overlaps are only looked for once every value is valid
+    return (store.vectorized, invalid, store.first_repeat('Hostname'),
+            store.first_ip_repeat(), store.first_ip_repeat(canonical=True),
+            store.first_duplicate(), store.first_duplicate(canonical=True),
+            store.overlaps() if invalid is None else None)
+
+
+def test_parser_matches_the_python_path():
+    assert ipvector.self_check(count=20000, seed=7)
+
+
+@pytest.mark.parametrize('name', STORE_CASES)
+def test_numpy_checks_give_the_python_results(name, monkeypatch):
+    content = STORE_CASES[name][0]
+    vectorized, *python = checks(content, False, monkeypatch)
+    assert not vectorized
+    vectorized, *numpy = checks(content, True, monkeypatch)
+    assert vectorized
+    assert numpy == python
@@ -0,0 +1,25 @@
+from mmapcsv import map_file, iter_rows, read_header
+
+
+def rows_of(tmp_path, content):
+    path = tmp_path / 'group.csv'
+    path.write_bytes(content)
+    with open(path, 'rb') as file, map_file(file) as mapped:
+        header, start = read_header(mapped)
+        return header, list(iter_rows(mapped, start))
+
+
+def test_blank_lines_and_line_endings(tmp_path):
+    header, rows = rows_of(tmp_path, b'Hostname,Ip_Address\r\nweb01,10.0.0.0/24\r\n\r\nweb02,10.0.1.0/24')
+    assert header == ['Hostname', 'Ip_Address']
+    assert rows == [[b'web01', b'10.0.0.0/24'], [], [b'web02', b'10.0.1.0/24']]
+
+
+def test_quoted_lines_go_through_csv(tmp_path):
+    header, rows = rows_of(tmp_path, 'Hostname,Ip_Address\n"web,01",10.0.0.0/24\n"wéb02",x\n'.encode())
+    assert rows == [[b'web,01', b'10.0.0.0/24'], ['wéb02'.encode(), b'x']]
+
+
+def test_empty_file(tmp_path):
+    assert rows_of(tmp_path, b'') == ([], [])
+    assert rows_of(tmp_path, b'Hostname,Ip_Address') == (['Hostname', 'Ip_Address'], [])
@@ -0,0 +1,58 @@
+from ipparse import parse_network
+from overlaps import SAME_NETWORK, CONTAINED, find_overlaps, iter_overlaps, describe_overlap
+
+
+def entries(*values, first_row=2):
+    return [(row_number, parse_network(value)) for row_number, value in enumerate(values, start=first_row)]
+
+
+def summary(conflicts):
+    return [(kind, outer_row, inner_row) for kind, outer_row, outer_parsed, inner_row, inner_parsed in conflicts]
+
+
+def test_disjoint_networks_do_not_conflict():
+    assert find_overlaps(entries('10.0.0.0/24', '10.0.1.0/24', '2001:db8::/64', '2001:db8:0:1::/64')) == []
+
+
+def test_same_address_in_both_versions_does_not_conflict():
+    assert find_overlaps(entries('0.0.0.0/0', '::/96')) == []
+
+
+def test_contained_and_same_network():
+    conflicts = find_overlaps(entries('10.10.10.0/24', '10.10.10.128/25', '10.10.10.2/24'))
+    assert summary(conflicts) == [(CONTAINED, 2, 3), (SAME_NETWORK, 2, 4)]
+    assert describe_overlap(conflicts[0]) == 'Row 3 network 10.10.10.128/25 is contained in row 2 network 10.10.10.0/24.'
+    assert describe_overlap(conflicts[1]) == 'Row 4 network 10.10.10.0/24 is the same as row 2.'
+
+
+def test_repeated_network_is_reported_against_its_first_row_only():
+    conflicts = find_overlaps(entries(*['192.168.0.0/24'] * 5))
+    assert summary(conflicts) == [(SAME_NETWORK, 2, row) for row in range(3, 7)]
+
+
+def test_contained_network_is_reported_against_the_narrowest_enclosing_one():
+    conflicts = find_overlaps(entries('10.0.0.0/8', '10.1.0.0/16', '10.1.2.0/24', '10.1.2.3/32', '10.2.0.0/16'))
+    assert summary(conflicts) == [(CONTAINED, 2, 3), (CONTAINED, 3, 4), (CONTAINED, 4, 5), (CONTAINED, 2, 6)]
+
+
+def test_order_of_the_rows_does_not_matter():
+    conflicts = find_overlaps(entries('10.1.2.0/24', '10.1.2.0/24', '10.0.0.0/8'))
+    assert summary(conflicts) == [(CONTAINED, 4, 2), (SAME_NETWORK, 2, 3)]
+
+
+def test_ipv6_contained():
+    conflicts = find_overlaps(entries('2001:db8::/32', '2001:db8:1::/48'))
+    assert describe_overlap(conflicts[0]) == 'Row 3 network 2001:db8:1::/48 is contained in row 2 network 2001:db8::/32.'
+
+
+def test_many_identical_and_nested_networks_stay_linear():
+    values = []
+    for index in range(2000):
+        values.append('192.168.0.0/24')
+        values.append(f'192.168.0.{index % 256}/32')
+        values.append('192.168.0.0/16')
+        values.append(f'10.{index % 256}.0.0/16')
+    conflicts = list(iter_overlaps(entries(*values)))
+    # Every row but the first of each outermost network is reported once, no more
+    assert len(conflicts) == len(values) - 1 - 256
+    assert len({inner_row for kind, outer_row, outer_parsed, inner_row, inner_parsed in conflicts}) == len(conflicts)
@@ -0,0 +1,85 @@
+import os
+import stat
+import subprocess
+import sys
+from pathlib import Path
+
+from rowcache import load_cache, save_cache, put_entry, file_key
+
+HERE = Path(__file__).resolve().parent
+
+GOOD = 'Hostname,Ip_Address\nweb01,10.0.0.0/24\nweb02,10.0.1.0/24\n'
+BAD = 'Hostname,Ip_Address\nweb01,10.0.0.0/24\nweb02,10.0.0.300/24\n'
+
+
+def run_v4(tmp_path, *args):
+    result = subprocess.run([sys.executable, str(HERE / 'v4.py'), *args], cwd=tmp_path,
+                            capture_output=True, text=True)
+    return result.returncode, result.stdout
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    save_cache(path, '1.0', {'a.csv': {'file_hash': 'x'}})
+    assert load_cache(path, '1.0') == {'a.csv': {'file_hash': 'x'}}
+    assert load_cache(path, '2.0') == {}
+    assert load_cache(str(tmp_path / 'missing.json'), '1.0') == {}
+
+
+def test_saved_cache_is_readable_by_others(tmp_path):
+    path = tmp_path / 'cache.json'
+    umask = os.umask(0o022)
+    try:
+        save_cache(str(path), '1.0', {})
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(path.stat().st_mode) == 0o644
+    # A cache written again keeps the mode it was given
+    path.chmod(0o664)
+    save_cache(str(path), '1.0', {})
+    assert stat.S_IMODE(path.stat().st_mode) == 0o664
+
+
+def test_put_entry_keeps_the_most_recent_files():
+    files = {}
+    for name in 'abcd':
+        assert put_entry(files, name, {'file_hash': name}, max_files=3)
+    assert list(files) == ['b', 'c', 'd']
+    # Replayed as it is: nothing to write, even once the cache is full it only moves
+    assert not put_entry(files, 'c', files['c'], max_files=4)
+    assert put_entry(files, 'b', files['b'], max_files=3) and list(files) == ['c', 'd', 'b']
+    assert put_entry(files, 'c', {'file_hash': 'changed'}, max_files=3) and list(files) == ['d', 'b', 'c']
+
+
+def test_replayed_results_match_the_plain_run(tmp_path):
+    (tmp_path / 'good.csv').write_text(GOOD)
+    (tmp_path / 'bad.csv').write_text(BAD)
+    for name in ('good.csv', 'bad.csv'):
+        plain = run_v4(tmp_path, name)
+        assert run_v4(tmp_path, '--cache', 'cache.json', name) == plain
+        assert run_v4(tmp_path, '--cache', 'cache.json', name) == plain
+    cache = load_cache(str(tmp_path / 'cache.json'), _validator_version())
+    assert set(cache) == {file_key('good.csv'), file_key('bad.csv')}
+    assert 'rows' not in cache[file_key('good.csv')]
+
+
+def test_changed_file_is_validated_again(tmp_path):
+    path = tmp_path / 'group.csv'
+    path.write_text(GOOD)
+    assert run_v4(tmp_path, '--cache', 'cache.json', 'group.csv')[0] == 0
+    path.write_text(BAD)
+    assert run_v4(tmp_path, '--cache', 'cache.json', 'group.csv') == run_v4(tmp_path, 'group.csv')
+
+
+def test_replaying_does_not_write_the_cache(tmp_path):
+    (tmp_path / 'group.csv').write_text(GOOD)
+    run_v4(tmp_path, '--cache', 'cache.json', 'group.csv')
+    cache = tmp_path / 'cache.json'
+    os.utime(cache, (0, 0))
+    run_v4(tmp_path, '--cache', 'cache.json', 'group.csv')
+    assert cache.stat().st_mtime == 0
+
+
+def _validator_version():
+    import v4
+    return v4.VALIDATOR_VERSION
@@ -0,0 +1,49 @@
+import csv
+import io
+
+from rowstore import load_rows
+from aggregate import collapse, write_aggregated
+
+# Blank lines after the header, between rows and at the end
+CSV = ('Hostname,Ip_Address\n'
+       '\n'
+       'web01,10.0.0.0/16\n'
+       '\n'
+       '\n'
+       'web02,10.0.1.0/24\n'
+       'web03,10.2.0.0/24\n'
+       '\n'
+       'web04,10.2.0.0/25\n'
+       '\n')
+
+
+def store(content=CSV):
+    return load_rows(io.StringIO(content))[1]
+
+
+def test_row_numbers_count_blank_lines():
+    rows = store()
+    assert list(rows.row_numbers()) == [3, 6, 7, 9]
+    assert [rows.row_number(index) for index in range(len(rows))] == [3, 6, 7, 9]
+    assert [rows.row_index(row_number) for row_number in (3, 6, 7, 9)] == [0, 1, 2, 3]
+
+
+def test_row_numbers_without_blank_lines():
+    rows = store('Hostname,Ip_Address\nweb01,10.0.0.1\nweb02,10.0.0.2\n')
+    assert list(rows.row_numbers()) == [2, 3]
+    assert rows.row_index(3) == 1
+
+
+def test_overlaps_report_the_lines_of_the_file():
+    conflicts = store().overlaps()
+    assert [(outer_row, inner_row) for kind, outer_row, outer, inner_row, inner in conflicts] == [(3, 6), (7, 9)]
+
+
+def test_aggregate_mapping_uses_the_lines_of_the_file(tmp_path):
+    rows = store('Hostname,Ip_Address\nweb01,10.0.0.0/24\n\nweb02,10.0.1.0/24\n')
+    output = str(tmp_path / 'aggregated.csv')
+    assert write_aggregated(output, ['Hostname', 'Ip_Address'], rows, collapse(rows.networks())) == (2, 1)
+    with open(tmp_path / 'aggregated.mapping.csv', newline='') as file:
+        mapping = list(csv.reader(file))[1:]
+    assert [(source_row, hostname) for address, name, source_row, hostname, source_ip in mapping] == \
+        [('2', 'web01'), ('4', 'web02')]
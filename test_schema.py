@@ -0,0 +1,61 @@
+import pytest
+
+import v4
+from schema import Column, Schema, IPGROUPS_SCHEMA, header_error, columns_of_type, column_index
+
+
+@pytest.mark.parametrize('header, error', [
+    (['Hostname', 'Ip_Address'], None),
+    (['Hostname', 'Ip_Address', 'data'], None),
+    (['Hostname'], "Error: CSV file must contain 'Hostname' and 'Ip_Address' columns."),
+    ([], "Error: CSV file must contain 'Hostname' and 'Ip_Address' columns."),
+    (['Hostname', 'Ip_Address', 'Owner'],
+     "Error: Unexpected column 'Owner', the CSV file can only contain 'Hostname', 'Ip_Address' and 'data' columns."),
+    (['Ip_Address', 'Hostname'], "Error: First row must contain 'Hostname' and 'Ip_Address'."),
+    (['Hostname', 'data', 'Ip_Address'], "Error: First row must contain 'Hostname', 'Ip_Address' and 'data'."),
+])
+def test_header_error(header, error):
+    assert header_error(header) == error
+
+
+def test_columns():
+    assert columns_of_type(IPGROUPS_SCHEMA, 'cidr') == ['Ip_Address']
+    with pytest.raises(ValueError):
+        columns_of_type(IPGROUPS_SCHEMA, 'integer')
+    assert column_index(['Ip_Address', 'Hostname'], 'Hostname') == 1
+    # Without the column, the position it has in the schema
+    assert column_index(['Host', 'Ip_Address'], 'Hostname') == 0
+
+
+# Networks listed first, one owner per network, hostnames left to another team
+NETWORKS_SCHEMA = Schema(
+    columns=(Column('Ip_Address', 'cidr'), Column('Owner', 'string'), Column('Comment', 'string', required=False)),
+    unique=('Ip_Address',),
+)
+
+NETWORK_FILES = {
+    'good': ('Ip_Address,Owner\n10.0.0.0/24,ops\n10.0.1.0/24,ops\n', None),
+    'comment': ('Ip_Address,Owner,Comment\n10.0.0.0/24,ops,lab\n10.0.1.0/24,ops,\n', None),
+    'missing owner': ('Ip_Address,Owner\n10.0.0.0/24,ops\n10.0.1.0/24,\n', 'Checking for empty values in columns...'),
+    'repeated network': ('Ip_Address,Owner\n10.0.0.0/24,ops\n10.0.0.0/24,dev\n',
+                         'Checking if there are duplicate values in the CSV file...'),
+    'invalid network': ('Ip_Address,Owner\n10.0.0.0/24,ops\nweb01,dev\n', 'Checking if IP addresses are valid...'),
+    'bad header': ('Ip_Address,Hostname\n10.0.0.0/24,web01\n', 'Checking if two columns exist in CSV file...'),
+}
+
+
+def run_schema(tmp_path, name, fuse):
+    path = tmp_path / 'networks.csv'
+    path.write_text(NETWORK_FILES[name][0])
+    return v4.run_checks(str(path), v4.default_visitors(file_path=str(path), schema=NETWORKS_SCHEMA), fuse=fuse)
+
+
+@pytest.mark.parametrize('name', NETWORK_FILES)
+def test_checks_follow_the_schema(tmp_path, name):
+    results = run_schema(tmp_path, name, fuse=True)
+    assert results == run_schema(tmp_path, name, fuse=False)
+    failed = [label for label, error, warnings, count in results if error is not None]
+    expected = NETWORK_FILES[name][1]
+    assert failed == ([] if expected is None else [expected])
+    # No hostname column, no hostname check
+    assert 'Checking if hostnames are valid...' not in [label for label, error, warnings, count in results]
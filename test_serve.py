@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from test_v4 import CASES, HERE, run_v4, write_case
+
+
+@pytest.fixture(scope='module')
+def daemon(tmp_path_factory):
+    socket_path = str(tmp_path_factory.mktemp('serve') / 'v4.sock')
+    process = subprocess.Popen([sys.executable, str(HERE / 'serve.py'), '--socket', socket_path],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            if os.path.exists(socket_path):
+                break
+            time.sleep(0.05)
+        else:
+            pytest.fail('serve.py did not start')
+        yield socket_path
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def run_client(tmp_path, socket_path, *args, input=None):
+    result = subprocess.run([sys.executable, str(HERE / 'v4client.py'), '--socket', socket_path, *args],
+                            cwd=tmp_path, input=input, capture_output=True, text=True)
+    return result.returncode, result.stdout
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_client_gives_the_output_of_v4(tmp_path, daemon, name):
+    file_name = write_case(tmp_path, name).name
+    plain = run_v4(tmp_path, file_name)
+    assert run_client(tmp_path, daemon, file_name) == plain
+    # Answered from the verdict of the first request
+    assert run_client(tmp_path, daemon, file_name) == plain
+    content = (tmp_path / file_name).read_text()
+    returncode, stdout = run_client(tmp_path, daemon, '-', input=content)
+    assert (returncode, stdout.replace('stdin.csv', file_name)) == plain
+
+
+def test_client_batch_gives_the_verdicts_of_v4(tmp_path, daemon):
+    for name in CASES:
+        write_case(tmp_path, name)
+    returncode, stdout = run_v4(tmp_path, '-j', '2', '*.csv')
+    client = run_client(tmp_path, daemon, '*.csv')
+    assert client[0] == returncode
+    assert client[1].replace(f"{tmp_path}{os.sep}", '') == stdout
@@ -0,0 +1,47 @@
+import pytest
+
+import v4
+
+HEADER = 'Hostname,Ip_Address\n'
+ROWS = ''.join(f"host{number},10.{number // 256}.{number % 256}.0/24\n" for number in range(400))
+
+CASES = {
+    'good': HEADER + ROWS,
+    'crlf': (HEADER + ROWS).replace('\n', '\r\n'),
+    'blank lines': HEADER + ROWS[:2000] + '\n\n' + ROWS[2000:],
+    'quoted': HEADER + '"web01",10.0.0.0/8\n' + ROWS,
+    'empty value': HEADER + ROWS + 'late,\n',
+    'wide row': HEADER + ROWS + 'late,10.255.0.0/24,extra\n',
+    'semicolon': 'Hostname;Ip_Address\n' + ROWS.replace(',', ';'),
+    'invalid ip': HEADER + ROWS + 'late,10.255.0.300/24\n',
+    'duplicate across ranges': HEADER + ROWS + 'host1,10.0.1.0/24\n',
+    'canonical duplicate': HEADER + ROWS + 'host1,10.0.1.7/24\n',
+    'overlap': HEADER + ROWS + 'late,10.0.0.0/16\n',
+    'bad hostname': HEADER + ROWS + '-late,10.255.0.0/24\n',
+    'bad header': 'Host,Ip_Address\n' + ROWS,
+}
+
+
+def validate(tmp_path, name, content, **options):
+    path = tmp_path / (name.replace(' ', '_') + '.csv')
+    path.write_bytes(content.encode())
+    results, error = v4.validate_file(str(path), v4.CheckOptions(**options))
+    assert error is None
+    return results
+
+
+@pytest.mark.parametrize('name', CASES)
+@pytest.mark.parametrize('options', [{}, {'all_errors': True}, {'duplicates': 'canonical'}],
+                         ids=['first error', 'all errors', 'canonical'])
+def test_split_gives_the_results_of_one_pass(tmp_path, name, options):
+    plain = validate(tmp_path, name, CASES[name], split='off', **options)
+    assert validate(tmp_path, name, CASES[name], split='on', jobs=3, **options) == plain
+
+
+def test_split_rows_are_numbered_from_the_file(tmp_path):
+    path = tmp_path / 'duplicate.csv'
+    path.write_text(CASES['duplicate across ranges'])
+    options = v4.CheckOptions(split='on', jobs=3)
+    results = v4.run_checks_split(str(path), v4.default_visitors(options), options)
+    assert ('Checking if there are duplicate values in the CSV file...',
+            'Duplicate data found in row 402.', [], None) in results
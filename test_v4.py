@@ -0,0 +1,194 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import v4
+
+HERE = Path(__file__).resolve().parent
+
+HEADER = 'Hostname,Ip_Address\n'
+ROWS = 'web01,10.0.0.0/24\nweb02,10.0.1.0/24\ndb01,192.168.0.1/32\n'
+MANY = ''.join(f"host{number},10.{number // 256}.{number % 256}.0/24\n" for number in range(5000))
+
+LABELS = {
+    'header': 'Checking if two columns exist in CSV file...',
+    'empty': 'Checking for empty values in columns...',
+    'delimiter': 'Checking if the delimiter is correct...',
+    'duplicates': 'Checking if there are duplicate values in the CSV file...',
+    'hostnames': 'Checking if hostnames are valid...',
+    'ip': 'Checking if IP addresses are valid...',
+    'overlaps': 'Checking for overlapping networks...',
+}
+
+# name: (content, the check that fails or None)
+CASES = {
+    'good': (HEADER + ROWS, None),
+    'data column': ('Hostname,Ip_Address,data\n' + ROWS.replace('\n', ',ops\n'), None),
+    'blank lines': (HEADER + '\n' + ROWS + '\n\n', None),
+    'crlf': ((HEADER + ROWS).replace('\n', '\r\n'), None),
+    'quoted': (HEADER + '"web01","10.0.0.0/24"\n"web02",10.0.1.0/24\n', None),
+    'ipv6': (HEADER + 'web01,2001:db8::/32\nweb02,2001:db9::1/128\n', None),
+    'many rows': (HEADER + MANY, None),
+    'empty value': (HEADER + ROWS + 'web03,\n', 'empty'),
+    'wide row': (HEADER + ROWS + 'web03,10.0.2.0/24,extra\n', 'delimiter'),
+    'semicolon': ((HEADER + ROWS).replace(',', ';'), 'header'),
+    'semicolon row': (HEADER + ROWS + 'web03;10.0.2.0/24\n', 'empty'),
+    'invalid ip': (HEADER + ROWS + 'web03,10.0.0.256/24\n', 'ip'),
+    'duplicate': (HEADER + ROWS + 'web01,10.0.0.0/24\n', 'duplicates'),
+    'overlap': (HEADER + ROWS + 'web03,10.0.0.0/16\n', 'overlaps'),
+    'bad hostname': (HEADER + ROWS + 'web_03,10.0.2.0/24\n', 'hostnames'),
+    'bad header': ('Host,Ip_Address\n' + ROWS, 'header'),
+    'late error': (HEADER + MANY + 'late,10.0.0.0/8\n', 'overlaps'),
+}
+
+
+def write_case(tmp_path, name):
+    path = tmp_path / (name.replace(' ', '_') + '.csv')
+    path.write_bytes(CASES[name][0].encode())
+    return path
+
+
+def run_v4(tmp_path, *args, input=None):
+    result = subprocess.run([sys.executable, str(HERE / 'v4.py'), *args], cwd=tmp_path,
+                            input=input, capture_output=True, text=True)
+    return result.returncode, result.stdout
+
+
+# Label of the check that failed, None when they all passed
+def failed_check(stdout):
+    failed = [line.split(' Failed ❌')[0] for line in stdout.splitlines() if ' Failed ❌' in line]
+    return failed[0] if failed else None
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_plain_run(tmp_path, name):
+    content, check = CASES[name]
+    returncode, stdout = run_v4(tmp_path, write_case(tmp_path, name).name)
+    assert returncode == (0 if check is None else 1)
+    assert failed_check(stdout) == (None if check is None else LABELS[check])
+
+
+@pytest.mark.parametrize('name', CASES)
+@pytest.mark.parametrize('use_mmap', [False, True], ids=['text', 'mmap'])
+def test_fused_checks_give_the_results_of_dispatch(tmp_path, name, use_mmap):
+    path = str(write_case(tmp_path, name))
+    dispatched = v4.run_checks(path, v4.default_visitors(file_path=path), use_mmap, fuse=False)
+    assert v4.run_checks(path, v4.default_visitors(file_path=path), use_mmap) == dispatched
+
+
+def test_batch_gives_the_verdict_of_every_file(tmp_path):
+    names = {write_case(tmp_path, name).name: name for name in CASES}
+    returncode, stdout = run_v4(tmp_path, '-j', '2', '*.csv')
+    assert returncode == 1
+    # One line per file, an overlap error goes on with the other overlaps
+    lines = {line.split(': ', 1)[0]: line.split(': ', 1)[1] for line in stdout.splitlines()
+             if line.split(': ', 1)[0] in names}
+    assert sorted(lines) == sorted(names)
+    for file_name, name in names.items():
+        check = CASES[name][1]
+        if check is None:
+            assert lines[file_name].startswith('PASSED')
+        else:
+            assert lines[file_name].startswith(f"Failed ❌ - {LABELS[check]}")
+    passed = sum(check is None for content, check in CASES.values())
+    assert stdout.splitlines()[-1] == f"{passed}/{len(CASES)} files PASSED"
+
+
+def test_batch_of_valid_files_passes(tmp_path):
+    for name in ('good', 'crlf', 'ipv6'):
+        write_case(tmp_path, name)
+    assert run_v4(tmp_path, 'good.csv', 'crlf.csv', 'ipv6.csv')[0] == 0
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_cache_replays_the_plain_run(tmp_path, name):
+    file_name = write_case(tmp_path, name).name
+    plain = run_v4(tmp_path, file_name)
+    assert run_v4(tmp_path, '--cache', 'cache.json', file_name) == plain
+    assert run_v4(tmp_path, '--cache', 'cache.json', file_name) == plain
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_mmap_gives_the_plain_run(tmp_path, name):
+    file_name = write_case(tmp_path, name).name
+    assert run_v4(tmp_path, '--mmap', file_name) == run_v4(tmp_path, file_name)
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_profile_and_report_keep_the_verdict(tmp_path, name):
+    file_name = write_case(tmp_path, name).name
+    returncode, stdout = run_v4(tmp_path, file_name)
+    profiled = run_v4(tmp_path, '--profile', '--report-json', 'report.json', file_name)
+    assert profiled[0] == returncode
+    assert profiled[1].startswith(stdout)
+    report = json.loads((tmp_path / 'report.json').read_text())
+    (entry,) = report['files']
+    assert entry['path'] == file_name and entry['passed'] == (returncode == 0)
+    failed = [check['label'] for check in entry['checks'] if not check['passed']]
+    assert failed == ([] if failed_check(stdout) is None else [failed_check(stdout)])
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_stdin_gives_the_plain_run(tmp_path, name):
+    path = write_case(tmp_path, name)
+    content = path.read_bytes().decode()
+    plain = run_v4(tmp_path, path.name)
+    assert run_v4(tmp_path, '--stdin', input=content) == plain
+    assert run_v4(tmp_path, '-', input=content) == plain
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_pass_through_copies_the_input_until_the_first_error(tmp_path, name):
+    path = write_case(tmp_path, name)
+    returncode, stdout = run_v4(tmp_path, path.name)
+    with open(path, 'rb') as file:
+        result = subprocess.run([sys.executable, str(HERE / 'v4.py'), '-', '--pass-through'], cwd=tmp_path,
+                                stdin=file, capture_output=True)
+    assert result.returncode == returncode
+    assert result.stderr.decode() == stdout
+    if returncode == 0:
+        assert result.stdout == path.read_bytes()
+    else:
+        assert path.read_bytes().startswith(result.stdout)
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_all_errors_keeps_the_verdict(tmp_path, name):
+    file_name = write_case(tmp_path, name).name
+    returncode, stdout = run_v4(tmp_path, file_name)
+    all_errors = run_v4(tmp_path, '--all-errors', file_name)
+    assert all_errors[0] == returncode
+    assert failed_check(all_errors[1]) == failed_check(stdout)
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_all_errors_fused_gives_the_results_of_dispatch(tmp_path, name):
+    path = str(write_case(tmp_path, name))
+    options = v4.CheckOptions(all_errors=True)
+    dispatched = v4.run_checks(path, v4.default_visitors(options, file_path=path), fuse=False)
+    assert v4.run_checks(path, v4.default_visitors(options, file_path=path)) == dispatched
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_split_gives_the_plain_run(tmp_path, name):
+    file_name = write_case(tmp_path, name).name
+    assert run_v4(tmp_path, '--split', 'on', '-j', '2', file_name) == run_v4(tmp_path, '--split', 'off', file_name)
+
+
+# The corpus has no rows that only canonical keys find equal
+@pytest.mark.parametrize('name', CASES)
+def test_canonical_duplicates_keep_the_verdict(tmp_path, name):
+    file_name = write_case(tmp_path, name).name
+    assert run_v4(tmp_path, '--duplicates', 'canonical', file_name) == run_v4(tmp_path, file_name)
+
+
+def test_canonical_duplicates_are_found(tmp_path):
+    (tmp_path / 'group.csv').write_text(HEADER + ROWS + 'WEB01.,10.0.0.9/24\n')
+    # Without canonical keys only the overlap check sees the repeated network
+    assert failed_check(run_v4(tmp_path, 'group.csv')[1]) == LABELS['overlaps']
+    returncode, stdout = run_v4(tmp_path, '--duplicates', 'canonical', 'group.csv')
+    assert returncode == 1 and failed_check(stdout) == LABELS['duplicates']
+    assert 'Duplicate data found in row 5.' in stdout.splitlines()
@@ -1,158 +1,1529 @@
 #!/bin/python3
 # This py is used to verify the content of a valid CSV file in our IP groups automation
 
+import io
+import os
+import re
 import sys
+import time
 import csv
-import ipaddress
+import heapq
+import argparse
+from functools import partial, lru_cache
+from operator import itemgetter
+from itertools import repeat
+from contextlib import contextmanager
+from collections import namedtuple
 
-# Check if valid IP address in CSV file
-def check_valid_ip_and_mask(csv_file_name):
-    with open(csv_file_name, mode='r', newline='') as file:
-        reader = csv.DictReader(file)
+from ipparse import parse_network, parse_network_bytes
+from mmapcsv import map_file, read_header, iter_rows, decode_field
+from prescan import scan_bytes
+from overlaps import CONTAINED, RECORD_BYTES as NETWORK_RECORD_BYTES, sweep_overlaps, conflict_order, describe_overlap
+from rowcache import file_digest, file_key, load_cache, save_cache, put_entry
+from csvio import csv_name, is_compressed, open_text
+from dedupe import DUPLICATE_MODES, RECORD_BYTES, row_key, key_digest, repeated_rows, BloomFilter
+from extsort import ExternalSorter
+from hostnames import PATTERN_ENV, hostname_rule, hostname_message
+from schema import IPGROUPS_SCHEMA, header_error, required_columns, columns_of_type, column_index
+
+# Bump whenever a check changes, so cached verdicts of older rules are not reused
+VALIDATOR_VERSION = '4.8'
+
+# Number of bytes pre-scanned for the delimiter check
+SNIFF_SIZE = 1024
+
+# Path that stands for the standard input
+STDIN_PATH = '-'
+
+# Examples kept per check in --all-errors mode, unless --max-examples says otherwise
+MAX_EXAMPLES = 10
+
+# Characters that make a path a glob pattern, as glob.has_magic() sees them
+GLOB_MAGIC = '*?['
+
+# --split auto: files from this size on are split across worker processes, smaller ones
+# are done before a pool would have started
+SPLIT_MIN_BYTES = 32 * 1024 * 1024
+
+# Bytes a split worker reads at a time
+SPLIT_READ_SIZE = 1024 * 1024
+
+# Hostnames checked together, see HostnameVisitor
+HOSTNAME_BATCH = 4096
+
+
+# Violations of one check in --all-errors mode: all of them are counted, only the first
+# `max_examples` are kept, so memory stays bounded however broken the file is
+class ErrorLog:
+    def __init__(self, max_examples):
+        self.max_examples = max_examples
+        self.count = 0
+        self.examples = []
+
+    def add(self, message):
+        self.count += 1
+        if len(self.examples) < self.max_examples:
+            self.examples.append(message)
+
+    def render(self):
+        lines = list(self.examples)
+        if self.count > len(self.examples):
+            lines.append(more_line(self.count - len(self.examples)))
+        return '\n'.join(lines)
+
+
+# Last line of the examples of a check, for the violations that were only counted
+def more_line(count):
+    return f"... and {count} more"
+
+
+# Warnings of a check, the ones --all-errors only counted included (see OverlapVisitor)
+def warning_count(warnings):
+    if warnings and warnings[-1].startswith('... and ') and warnings[-1].endswith(' more'):
+        return len(warnings) - 1 + int(warnings[-1].split()[2])
+    return len(warnings)
+
+
+# Every check is a visitor fed by one streaming pass over the file (see run_checks).
+# A visitor records the first problem it finds in `error` and is then dropped from the pass,
+# and can collect non-fatal findings in `warnings`. With an ErrorLog in `log` (--all-errors)
+# it records every problem there instead and stays in the pass.
+class RowVisitor:
+    label = ''
+    # Name of the check function it replaces, used in the --profile report
+    name = ''
+    # False for checks that only need the header and the sniffed head of the file
+    needs_rows = True
+
+    def __init__(self):
+        self.error = None
+        self.warnings = []
+        self.log = None
+        # Called on every problem recorded, see --pass-through
+        self.on_error = None
+        # Only kept up to date when run_checks() profiles the pass
+        self.rows = 0
+        self.seconds = 0.0
+
+    # Called once with the header row and the first SNIFF_SIZE characters of the file
+    def start(self, header, head):
+        pass
+
+    # Called for every non-blank data row, return False once the check has failed
+    def visit(self, row_number, row):
+        return True
+
+    # Called at the end of the file
+    def finish(self):
+        pass
+
+    # Fast path of visit() for fuse_visitors(): (source lines, {name: object they use}),
+    # where the fields of the row are the local variables `fields` names and `prefix` is
+    # bound to self.visit, to be called for the rows the fast path does not settle.
+    # Local names must start with prefix. None: every row goes through visit().
+    # raw: the fields are bytes from the mmap reader.
+    def inline(self, prefix, fields, raw):
+        return None
+
+    # Extra counters for the --profile report
+    def counters(self):
+        return {}
+
+    # Record a problem, returns what visit() should return
+    def fail(self, message):
+        if self.on_error is not None:
+            self.on_error()
+        if self.log is None:
+            self.error = message
+            return False
+        self.log.add(message)
+        return True
+
+
+# Check that the header has the columns of the schema, in its order (see schema.py)
+class HeaderVisitor(RowVisitor):
+    label = 'Checking if two columns exist in CSV file...'
+    name = 'two_columns_exist'
+    needs_rows = False
+
+    def __init__(self, schema=IPGROUPS_SCHEMA):
+        super().__init__()
+        self.schema = schema
+
+    def start(self, header, head):
+        error = header_error(header, self.schema)
+        if error is not None:
+            self.fail(error)
+
+
+# Check that the required columns of the schema are filled in on every row
+class EmptyValueVisitor(RowVisitor):
+    label = 'Checking for empty values in columns...'
+    name = 'there_is_empty_value_in_column'
+
+    def __init__(self, schema=IPGROUPS_SCHEMA):
+        super().__init__()
+        self.schema = schema
+        self.columns = required_columns(schema)
+        self.positions = [column_index(None, name, schema) for name in self.columns]
+
+    def start(self, header, head):
+        self.positions = [column_index(header, name, self.schema) for name in self.columns]
+
+    def visit(self, row_number, row):
+        keep = True
+        for name, position in zip(self.columns, self.positions):
+            if len(row) <= position or not row[position]:
+                keep = self.fail(f'Empty value for {name} detected at row {row_number}')
+                if not keep:
+                    return False
+        return keep
+
+    def inline(self, prefix, fields, raw):
+        if not self.positions or max(self.positions) >= len(fields):
+            return None
+        empty = ' or '.join(f"not {fields[position]}" for position in self.positions)
+        return [f"if {empty}:",
+                f"    keep = {prefix}(row_number, row) and keep"], {}
+
+
+class DelimiterVisitor(RowVisitor):
+    label = 'Checking if the delimiter is correct...'
+    name = 'is_good_delimiter'
+
+    def __init__(self):
+        super().__init__()
+        self.width = 0
+
+    def start(self, header, head):
+        self.width = len(header)
+        delimiter = scan_bytes(head.encode('utf-8')).delimiter
+        if delimiter is None:
+            self.fail("Error: The detected delimiter is not a comma. Please use ',' as the delimiter.")
+        elif delimiter != ',':
+            self.fail('Not a valid CSV file...')
+
+    # A row with more fields than the header has values no column is named for
+    def visit(self, row_number, row):
+        if len(row) > self.width:
+            return self.fail(f'Error: Row {row_number} has more fields than the header.')
+        return True
+
+    # The fused function only inlines the rows as wide as the header
+    def inline(self, prefix, fields, raw):
+        return [], {}
+
+
+# Check that no two rows hold the same values in the unique columns of the schema
+class DuplicateVisitor(RowVisitor):
+    label = 'Checking if there are duplicate values in the CSV file...'
+    name = 'is_there_duplicates'
+
+    # canonical: rows with the same hostname and network are duplicates however they are
+    # written (see dedupe.py), not only identical ones
+    def __init__(self, canonical=False, schema=IPGROUPS_SCHEMA):
+        super().__init__()
+        self.data = set()  # Create an empty data table
+        self.canonical = canonical
+        self.schema = schema
+        self._set_positions([column_index(None, name, schema) for name in schema.unique])
+
+    def start(self, header, head):
+        self._set_positions([column_index(header, name, self.schema) for name in self.schema.unique])
+
+    def _set_positions(self, positions):
+        self.positions = positions
+        self.values = itemgetter(*positions)
+
+    # Values of the unique columns of a row, the whole row when it is too short for them
+    def key(self, row):
+        try:
+            values = self.values(row)
+        except IndexError:
+            return tuple(row)
+        if self.canonical:
+            return row_key(*values)
+        return values
+
+    def visit(self, row_number, row):
+        row_data = self.key(row)
+        if row_data in self.data:
+            return self.fail(duplicate_message(row_number))
+        self.data.add(row_data)
+        return True
+
+    def inline(self, prefix, fields, raw):
+        if max(self.positions) >= len(fields):
+            return None
+        key, names = self.inline_key(prefix, fields)
+        names.update({f"{prefix}_data": self.data, f"{prefix}_add": self.data.add})
+        return [f"{prefix}_row = {key}",
+                f"if {prefix}_row in {prefix}_data:",
+                f"    keep = {prefix}(row_number, row) and keep",
+                "else:",
+                f"    {prefix}_add({prefix}_row)"], names
+
+    # (expression of key() for a row of `fields`, the names it uses)
+    def inline_key(self, prefix, fields):
+        values = ', '.join(fields[position] for position in self.positions)
+        if self.canonical:
+            return f"{prefix}_key({values})", {f"{prefix}_key": row_key}
+        return (values if len(self.positions) == 1 else f"({values})"), {}
+
+
+def duplicate_message(row_number):
+    return f'Duplicate data found in row {row_number}.'
+
+
+# DuplicateVisitor in bounded memory (--dedupe-memory): every row becomes a (digest, row
+# number) record, sorted in runs of about memory_budget bytes that are spilled to a
+# temporary file and merged once the file is read (see extsort).
+# With bloom and `rescan` (a callable yielding the (row_number, row) of the file again),
+# the pass only fills a BloomFilter of half the budget and keeps the digests it flags.
+# Nothing flagged means no duplicate, without touching the disk; otherwise the file is
+# read again to confirm the flagged ones, or to sort everything when they don't fit.
+class BoundedDuplicateVisitor(DuplicateVisitor):
+    def __init__(self, canonical=False, memory_budget=64 * 1024 * 1024, bloom=False, rescan=None,
+                 schema=IPGROUPS_SCHEMA):
+        super().__init__(canonical, schema)
+        self.data = None
+        self.memory_budget = memory_budget
+        self.rescan = rescan
+        self.filter = BloomFilter(memory_budget // 2) if bloom and rescan is not None else None
+        self.flagged = set()
+        self.overflow = False  # more flagged digests than half the budget holds
+        self.sorter = None if self.filter is not None else self._sorter()
+        self.spilled_runs = 0
+        self.rescanned = False
+
+    def _sorter(self):
+        return ExternalSorter.for_budget(self.memory_budget, RECORD_BYTES)
+
+    def visit(self, row_number, row):
+        digest = key_digest(self.key(row))
+        if self.filter is None:
+            self.sorter.add((digest, row_number))
+        elif self.filter.add(digest) and not self.overflow:
+            self.flagged.add(digest)
+            if len(self.flagged) * RECORD_BYTES > self.memory_budget // 2:
+                self.overflow = True
+                self.flagged = set()
+        return True
+
+    def inline(self, prefix, fields, raw):
+        return None
+
+    def finish(self):
+        if self.filter is not None:
+            if not self.flagged and not self.overflow:
+                return
+            self.rescanned = True
+            if not self.overflow:
+                self._report(self._confirm())
+                return
+            # The filter has done its job, make room for the runs
+            self.filter = None
+            self.sorter = self._sorter()
+            for row_number, row in self.rescan():
+                self.sorter.add((key_digest(self.key(row)), row_number))
+        try:
+            self._report(repeated_rows(self.sorter.merged()))
+            self.spilled_runs = self.sorter.spilled_runs
+        finally:
+            self.sorter.close()
+
+    # Row numbers of the flagged digests seen before in the file
+    def _confirm(self):
+        first_rows = {}
+        for row_number, row in self.rescan():
+            digest = key_digest(self.key(row))
+            if digest in self.flagged:
+                if digest in first_rows:
+                    yield row_number
+                else:
+                    first_rows[digest] = row_number
+
+    # Fails with the earliest repeated rows, which come in digest order
+    def _report(self, repeats):
+        keep = 1 if self.log is None else self.log.max_examples
+        earliest = []  # negated, so the heap top is the latest row kept
+        count = 0
+        for row_number in repeats:
+            count += 1
+            if len(earliest) < keep:
+                heapq.heappush(earliest, -row_number)
+            elif earliest and -earliest[0] > row_number:
+                heapq.heapreplace(earliest, -row_number)
+        if not count:
+            return
+        rows = sorted(-row_number for row_number in earliest)
+        if self.log is None:
+            self.fail(duplicate_message(rows[0]))
+        else:
+            self.log.count = count
+            self.log.examples = [duplicate_message(row_number) for row_number in rows]
+
+    def counters(self):
+        return {'spilled_runs': self.spilled_runs, 'bloom_flagged': len(self.flagged),
+                'bloom_overflow': self.overflow, 'rescanned': self.rescanned}
+
+
+# Hostnames must be RFC 1123 names following the naming convention, if any (see
+# hostnames.py). Names are checked by batches of HOSTNAME_BATCH as they come, so a
+# failure is only seen up to one batch later. Empty ones are left to EmptyValueVisitor.
+# Checks the (first) hostname column of the schema.
+class HostnameVisitor(RowVisitor):
+    label = 'Checking if hostnames are valid...'
+    name = 'check_valid_hostname'
+
+    def __init__(self, pattern=None, schema=IPGROUPS_SCHEMA):
+        super().__init__()
+        self.rule = hostname_rule(pattern)
+        self.schema = schema
+        self.column = columns_of_type(schema, 'hostname')[0]
+        self.position = column_index(None, self.column, schema)
+        # Filled in place, fuse_visitors() binds their append methods
+        self.names = []
+        self.row_numbers = []
+
+    def start(self, header, head):
+        self.position = column_index(header, self.column, self.schema)
+
+    def visit(self, row_number, row):
+        if len(row) > self.position and row[self.position]:
+            self.names.append(row[self.position])
+            self.row_numbers.append(row_number)
+            if len(self.names) >= HOSTNAME_BATCH:
+                return self._check_batch()
+        return True
+
+    def inline(self, prefix, fields, raw):
+        if self.position >= len(fields):
+            return None
+        field = fields[self.position]
+        return [f"if {field}:",
+                f"    {prefix}_name({field})",
+                f"    {prefix}_row(row_number)",
+                f"    if len({prefix}_names) >= {HOSTNAME_BATCH}:",
+                f"        keep = {prefix}_batch() and keep"], \
+            {f"{prefix}_names": self.names, f"{prefix}_name": self.names.append,
+             f"{prefix}_row": self.row_numbers.append, f"{prefix}_batch": self._check_batch}
+
+    def finish(self):
+        self._check_batch()
+
+    def _check_batch(self):
+        names = self.names[:]
+        row_numbers = self.row_numbers[:]
+        self.names.clear()
+        self.row_numbers.clear()
+        for position in self.rule.invalid(names):
+            hostname = names[position]
+            message = hostname_message(row_numbers[position], decode_field(hostname), self.rule.error(hostname))
+            if not self.fail(message):
+                return False
+        return True
+
+
+# Also keeps the parsed networks for the overlap check, as (version, network, prefixlen,
+# row_number) records in an ExternalSorter: in memory, or within memory_budget bytes
+# spilling sorted runs to disk (--dedupe-memory).
+# Checks the (first) cidr column of the schema.
+class IpAndMaskVisitor(RowVisitor):
+    label = 'Checking if IP addresses are valid...'
+    name = 'check_valid_ip_and_mask'
+
+    def __init__(self, schema=IPGROUPS_SCHEMA, memory_budget=None):
+        super().__init__()
+        self.schema = schema
+        self.column = columns_of_type(schema, 'cidr')[0]
+        self.position = column_index(None, self.column, schema)
+        self.bounded = bool(memory_budget)
+        if self.bounded:
+            self.networks = ExternalSorter.for_budget(memory_budget, NETWORK_RECORD_BYTES)
+        else:
+            self.networks = ExternalSorter(run_size=sys.maxsize)
+        self.parse_cache_before = None
+
+    def start(self, header, head):
+        self.position = column_index(header, self.column, self.schema)
+        self.parse_cache_before = _parse_cache_counts()
+
+    def visit(self, row_number, row):
+        if len(row) <= self.position:
+            return self.fail(f"Error in row {row_number}: '{self.column}' column is missing.")
+        # The 'Ip_Address' column contains the IP/mask, raw bytes with the mmap reader
+        ip_with_mask = row[self.position]
+        parse = parse_network_bytes if ip_with_mask.__class__ is bytes else parse_network
+        try:
+            self.networks.add(parse(ip_with_mask) + (row_number,))
+        except ValueError as e:
+            return self.fail(f'Error in row {row_number}: {e} - {decode_field(ip_with_mask)}')
+        return True
+
+    # Rows that don't parse go through visit() to be reported
+    def inline(self, prefix, fields, raw):
+        if self.position >= len(fields):
+            return None
+        return ["try:",
+                f"    {prefix}_network({prefix}_parse({fields[self.position]}) + (row_number,))",
+                "except ValueError:",
+                f"    keep = {prefix}(row_number, row) and keep"], \
+            {f"{prefix}_network": self.networks.add if self.bounded else self.networks.run.append,
+             f"{prefix}_parse": parse_network_bytes if raw else parse_network}
+
+    def counters(self):
+        hits, misses = _parse_cache_counts()
+        hits -= self.parse_cache_before[0]
+        misses -= self.parse_cache_before[1]
+        counters = {
+            'parse_cache_hits': hits,
+            'parse_cache_misses': misses,
+            'parse_cache_hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+        if self.bounded:
+            counters['spilled_runs'] = self.networks.spilled_runs
+        return counters
+
+
+# Check that no network overlaps or contains another one, using the networks
+# parsed by the IP check
+class OverlapVisitor(RowVisitor):
+    label = 'Checking for overlapping networks...'
+    name = 'check_overlaps'
+    needs_rows = False
+
+    def __init__(self, ip_visitor, containment_is_warning=False):
+        super().__init__()
+        self.ip_visitor = ip_visitor
+        self.containment_is_warning = containment_is_warning
+
+    def finish(self):
+        if self.log is not None:
+            self._log_conflicts()
+            return
+        errors = []
+        for conflict in sorted(self._conflicts(), key=conflict_order):
+            if self.containment_is_warning and conflict[0] == CONTAINED:
+                self.warnings.append(describe_overlap(conflict))
+            else:
+                errors.append(describe_overlap(conflict))
+        if errors:
+            self.error = '\n'.join(errors)
+
+    # The conflicts of the networks of the IP check, in address order
+    def _conflicts(self):
+        networks = self.ip_visitor.networks
+        try:
+            yield from sweep_overlaps(networks.merged())
+        finally:
+            networks.close()
+
+    # --all-errors: every conflict is counted, only the first ones of the errors and of the
+    # contained warnings are kept, then sorted and described, so a file where one wide
+    # network holds every row stays cheap
+    def _log_conflicts(self):
+        keep = self.log.max_examples
+        errors = []
+        contained = []
+        contained_count = 0
+        for conflict in self._conflicts():
+            if self.containment_is_warning and conflict[0] == CONTAINED:
+                contained_count += 1
+                _keep_first(contained, keep, conflict)
+            else:
+                self.log.count += 1
+                _keep_first(errors, keep, conflict)
+        self.log.examples = [describe_overlap(conflict) for conflict in _first_kept(errors)]
+        self.warnings = [describe_overlap(conflict) for conflict in _first_kept(contained)]
+        if contained_count > len(self.warnings):
+            self.warnings.append(more_line(contained_count - len(self.warnings)))
+
+
+# Keeps the `limit` first conflicts (in conflict_order) pushed on a heap, whose top is the
+# latest of them; a row is in one conflict at most, so their orders never tie
+def _keep_first(heap, limit, conflict):
+    inner_row, outer_row = conflict_order(conflict)
+    entry = (-inner_row, -outer_row), conflict
+    if len(heap) < limit:
+        heapq.heappush(heap, entry)
+    elif heap and entry[0] > heap[0][0]:
+        heapq.heapreplace(heap, entry)
+
+
+def _first_kept(heap):
+    return [conflict for order, conflict in sorted(heap, reverse=True)]
+
+
+# Settings shared by every file of a run, picklable for the batch workers.
+# split is 'auto', 'on' or 'off' (see run_checks_split), jobs the worker processes,
+# duplicates 'strict' or 'canonical' (see dedupe.py), dedupe_memory the byte budget of the
+# bounded duplicate check, and of the networks kept for the overlap check, or None to keep
+# them all in memory, bloom the Bloom filter pass of the duplicate check,
+# hostnames whether hostnames are checked and hostname_pattern their naming convention
+# (None: the one of the environment, see hostnames.py).
+CheckOptions = namedtuple('CheckOptions', ['containment_is_warning', 'use_mmap', 'profile', 'all_errors',
+                                           'max_examples', 'split', 'jobs', 'duplicates', 'dedupe_memory',
+                                           'bloom', 'hostnames', 'hostname_pattern'],
+                          defaults=[False, False, False, False, MAX_EXAMPLES, 'auto', None, 'strict', None,
+                                    False, True, None])
+
+
+# Checks in the order main() reports them, built from the schema (see schema.py): its
+# header, its required columns, its unique columns, its hostname and cidr columns.
+# file_path lets the bounded duplicate check read the file again, on_error is called on
+# every problem a check records.
+def default_visitors(options=CheckOptions(), file_path=None, schema=IPGROUPS_SCHEMA, on_error=None):
+    ip_visitor = IpAndMaskVisitor(schema, options.dedupe_memory)
+    canonical = options.duplicates == 'canonical'
+    if options.dedupe_memory:
+        rescan = None
+        if file_path is not None and file_path != STDIN_PATH:
+            rescan = partial(_data_rows, file_path, options.use_mmap)
+        duplicates = BoundedDuplicateVisitor(canonical, options.dedupe_memory, options.bloom, rescan, schema)
+    else:
+        duplicates = DuplicateVisitor(canonical, schema)
+    visitors = [
+        HeaderVisitor(schema),
+        EmptyValueVisitor(schema),
+        DelimiterVisitor(),
+        duplicates,
+        ip_visitor,
+        OverlapVisitor(ip_visitor, options.containment_is_warning),
+    ]
+    if options.hostnames and columns_of_type(schema, 'hostname'):
+        visitors.insert(4, HostnameVisitor(options.hostname_pattern, schema))
+    for visitor in visitors:
+        visitor.on_error = on_error
+        if options.all_errors:
+            visitor.log = ErrorLog(options.max_examples)
+    return visitors
+
+
+# Hits and misses of the IP parse caches so far, in this process
+def _parse_cache_counts():
+    text = parse_network.cache_info()
+    raw = parse_network_bytes.cache_info()
+    return text.hits + raw.hits, text.misses + raw.misses
+
+
+def _first_failed(visitors):
+    for index, visitor in enumerate(visitors):
+        if visitor.error is not None:
+            return index
+    return None
+
+
+# Read the CSV file once and feed every row to all the visitors.
+# Returns a list of (label, error, warnings, error_count) for the checks up to and
+# including the first one that failed, in visitor order; error is None for a check that
+# passed. With ErrorLogs (--all-errors) every check runs over the whole file and is
+# reported, error holds the kept examples and error_count the number of violations;
+# otherwise error_count is None.
+# With a `profile` dict, the time, rows and bytes of the pass and of every check are
+# recorded in it (see profile_entry).
+# The row checks run fused into one function (see fuse_visitors); with fuse=False, or
+# when profiling, every visitor is called in turn instead.
+def run_checks(file_path, visitors=None, use_mmap=False, profile=None, fuse=True):
+    if visitors is None:
+        visitors = default_visitors()
+    started = time.perf_counter()
+
+    with _open_rows(file_path, use_mmap) as (head, header, reader, tell):
+        for visitor in visitors:
+            _timed(profile, visitor, visitor.start, header, head)
+
+        active = [visitor for visitor in visitors if visitor.needs_rows and visitor.error is None]
+        if profile is None:
+            checks = dispatch_visitors
+            if fuse:
+                # The mmap reader yields bytes, see _open_rows()
+                raw = use_mmap and file_path != STDIN_PATH
+                checks = partial(fuse_visitors, width=len(header), raw=raw)
+            _feed_rows(reader, visitors, active, checks)
+        else:
+            profile['rows'], profile['read_seconds'] = _feed_rows_profiled(reader, visitors, active)
+            profile['bytes_read'] = tell()
+
+    stop = _finish_checks(visitors, profile)
+    if profile is not None:
+        profile['seconds'] = time.perf_counter() - started
+        profile['checks'] = [profile_entry(visitor) for visitor in visitors[:stop]]
+    return _results(visitors[:stop])
+
+
+# Ends the checks once every row has been seen, returns how many of them get reported
+def _finish_checks(visitors, profile=None):
+    if any(visitor.log is not None for visitor in visitors):
+        for visitor in visitors:
+            _timed(profile, visitor, visitor.finish)
+            if visitor.log is not None and visitor.log.count:
+                visitor.error = visitor.log.render()
+        stop = len(visitors)
+    else:
+        # Checks ordered after a failure are never reported, don't bother finishing them
+        failed = _first_failed(visitors)
+        for visitor in visitors[:failed]:
+            if visitor.error is None:
+                _timed(profile, visitor, visitor.finish)
+
+        failed = _first_failed(visitors)
+        stop = len(visitors) if failed is None else failed + 1
+    return stop
+
+
+def _results(visitors):
+    return [(visitor.label, visitor.error, visitor.warnings, None if visitor.log is None else visitor.log.count)
+            for visitor in visitors]
+
+
+# `checks` makes the function that visits a row with the active visitors, it is made
+# again whenever one of them is dropped
+def _feed_rows(reader, visitors, active, checks=None):
+    checks = checks or dispatch_visitors
+    check = checks(active)
+    done = _decided(visitors, active)
+    row_number = 1
+    for row in reader:
+        if done:
+            break
+        row_number += 1
+        if not row:
+            # Blank lines are skipped, like csv.DictReader does
+            continue
+        if not check(row_number, row):
+            active = [visitor for visitor in active if visitor.error is None]
+            check = checks(active)
+            done = _decided(visitors, active)
+
+
+# Function visiting a row with every visitor in turn, returns False when one of them
+# returned False
+def dispatch_visitors(visitors):
+    visits = [visitor.visit for visitor in visitors]
+
+    def dispatch(row_number, row):
+        keep = True
+        for visit in visits:
+            if not visit(row_number, row):
+                keep = False
+        return keep
+
+    return dispatch
+
+
+# Same as dispatch_visitors(), compiled for the rows of `width` fields into a single
+# function: its body is the fast paths of the visitors one after the other (see
+# RowVisitor.inline) and everything they use is bound to a local variable, so a row that
+# passes costs one call, without a method lookup or a dispatch per check. Rows of another
+# width, and the visitors without a fast path, go through visit().
+def fuse_visitors(visitors, width, raw=False):
+    dispatch = dispatch_visitors(visitors)
+    if not width:
+        return dispatch
+    fields = [f"field{position}" for position in range(width)]
+    bindings = {'dispatch': dispatch, 'len': len}
+    body = []
+    for index, visitor in enumerate(visitors):
+        prefix = f"check{index}"
+        bindings[prefix] = visitor.visit
+        inline = visitor.inline(prefix, fields, raw)
+        if inline is None:
+            body.append(f"keep = {prefix}(row_number, row) and keep")
+        else:
+            lines, names = inline
+            body.extend(lines)
+            bindings.update(names)
+    source = '\n'.join([
+        f"def fused(row_number, row, {', '.join(f'{name}={name}' for name in bindings)}):",
+        f"    if len(row) != {width}:",
+        "        return dispatch(row_number, row)",
+        f"    {', '.join(fields)}, = row",
+        "    keep = True",
+        *(f"    {line}" for line in body),
+        "    return keep",
+        "",
+    ])
+    exec(_compile_fused(source), bindings)
+    return bindings['fused']
+
+
+# The sources repeat from file to file, only what they are bound to changes
+@lru_cache(maxsize=64)
+def _compile_fused(source):
+    return compile(source, '<fused visitors>', 'exec')
+
+
+# Same as _feed_rows(), timing the reader and every visitor.
+# Returns (rows read, seconds spent reading and splitting rows).
+def _feed_rows_profiled(reader, visitors, active):
+    clock = time.perf_counter
+    read_seconds = 0.0
+    done = _decided(visitors, active)
+    row_number = 1
+    before = clock()
+    for row in reader:
+        read_seconds += clock() - before
+        if done:
+            break
+        row_number += 1
+        if row:
+            dropped = False
+            for visitor in active:
+                visit_started = clock()
+                if not visitor.visit(row_number, row):
+                    dropped = True
+                visitor.seconds += clock() - visit_started
+                visitor.rows += 1
+            if dropped:
+                active = [visitor for visitor in active if visitor.error is None]
+                done = _decided(visitors, active)
+        before = clock()
+    else:
+        read_seconds += clock() - before
+    return row_number - 1, read_seconds
+
+
+def _timed(profile, visitor, method, *args):
+    if profile is None:
+        return method(*args)
+    started = time.perf_counter()
+    try:
+        return method(*args)
+    finally:
+        visitor.seconds += time.perf_counter() - started
+
+
+# One check of the --profile report
+def profile_entry(visitor):
+    entry = {
+        'name': visitor.name,
+        'label': visitor.label,
+        'passed': visitor.error is None,
+        'seconds': round(visitor.seconds, 6),
+        'rows': visitor.rows,
+    }
+    entry.update(visitor.counters())
+    return entry
+
+
+# (row_number, row) of the non-blank data rows, numbered like run_checks() does
+def _data_rows(file_path, use_mmap):
+    with _open_rows(file_path, use_mmap) as (head, header, reader, tell):
         for row_number, row in enumerate(reader, start=2):
+            if row:
+                yield row_number, row
+
+
+# Yields (head, header, rows, tell) where head is the start of the file for the delimiter
+# sniffer, rows iterates the data rows, blank ones included as empty lists, and tell()
+# returns how many bytes of the file have been read so far
+@contextmanager
+def _open_rows(file_path, use_mmap):
+    if file_path == STDIN_PATH:
+        with _open_stdin() as (file, counter):
+            yield from _stream_rows(file, lambda: counter.bytes_read)
+        return
+
+    if use_mmap:
+        with open(file_path, 'rb') as file, map_file(file) as mapped:
+            head = decode_field(mapped[:SNIFF_SIZE])
+            header, start = read_header(mapped)
+            yield head, header, iter_rows(mapped, start), lambda: mapped.tell() if mapped else 0
+        return
+
+    with open_text(file_path) as file:
+        # Position of the buffered binary file, it reads ahead of the rows by one buffer
+        # (of the decompressed content for a compressed file)
+        yield from _stream_rows(file, file.buffer.tell)
+
+
+def _stream_rows(file, tell):
+    head = file.read(SNIFF_SIZE)
+    # Complete the line cut by the sniff buffer, then keep streaming from the file
+    lines = head + file.readline()
+    reader = csv.reader(_chain_lines(lines, file))
+    header = next(reader, None) or []
+    yield head, header, reader, tell
+
+
+# Counts the bytes read from a stream that can't tell() (a pipe), and copies them to
+# `sink` when there is one
+class _CountingReader(io.RawIOBase):
+    def __init__(self, raw, sink=None):
+        self.raw = raw
+        self.sink = sink
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.raw.readinto(buffer)
+        if count:
+            self.bytes_read += count
+            if self.sink is not None:
+                self.sink.write(bytes(buffer[:count]))
+        return count
+
+
+# Where --pass-through copies the standard input: the bytes go on as they are read until a
+# check records a problem, nothing after that. The bytes read ahead of the failing row,
+# a few read buffers at most, are already out by then. The overlap check, and the
+# duplicate check with --dedupe-memory, only decide at the end of the input: a file
+# failing them goes through whole, with the exit status to tell.
+class _PassThrough:
+    def __init__(self, out):
+        self.out = out
+        self.stopped = False
+
+    def write(self, data):
+        if not self.stopped:
+            self.out.write(data)
+
+    def stop(self):
+        self.stopped = True
+
+    def flush(self):
+        self.out.flush()
+
+
+# Text stream over the standard input, read as it arrives like a file opened with
+# newline='' would be; stdin itself is left open
+@contextmanager
+def _open_stdin():
+    counter = _CountingReader(sys.stdin.buffer)
+    file = io.TextIOWrapper(io.BufferedReader(counter), newline='')
+    try:
+        yield file, counter
+    finally:
+        file.detach()
+
+
+def _chain_lines(first, rest):
+    yield from io.StringIO(first, newline='')
+    yield from rest
+
+
+# True once a check has failed and every check ordered before it has failed too,
+# so the rest of the file cannot change what gets reported
+def _decided(visitors, active):
+    if not active:
+        return True
+    failed = _first_failed(visitors)
+    return failed is not None and visitors.index(active[0]) > failed
+
+
+## One large file across processes (--split)
+
+# Same results as run_checks() with default_visitors(), the data rows being checked by
+# `jobs` worker processes, each on a newline-aligned byte range of the file. Workers
+# number their rows from the line their range starts at, so messages carry absolute row
+# numbers. The parent merges what they send back: the first error of a check is the one
+# of the earliest range, duplicates are found across ranges from a digest of every row,
+# and the overlap check runs on the networks of all the ranges.
+# Returns None when the file can't be split faithfully (quotes, which may hide line
+# breaks, bare CR line endings, or text that does not decode), run_checks() then does it.
+def run_checks_split(file_path, visitors, options=CheckOptions()):
+    with _open_rows(file_path, False) as (head, header, reader, tell):
+        for visitor in visitors:
+            visitor.start(header, head)
+    with open(file_path, 'rb') as file:
+        first_line = file.readline()
+        if b'"' in first_line or b'\r' in first_line.rstrip(b'\r\n'):
+            return None
+        data_start = file.tell()
+        size = os.fstat(file.fileno()).st_size
+
+    active = [visitor for visitor in visitors if visitor.needs_rows and visitor.error is None]
+    if not _decided(visitors, active) and size > data_start:
+        ranges = _split_ranges(file_path, data_start, size, options.jobs or os.cpu_count() or 1)
+        starts = [start for start, end in ranges]
+        ends = [end for start, end in ranges]
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+            scans = list(executor.map(_scan_range, repeat(file_path), starts, ends))
+            if any(quotes or bare_cr for newlines, quotes, bare_cr in scans):
+                return None
+            first_rows = [2]
+            for newlines, quotes, bare_cr in scans[:-1]:
+                first_rows.append(first_rows[-1] + newlines)
             try:
-                # The 'Ip_Address' column contains the IP/mask
-                ip_with_mask = row['Ip_Address']
-                ipaddress.ip_network(ip_with_mask, strict=False)
-            except ValueError as e:
-                print(f"Error in row {row_number}: {e} - {ip_with_mask}")
-                return False
-            except KeyError:
-                print(f"Error in row {row_number}: 'Ip_Address' column is missing.")
-                return False
-            except Exception as e:
-                print(f"An unexpected error occurred in row {row_number}: {e}")
-                return False
-    return True
+                outcomes = list(executor.map(_check_range, repeat(file_path), starts, ends, first_rows,
+                                             repeat(options), repeat(header)))
+            except UnicodeDecodeError:
+                return None
+        _merge_ranges(visitors, outcomes)
 
-# Check that exactly 2 columns exist in CSV file
-def two_columns_exist(header):
-    required_columns = ['Hostname', 'Ip_Address']
-    if len(header) != 2:
-        print("Error: CSV file must contain exactly two columns.")
+    return _results(visitors[:_finish_checks(visitors)])
+
+
+# Whether validate_file_cached() splits a file (see --split)
+def _should_split(file_path, options):
+    if options.split == 'off' or file_path == STDIN_PATH or is_compressed(file_path) or options.profile:
         return False
-    if required_columns[0] not in header or required_columns[1] not in header:
-        print("Error: CSV file must contain 'Hostname' and 'Ip_Address' columns.")
+    if options.dedupe_memory:
+        # The workers would keep every digest in memory
         return False
-    if header[0] != 'Hostname' or header[1] != 'Ip_Address':
-        print("Error: First row must contain 'Hostname' and 'Ip_Address'.")
+    if options.split == 'on':
+        return True
+    return (options.jobs or os.cpu_count() or 1) > 1 and os.path.getsize(file_path) >= SPLIT_MIN_BYTES
+
+
+# About `count` [start, end) byte ranges of the data rows, each ending after a line break
+def _split_ranges(file_path, data_start, size, count):
+    bounds = [data_start]
+    with open(file_path, 'rb') as file:
+        for index in range(1, count):
+            file.seek(data_start + (size - data_start) * index // count - 1)
+            file.readline()
+            boundary = file.tell()
+            if bounds[-1] < boundary < size:
+                bounds.append(boundary)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+# Blocks of a range, each ending after a line break unless the file ends without one
+def _read_range(file_path, start, end):
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = file.read(min(SPLIT_READ_SIZE, remaining))
+            if not block:
+                return
+            if not block.endswith(b'\n') and len(block) < remaining:
+                block += file.readline()
+            remaining -= len(block)
+            yield block
+
+
+# (line breaks, quotes, CR not followed by LF) of a range, in a worker
+def _scan_range(file_path, start, end):
+    newlines = quotes = bare_cr = 0
+    for block in _read_range(file_path, start, end):
+        newlines += block.count(b'\n')
+        quotes += block.count(b'"')
+        bare_cr += block.count(b'\r') - block.count(b'\r\n')
+    return newlines, quotes, bare_cr
+
+
+# DuplicateVisitor of a split worker: keeps the key of every row with the first row it
+# appeared in, for the parent to find repeats across ranges
+class _RangeDuplicateVisitor(DuplicateVisitor):
+    def __init__(self, canonical=False):
+        super().__init__(canonical)
+        self.keys = {}
+        self.repeats = []  # first repeated rows within the range, as many as get reported
+
+    def visit(self, row_number, row):
+        first = self.keys.setdefault(self.key(row), row_number)
+        if first == row_number:
+            return True
+        if self.log is None or len(self.repeats) < self.log.max_examples:
+            self.repeats.append(row_number)
+        return self.fail(duplicate_message(row_number))
+
+    def inline(self, prefix, fields, raw):
+        if max(self.positions) >= len(fields):
+            return None
+        key, names = self.inline_key(prefix, fields)
+        names[f"{prefix}_first"] = self.keys.setdefault
+        return [f"if {prefix}_first({key}, row_number) != row_number:",
+                f"    keep = {prefix}(row_number, row) and keep"], names
+
+
+# Row checks of one range, in a worker. The file has no quotes (see _scan_range), so a
+# line is a row and splitting it on ',' gives what csv.reader would.
+def _check_range(file_path, start, end, first_row, options, header):
+    import locale
+    encoding = locale.getpreferredencoding(False)  # what open() decodes the file with
+    empty = EmptyValueVisitor()
+    duplicates = _RangeDuplicateVisitor(options.duplicates == 'canonical')
+    ip_visitor = IpAndMaskVisitor()
+    hostnames = HostnameVisitor(options.hostname_pattern) if options.hostnames else None
+    active = [empty, duplicates, ip_visitor] + ([hostnames] if hostnames is not None else [])
+    for visitor in active:
+        visitor.start(header, '')
+    # The parent checked the head, the worker only checks the width of the rows
+    delimiter = DelimiterVisitor()
+    delimiter.width = len(header)
+    active.append(delimiter)
+    for visitor in active:
+        if options.all_errors:
+            visitor.log = ErrorLog(options.max_examples)
+    check = fuse_visitors(active, len(header))
+
+    row_number = first_row - 1
+    for block in _read_range(file_path, start, end):
+        lines = block.decode(encoding).split('\n')
+        if block.endswith(b'\n'):
+            lines.pop()
+        for line in lines:
+            row_number += 1
+            if line.endswith('\r'):
+                line = line[:-1]
+            if not line:
+                continue
+            if not check(row_number, line.split(',')):
+                active = [visitor for visitor in active if visitor.error is None]
+                check = fuse_visitors(active, len(header))
+        if not active:
+            break
+
+    if hostnames is not None and hostnames.error is None:
+        hostnames.finish()
+    return (_range_state(empty), _range_state(ip_visitor), ip_visitor.networks.run,
+            (duplicates.keys, duplicates.repeats, _range_state(duplicates)[1]),
+            None if hostnames is None else _range_state(hostnames), _range_state(delimiter))
+
+
+# (first error, number of errors, examples) of a worker visitor
+def _range_state(visitor):
+    if visitor.log is None:
+        return visitor.error, int(visitor.error is not None), []
+    return visitor.error, visitor.log.count, visitor.log.examples
+
+
+# Sets the parent visitors as if they had seen every range, in file order
+def _merge_ranges(visitors, outcomes):
+    empty = next(visitor for visitor in visitors if isinstance(visitor, EmptyValueVisitor))
+    duplicates = next(visitor for visitor in visitors if isinstance(visitor, DuplicateVisitor))
+    ip_visitor = next(visitor for visitor in visitors if isinstance(visitor, IpAndMaskVisitor))
+    hostnames = next((visitor for visitor in visitors if isinstance(visitor, HostnameVisitor)), None)
+    delimiter = next(visitor for visitor in visitors if isinstance(visitor, DelimiterVisitor))
+
+    merged = [(empty, [outcome[0] for outcome in outcomes]), (ip_visitor, [outcome[1] for outcome in outcomes]),
+              (delimiter, [outcome[5] for outcome in outcomes])]
+    if hostnames is not None:
+        merged.append((hostnames, [outcome[4] for outcome in outcomes]))
+    for visitor, states in merged:
+        for error, count, examples in states:
+            if visitor.log is None:
+                # The parent may have failed the check already, on the head of the file
+                if error is not None and visitor.error is None:
+                    visitor.error = error
+                    break
+                continue
+            visitor.log.count += count
+            visitor.log.examples.extend(examples[:visitor.log.max_examples - len(visitor.log.examples)])
+    for outcome in outcomes:
+        if ip_visitor.bounded:
+            for record in outcome[2]:
+                ip_visitor.networks.add(record)
+        else:
+            ip_visitor.networks.run.extend(outcome[2])
+
+    # A row repeats an earlier one of its own range (the worker saw it) or of an earlier
+    # range, then it is the first row of its range with that key
+    seen = set()
+    repeated = []
+    count = 0
+    for keys, repeats, repeat_count in (outcome[3] for outcome in outcomes):
+        across = [keys[key] for key in keys.keys() & seen]
+        repeated.extend(repeats)
+        repeated.extend(across)
+        count += repeat_count + len(across)
+        seen.update(keys)
+    repeated.sort()
+    if duplicates.log is None:
+        if repeated:
+            duplicates.error = duplicate_message(repeated[0])
+    else:
+        duplicates.log.count = count
+        duplicates.log.examples = [duplicate_message(row_number)
+                                   for row_number in repeated[:duplicates.log.max_examples]]
+
+
+# Validate through a single check, printing its error like the original helpers did
+def _run_single(file_path, visitor):
+    (label, error, warnings, error_count), = run_checks(file_path, [visitor])
+    if error is not None:
+        print(error)
+        return False
+    return True
+
+
+# Check if valid IP address in CSV file
+def check_valid_ip_and_mask(csv_file_name):
+    return _run_single(csv_file_name, IpAndMaskVisitor())
+
+# Check that the hostnames are valid RFC 1123 names
+def check_valid_hostname(csv_file_name):
+    return _run_single(csv_file_name, HostnameVisitor())
+
+# Check that the header has the columns of the schema (see schema.py)
+def two_columns_exist(header):
+    error = header_error(header)
+    if error is not None:
+        print(error)
         return False
     return True
 
 # Check that no empty rows exist
 def there_is_empty_value_in_column(file_path):
-    with open(file_path, 'r') as file:
-        reader = csv.DictReader(file)
-        for row_number, row in enumerate(reader, start=2):
-            hostname = row.get('Hostname')
-            ip_address = row.get('Ip_Address')
-            
-            if not hostname:
-                print(f'Empty value for Hostname detected at row {row_number}')
-                return False
-            
-            if not ip_address:
-                print(f'Empty value for Ip_Address detected at row {row_number}')
-                return False
-    return True
+    return _run_single(file_path, EmptyValueVisitor())
 
 # Check that delimiter is ','
 def is_good_delimiter(file_path):
     try:
-        with open(file_path, 'r') as file:
-            dialect = csv.Sniffer().sniff(file.read(1024))
-            file.seek(0)  # Reset the file pointer to the beginning of the file
-            if dialect.delimiter == ',':
-                return True
-            else:
-                print('Not a valid CSV file...')
-                return False
-    except (csv.Error, FileNotFoundError):
+        return _run_single(file_path, DelimiterVisitor())
+    except FileNotFoundError:
         print("Error: The detected delimiter is not a comma. Please use ',' as the delimiter.")
         return False
 
 # Check that no duplicate rows exist in the CSV file
 def is_there_duplicates(file_path):
-    data = set()  # Create an empty data table
-    with open(file_path, 'r') as file:
-        reader = csv.reader(file)
-        next(reader)  # Skip the header row
-        row_number = 2
-        for row in reader:
-            row_data = tuple(row)
-            if row_data in data:
-                print(f"Duplicate data found in row {row_number}.")
-                return False
-            data.add(row_data)
-            row_number += 1
-    return True
+    return _run_single(file_path, DuplicateVisitor())
 
 def remove_empty_lines(rows):
     return [row for row in rows if any(row.values())]
 
 def is_csv_file(file_path):
-    if not file_path.lower().endswith('.csv'):
+    if not csv_name(file_path).lower().endswith('.csv'):
         print("Error: The file does not have a .csv extension.")
         return False
     return True
 
-## Main section
-def main():
-    if len(sys.argv) != 2:
-        print("Usage: python filecsv.py <input_csv_file>")
-        sys.exit(1)
-    
-    input_csv_file = sys.argv[1]  # Take first argument as input file path
-    
-    if not is_csv_file(input_csv_file):
-        sys.exit(1)
-    
+# Print the PASSED/Failed lines for the results of run_checks()
+def print_results(results):
+    ok, lines = result_lines(results)
+    for line in lines:
+        print(line)
+    return ok
+
+# (all checks passed, lines print_results() prints)
+def result_lines(results):
+    lines = []
+    failed = []
+    for label, error, warnings, error_count in results:
+        for warning in warnings:
+            lines.append(f"Warning: {warning}")
+        if error is None:
+            lines.append(f"{label} PASSED ✅")
+        elif error_count is None:
+            lines.append(error)
+            lines.append(f"{label} Failed ❌")
+            return False, lines
+        else:
+            lines.append(error)
+            lines.append(f"{label} Failed ❌ ({error_count} error(s))")
+            failed.append((label, error_count))
+    if failed:
+        # --all-errors: one line per failed check
+        lines.append(f"Summary: {len(failed)} of {len(results)} checks failed, "
+                     f"{sum(count for label, count in failed)} error(s) in total")
+        for label, count in failed:
+            lines.append(f"  {count:>8}  {label}")
+        return False, lines
+    return True, lines
+
+# Validate one file without printing anything, for main() and the batch workers.
+# Returns (results, error): error is set when the file could not be checked at all.
+def validate_file(input_csv_file, options=CheckOptions()):
+    results, error, cache_entry = validate_file_cached(input_csv_file, options)
+    return results, error
+
+# Same as validate_file() with a rowcache entry from the last run of this file (or {}).
+# Returns (results, error, cache_entry) where cache_entry is the entry to keep for the
+# next run, or None when there is nothing worth caching. A `profile` dict is filled
+# like run_checks() does. on_error goes to the checks of a plain single pass, the one of
+# the standard input (see --pass-through).
+def validate_file_cached(input_csv_file, options=CheckOptions(), cache_entry=None, profile=None, on_error=None):
+    if input_csv_file == STDIN_PATH:
+        # A stream can be neither mapped nor hashed for the cache
+        options = options._replace(use_mmap=False)
+        cache_entry = None
+    elif not csv_name(input_csv_file).lower().endswith('.csv'):
+        return [], "Error: The file does not have a .csv extension.", None
+    elif is_compressed(input_csv_file):
+        # Decompressed as a stream, there are no bytes to map
+        options = options._replace(use_mmap=False)
     try:
-        with open(input_csv_file, newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            header = reader.fieldnames
-            rows = list(reader)
-            
-            if not two_columns_exist(header):
-                print("Checking if two columns exist in CSV file... Failed ❌")
-                sys.exit(1)
-            else:
-                print("Checking if two columns exist in CSV file... PASSED ✅")
-            
-            if not there_is_empty_value_in_column(input_csv_file):
-                print("Checking for empty values in columns... Failed ❌")
-                sys.exit(1)
-            else:
-                print("Checking for empty values in columns... PASSED ✅")
-            
-            if not is_good_delimiter(input_csv_file):
-                print("Checking if the delimiter is correct... Failed ❌")
-                sys.exit(1)
-            else:
-                print("Checking if the delimiter is correct... PASSED ✅")
-            
-            if not is_there_duplicates(input_csv_file):
-                print("Checking if there are duplicate values in the CSV file... Failed ❌")
-                sys.exit(1)
-            else:
-                print("Checking if there are duplicate values in the CSV file... PASSED ✅")
-            
-            if not check_valid_ip_and_mask(input_csv_file):
-                print("Checking if IP addresses are valid... Failed ❌")
-                sys.exit(1)
-            else:
-                print("Checking if IP addresses are valid... PASSED ✅")
-                
+        if cache_entry is None and _should_split(input_csv_file, options):
+            results = run_checks_split(input_csv_file, default_visitors(options), options)
+            if results is not None:
+                return results, None, None
+        if cache_entry is None:
+            visitors = default_visitors(options, file_path=input_csv_file, on_error=on_error)
+            return run_checks(input_csv_file, visitors, options.use_mmap, profile), None, None
+        return _run_cached_checks(input_csv_file, options, cache_entry, profile)
     except FileNotFoundError:
-        print(f"Error: File {input_csv_file} not found.")
-        sys.exit(1)
-    
+        return [], f"Error: File {input_csv_file} not found.", None
     except csv.Error as e:
-        print(f"CSV error: {e}")
-        sys.exit(1)
-    
+        return [], f"CSV error: {e}", None
     except Exception as e:
-        print(f"An error occurred: {e}")
+        return [], f"An error occurred: {e}", None
+
+# An unchanged file replays the results of its last run. A changed or new one runs the
+# plain checks and only its hash and results are kept: hashing and keeping the verdict
+# of every row cost more than the IP parses it would save on the next edit.
+def _run_cached_checks(input_csv_file, options, cache_entry, profile=None):
+    started = time.perf_counter()
+    file_hash = file_digest(input_csv_file)
+    # Only the options that change verdicts
+    verdict_options = {'containment_is_warning': options.containment_is_warning,
+                       'all_errors': options.all_errors, 'max_examples': options.max_examples,
+                       'duplicates': options.duplicates, 'hostnames': options.hostnames,
+                       'hostname_pattern': hostname_rule(options.hostname_pattern).pattern}
+    if cache_entry.get('file_hash') == file_hash and cache_entry.get('options') == verdict_options:
+        # Nothing changed since the last run, replay its results
+        results = [tuple(result) for result in cache_entry['results']]
+        if profile is not None:
+            profile.update(replayed=True, seconds=time.perf_counter() - started,
+                           bytes_read=os.path.getsize(input_csv_file), rows=0, checks=[])
+        return results, None, cache_entry
+
+    visitors = default_visitors(options, file_path=input_csv_file)
+    results = run_checks(input_csv_file, visitors, options.use_mmap, profile)
+    if profile is not None:
+        profile['replayed'] = False
+        # The file was hashed before the pass, count that read too
+        profile['bytes_read'] += os.path.getsize(input_csv_file)
+        profile['seconds'] = time.perf_counter() - started
+    new_entry = {
+        'file_hash': file_hash,
+        'options': verdict_options,
+        'results': results,
+    }
+    return results, None, new_entry
+
+# One line per file for batch mode
+def summary_line(input_csv_file, results, error):
+    warnings = 0
+    if error is None:
+        counts = [(label, error_count) for label, check_error, check_warnings, error_count in results
+                  if error_count]
+        if counts:
+            # --all-errors: the number of violations of every failed check
+            error = f"{sum(count for label, count in counts)} error(s): " + ', '.join(
+                f"{label} {count}" for label, count in counts)
+        for label, check_error, check_warnings, error_count in results:
+            warnings += warning_count(check_warnings)
+            if check_error is not None and error is None:
+                error = f"{label} {check_error}"
+                break
+    if error is None:
+        if warnings:
+            return True, f"{input_csv_file}: PASSED ✅ ({warnings} warning(s))"
+        return True, f"{input_csv_file}: PASSED ✅"
+    return False, f"{input_csv_file}: Failed ❌ - {error}"
+
+def _validate_for_batch(input_csv_file, cache_entry=None, options=CheckOptions()):
+    profile = {} if options.profile else None
+    results, error, cache_entry = validate_file_cached(input_csv_file, options, cache_entry, profile)
+    ok, line = summary_line(input_csv_file, results, error)
+    return ok, line, cache_entry, file_report(input_csv_file, ok, profile)
+
+# Expand glob patterns (quoted in the workflow so the shell leaves them alone)
+def expand_paths(patterns):
+    paths = []
+    for pattern in patterns:
+        if not any(character in pattern for character in GLOB_MAGIC):
+            paths.append(pattern)
+            continue
+        import glob
+        matches = sorted(glob.glob(pattern, recursive=True))
+        # Keep an unmatched pattern so it gets reported as a missing file
+        paths.extend(matches or [pattern])
+    return list(dict.fromkeys(paths))
+
+# Validate many files across a process pool, printing one summary line per file
+# With a cache (see rowcache) the workers get the entry of their file and send back the
+# new one, only this process reads and writes the cache file.
+# Returns (all files passed, per-file profile reports, whether the cache changed).
+def validate_batch(paths, jobs=None, options=CheckOptions(), cache=None):
+    from concurrent.futures import ProcessPoolExecutor
+    workers = min(jobs or os.cpu_count() or 1, len(paths))
+    failures = 0
+    reports = []
+    cache_changed = False
+    # The files are already spread over the pool, don't split them again
+    validate = partial(_validate_for_batch, options=options._replace(split='off'))
+    entries = [None] * len(paths) if cache is None else [cache.get(file_key(path), {}) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(paths) // (workers * 4))
+        outcomes = executor.map(validate, paths, entries, chunksize=chunksize)
+        for path, (ok, line, cache_entry, report) in zip(paths, outcomes):
+            print(line)
+            if not ok:
+                failures += 1
+            if cache is not None and cache_entry is not None:
+                cache_changed = put_entry(cache, file_key(path), cache_entry) or cache_changed
+            if report is not None:
+                reports.append(report)
+    print(f"{len(paths) - failures}/{len(paths)} files PASSED")
+    return failures == 0, reports, cache_changed
+
+# Profile of one file for the --profile/--report-json report, None when not profiling
+def file_report(input_csv_file, ok, profile):
+    if profile is None:
+        return None
+    report = {'path': input_csv_file, 'passed': ok}
+    report.update(profile)
+    for key in ('seconds', 'read_seconds'):
+        if key in report:
+            report[key] = round(report[key], 6)
+    return report
+
+def print_profile(reports):
+    for report in reports:
+        if 'seconds' not in report:
+            continue  # the file could not be read
+        print(f"Profile of {report['path']}: {report['seconds']:.4f}s, {report['rows']} rows, "
+              f"{report['bytes_read']} bytes read"
+              + (" (results replayed from the cache)" if report.get('replayed') else
+                 f", {report.get('read_seconds', 0):.4f}s reading rows"))
+        for check in report['checks']:
+            counters = ', '.join(f"{key} {value}" for key, value in check.items()
+                                 if key not in ('name', 'label', 'passed', 'seconds', 'rows'))
+            print(f"  {check['name']:<32} {check['seconds']:10.4f}s {check['rows']:>10} rows"
+                  + (f"  {counters}" if counters else ''))
+
+def write_report_json(report_path, reports):
+    import json
+    report = {
+        'validator_version': VALIDATOR_VERSION,
+        'seconds': round(sum(entry.get('seconds', 0) for entry in reports), 6),
+        'files': reports,
+    }
+    with open(report_path, 'w') as file:
+        json.dump(report, file, indent=2)
+    return report
+
+# Let later workflow steps pick the numbers up as step outputs
+def write_github_output(report, report_path):
+    output_path = os.environ.get('GITHUB_OUTPUT')
+    if not output_path:
+        return
+    with open(output_path, 'a') as file:
+        file.write(f"validation_seconds={report['seconds']}\n")
+        if report_path:
+            file.write(f"validation_report={report_path}\n")
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='v4.py',
+        description='Verify the content of the CSV files of our IP groups automation.')
+    parser.add_argument('input_csv_file', nargs='*',
+                        help=f"CSV file(s) to check, glob patterns are expanded, '{STDIN_PATH}' reads the "
+                             "standard input")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='worker processes when checking several files or splitting one (default: all '
+                             'cores)')
+    parser.add_argument('--split', choices=['auto', 'on', 'off'], default='auto',
+                        help=f"check the rows of a single file in parallel byte ranges; auto does it from "
+                             f"{SPLIT_MIN_BYTES // (1024 * 1024)} MiB on (default: auto)")
+    parser.add_argument('--containment-warning', action='store_true',
+                        help='report networks contained in another network as warnings, not errors')
+    parser.add_argument('--duplicates', choices=DUPLICATE_MODES, default='strict',
+                        help='strict: only identical rows are duplicates; canonical: rows with the same '
+                             'hostname and network however they are written (default: strict)')
+    parser.add_argument('--no-hostname-check', dest='hostnames', action='store_false',
+                        help='do not check that hostnames are valid RFC 1123 names')
+    parser.add_argument('--hostname-pattern', metavar='REGEX',
+                        help=f"naming convention every hostname must match whole (default: ${PATTERN_ENV} "
+                             f"if set)")
+    parser.add_argument('--dedupe-memory', type=int, metavar='MIB',
+                        help='keep the duplicate check, and the networks of the overlap check, under about '
+                             'MIB MiB of memory each, spilling sorted runs to temporary files')
+    parser.add_argument('--bloom', action='store_true',
+                        help='with --dedupe-memory, fill a Bloom filter first and only read the file '
+                             'again when it flags a possible duplicate')
+    parser.add_argument('--cache', metavar='PATH',
+                        help='validation cache file, the results of unchanged files are replayed')
+    parser.add_argument('--mmap', action='store_true',
+                        help='read the files through mmap without decoding them, for very large exports '
+                             '(with --dedupe-memory to bound what the checks keep per row)')
+    parser.add_argument('--profile', action='store_true',
+                        help='print the time, rows, bytes read and cache hits of every check')
+    parser.add_argument('--report-json', metavar='PATH',
+                        help='write the --profile numbers to a JSON file (and to $GITHUB_OUTPUT)')
+    parser.add_argument('--all-errors', action='store_true',
+                        help='run every check over the whole file and report all the violations '
+                             'instead of stopping at the first one')
+    parser.add_argument('--max-examples', type=int, default=MAX_EXAMPLES, metavar='N',
+                        help=f"with --all-errors, violations listed per check, the others are only "
+                             f"counted (default: {MAX_EXAMPLES})")
+    parser.add_argument('--stdin', action='store_true',
+                        help=f"validate CSV content streamed on the standard input, same as '{STDIN_PATH}' "
+                             "(with --dedupe-memory to bound the memory of an endless stream)")
+    parser.add_argument('--pass-through', action='store_true',
+                        help='with the standard input, copy it to the standard output as it is read '
+                             'until the first error, and print the results on the standard error')
+    args = parser.parse_args(argv)
+    if args.stdin:
+        args.input_csv_file.append(STDIN_PATH)
+    if not args.input_csv_file:
+        parser.error('the following arguments are required: input_csv_file')
+    if STDIN_PATH in args.input_csv_file and len(args.input_csv_file) > 1:
+        parser.error('the standard input can only be validated on its own')
+    if args.dedupe_memory is not None and args.dedupe_memory < 1:
+        parser.error('--dedupe-memory must be 1 or more')
+    if args.bloom and args.dedupe_memory is None:
+        parser.error('--bloom only works with --dedupe-memory')
+    if args.hostname_pattern is not None:
+        try:
+            hostname_rule(args.hostname_pattern)
+        except re.error as e:
+            parser.error(f"--hostname-pattern is not a valid regex: {e}")
+    if args.max_examples < 0:
+        parser.error('--max-examples must be 0 or more')
+    if args.pass_through and args.input_csv_file != [STDIN_PATH]:
+        parser.error('--pass-through only works with the standard input')
+    return args
+
+## Main section
+def main():
+    args = parse_args(sys.argv[1:])
+    paths = expand_paths(args.input_csv_file)
+    cache = None if args.cache is None else load_cache(args.cache, VALIDATOR_VERSION)
+    profiling = args.profile or args.report_json is not None
+    options = CheckOptions(containment_is_warning=args.containment_warning, use_mmap=args.mmap,
+                           profile=profiling, all_errors=args.all_errors, max_examples=args.max_examples,
+                           split=args.split, jobs=args.jobs, duplicates=args.duplicates,
+                           dedupe_memory=args.dedupe_memory and args.dedupe_memory * 1024 * 1024,
+                           bloom=args.bloom, hostnames=args.hostnames,
+                           hostname_pattern=args.hostname_pattern)
+
+    sink = None
+    if args.pass_through:
+        # export | v4.py - --pass-through | push: the rows go on down the pipe as they are
+        # checked, the results go to stderr and the first error cuts the stream
+        sink = _PassThrough(sys.stdout.buffer)
+        sys.stdin = io.TextIOWrapper(io.BufferedReader(_CountingReader(sys.stdin.buffer, sink)))
+        sys.stdout = sys.stderr
+
+    cache_changed = False
+    if len(paths) > 1:
+        ok, reports, cache_changed = validate_batch(paths, args.jobs, options, cache)
+    else:
+        profile = {} if profiling else None
+        cache_entry = None if cache is None or paths[0] == STDIN_PATH else cache.get(file_key(paths[0]), {})
+        results, error, cache_entry = validate_file_cached(paths[0], options, cache_entry, profile,
+                                                           None if sink is None else sink.stop)
+        if cache_entry is not None:
+            cache_changed = put_entry(cache, file_key(paths[0]), cache_entry)
+        if error is not None:
+            print(error)
+            ok = False
+        else:
+            ok = print_results(results)
+        reports = [file_report(paths[0], ok, profile)] if profiling else []
+
+    if cache_changed:
+        save_cache(args.cache, VALIDATOR_VERSION, cache)
+    if args.profile:
+        print_profile(reports)
+    if profiling:
+        report = write_report_json(args.report_json, reports) if args.report_json else None
+        if report is None:
+            report = {'seconds': round(sum(entry.get('seconds', 0) for entry in reports), 6)}
+        write_github_output(report, args.report_json)
+    if sink is not None:
+        sink.flush()
+    if not ok:
         sys.exit(1)
 
 if __name__ == "__main__":
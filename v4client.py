@@ -0,0 +1,143 @@
+#!/bin/python3
+# Client of serve.py, with the output and exit codes of v4.py.
+#
+#   python3 v4client.py ip2.csv                  # same as python3 v4.py ip2.csv
+#   python3 v4client.py 'groups/**/*.csv'
+#   python3 v4client.py - < ip2.csv              # validate CSV content from stdin
+#   python3 v4client.py --lookup ip2.csv '[{"Hostname": "dbserver01"}]'
+#
+# Only the standard library socket and json modules are imported, so starting the
+# client costs next to nothing; all the work happens in the daemon. Exits 0 when every
+# check passed, 1 on a failed check or when the daemon can't be reached.
+
+import os
+import sys
+import glob
+import json
+import socket
+import argparse
+import tempfile
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), f"ipgroups-v4-{os.getuid()}.sock")
+
+# Same as serve.DEFAULT_TOKEN_FILE
+DEFAULT_TOKEN_FILE = os.path.join(os.path.expanduser('~'), '.ipgroups-v4.token')
+
+# Same as dedupe.DUPLICATE_MODES and hostnames.PATTERN_ENV, not imported to keep the
+# client light
+DUPLICATE_MODES = ('strict', 'canonical')
+PATTERN_ENV = 'IPGROUPS_HOSTNAME_PATTERN'
+
+
+def connect(socket_path, port):
+    if port is not None:
+        return socket.create_connection(('127.0.0.1', port))
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError:
+        client.close()
+        raise
+    return client
+
+
+def send(request, socket_path=DEFAULT_SOCKET, port=None):
+    with connect(socket_path, port) as client:
+        client.sendall(json.dumps(request).encode() + b'\n')
+        with client.makefile('rb') as replies:
+            line = replies.readline()
+    if not line:
+        raise OSError("the daemon closed the connection")
+    return json.loads(line)
+
+
+# Same expansion as v4.py, paths are sent absolute since the daemon has its own cwd
+def expand_paths(patterns):
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        paths.extend(matches or [pattern])
+    return [os.path.abspath(path) for path in dict.fromkeys(paths)]
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='v4client.py', description='Validate CSV files through serve.py.')
+    parser.add_argument('input_csv_file', nargs='*',
+                        help="CSV file(s) to check, glob patterns are expanded, '-' reads stdin")
+    parser.add_argument('--socket', metavar='PATH', default=DEFAULT_SOCKET, help='Unix socket of the daemon')
+    parser.add_argument('--port', type=int, help='reach the daemon on 127.0.0.1:PORT instead')
+    parser.add_argument('--token-file', metavar='PATH', default=DEFAULT_TOKEN_FILE,
+                        help=f"with --port, the token the daemon wrote (default: {DEFAULT_TOKEN_FILE})")
+    parser.add_argument('--containment-warning', action='store_true',
+                        help='report networks contained in another network as warnings, not errors')
+    parser.add_argument('--duplicates', choices=DUPLICATE_MODES, default='strict',
+                        help='strict: only identical rows are duplicates; canonical: rows with the same '
+                             'hostname and network however they are written (default: strict)')
+    parser.add_argument('--no-hostname-check', dest='hostnames', action='store_false',
+                        help='do not check that hostnames are valid RFC 1123 names')
+    parser.add_argument('--hostname-pattern', metavar='REGEX',
+                        help=f"naming convention every hostname must match whole (default: ${PATTERN_ENV} "
+                             f"if set)")
+    parser.add_argument('--dedupe-memory', type=int, metavar='MIB',
+                        help='have the daemon keep the duplicate check, and the networks of the overlap '
+                             'check, under about MIB MiB of memory each')
+    parser.add_argument('--bloom', action='store_true',
+                        help='with --dedupe-memory, fill a Bloom filter first and only read the file '
+                             'again when it flags a possible duplicate')
+    parser.add_argument('--mmap', action='store_true', help='have the daemon read the files through mmap')
+    parser.add_argument('--all-errors', action='store_true', help='report every violation, not only the first')
+    parser.add_argument('--max-examples', type=int, default=10, metavar='N',
+                        help='with --all-errors, violations listed per check (default: 10)')
+    parser.add_argument('--lookup', nargs=2, metavar=('CSV_FILE', 'ITEMS_JSON'),
+                        help='look items up in a CSV file instead of validating')
+    args = parser.parse_args(argv)
+    if not args.input_csv_file and not args.lookup:
+        parser.error('the following arguments are required: input_csv_file')
+    if args.dedupe_memory is not None and args.dedupe_memory < 1:
+        parser.error('--dedupe-memory must be 1 or more')
+    if args.bloom and args.dedupe_memory is None:
+        parser.error('--bloom only works with --dedupe-memory')
+    return args
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    if args.lookup:
+        csv_file, items_json = args.lookup
+        try:
+            items = json.loads(items_json)
+        except ValueError as e:
+            print(f"Error: Invalid items: {e}")
+            sys.exit(1)
+        request = {'op': 'lookup', 'path': os.path.abspath(csv_file),
+                   'items': [items] if isinstance(items, dict) else items}
+    elif args.input_csv_file == ['-']:
+        request = {'op': 'validate', 'csv': sys.stdin.read(), 'name': 'stdin.csv'}
+    else:
+        request = {'op': 'validate', 'paths': expand_paths(args.input_csv_file)}
+    # The convention of this environment, not the daemon's: '' when there is none
+    hostname_pattern = args.hostname_pattern
+    if hostname_pattern is None:
+        hostname_pattern = os.environ.get(PATTERN_ENV, '')
+    request.update(containment_warning=args.containment_warning, mmap=args.mmap, all_errors=args.all_errors,
+                   max_examples=args.max_examples, duplicates=args.duplicates, hostnames=args.hostnames,
+                   hostname_pattern=hostname_pattern, dedupe_memory=args.dedupe_memory, bloom=args.bloom)
+
+    try:
+        if args.port is not None:
+            with open(args.token_file) as file:
+                request['token'] = file.read().strip()
+        response = send(request, args.socket, args.port)
+    except (OSError, ValueError) as e:
+        print(f"Error: No validation daemon reachable ({e}). Start it with: python3 serve.py")
+        sys.exit(1)
+
+    for line in response.get('output', []):
+        print(line)
+    if 'result' in response:
+        print(json.dumps(response['result'], indent=2))
+    sys.exit(response.get('exit_code', 1))
+
+
+if __name__ == "__main__":
+    main()